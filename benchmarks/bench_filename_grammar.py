@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the filename grammar against the former separator search.
+
+Generates labeled paths, including the cases the former parser got wrong: dashes in
+artist names like Jay-Z, dashes in folder names like Hip-Hop, dashes without spaces
+and the less common dash characters. Prints how many artists and titles each parser
+got right and how many names per second it splits.
+
+Example usage:
+    python benchmarks/bench_filename_grammar.py --count 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import ARTIST_WORDS, NOISE_TAGS, SEPARATORS, TITLE_WORDS, decorate  # noqa: E402
+from logic.album_logic import get_file_ending, get_separator_from_filepath  # noqa: E402
+from logic.canonical_names import name_key  # noqa: E402
+from logic.char_replacer_helper import TextCleaner  # noqa: E402
+from logic.filename_grammar import FileNameParts, split_file_names  # noqa: E402
+
+HYPHENATED_ARTISTS = ["Jay-Z", "Sleater-Kinney", "Run-DMC", "Wu-Tang Clan", "Jean-Michel Jarre", "Ne-Yo"]
+DASHED_FOLDERS = ["Hip-Hop", "Post-Rock", "Lo-Fi", "Drum-and-Bass"]
+PLAIN_FOLDERS = ["Rock", "Jazz", "Classical"]
+TIGHT_SEPARATORS = ["-", " -", "- ", "–", "—"]
+RARE_DASH_SEPARATORS = [" ‐ ", " ‒ ", " ― ", " − "]
+
+# Labeled path: path, expected artist, expected title
+LabeledPath = Tuple[str, str, str]
+
+
+def generate_labeled_paths(count: int, seed: int = 0) -> List[LabeledPath]:
+    """
+    Generate paths with known artist and title, a third of them with one of the hard cases.
+    :param count: Number of paths
+    :param seed: Seed of the random generator
+    :return: List of (path, artist, title)
+    """
+    rng = random.Random(seed)
+    paths = []
+    for number in range(count):
+        artist = " ".join(rng.sample(ARTIST_WORDS, rng.randint(1, 3)))
+        title = " ".join(rng.sample(TITLE_WORDS, rng.randint(1, 4))) + f" {number}"
+        separator = rng.choice(SEPARATORS)
+        folder = rng.choice(PLAIN_FOLDERS)
+        case = rng.random()
+        if case < 0.1:
+            artist = rng.choice(HYPHENATED_ARTISTS)
+        elif case < 0.2:
+            folder = rng.choice(DASHED_FOLDERS)
+        elif case < 0.27:
+            separator = rng.choice(TIGHT_SEPARATORS)
+        elif case < 0.33:
+            separator = rng.choice(RARE_DASH_SEPARATORS)
+        name = decorate(artist, rng) + separator + " ".join(part for part in (title, rng.choice(NOISE_TAGS)) if part)
+        paths.append((os.path.join("/library", folder, name + ".opus"), artist, title))
+    return paths
+
+
+def legacy_split(clean_path: str) -> Optional[FileNameParts]:
+    """Artist, title and file ending as found by the former parser, searching the whole cleaned path"""
+    separator = get_separator_from_filepath(clean_path)
+    if separator is None:
+        return None
+    separator_index = clean_path.find(separator)
+    slash_index = clean_path.rfind("/")
+    if separator_index <= slash_index:
+        return None
+    artist = clean_path[slash_index + 1:separator_index - 1].strip()
+    file_ending = get_file_ending(clean_path)
+    title = clean_path[separator_index + 1:].strip()
+    if not artist or not file_ending or not title:
+        return None
+    return FileNameParts(artist, title[:len(title) - len(file_ending)].strip(), file_ending)
+
+
+def grammar_split(clean_paths: List[str]) -> List[Optional[FileNameParts]]:
+    """Artist, title and file ending as found by the filename grammar, on the base names only"""
+    return split_file_names([os.path.basename(path) for path in clean_paths])
+
+
+def accuracy(name: str, results: List[Optional[FileNameParts]], labeled_paths: List[LabeledPath]):
+    """Print the share of names whose artist and title were split correctly"""
+    artists = titles = 0
+    for parts, (_, artist, title) in zip(results, labeled_paths):
+        if parts is None:
+            continue
+        if name_key(parts.artist) == name_key(TextCleaner.clean_special_characters(artist)):
+            artists += 1
+        if name_key(parts.title).startswith(name_key(title)):
+            titles += 1
+    count = len(labeled_paths)
+    print(f"{name:<30} artist {artists / count:>7.2%}   title {titles / count:>7.2%}")
+
+
+def measure(name: str, function: Callable, argument) -> float:
+    """Run the function and print the throughput"""
+    start = time.perf_counter()
+    results = function(argument)
+    elapsed = time.perf_counter() - start
+    rate = len(results) / elapsed
+    print(f"{name:<30} {rate:>12,.0f} filenames/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the filename grammar against the former parser.')
+    parser.add_argument('--count', type=int, default=100000, help='Number of paths to split')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator')
+    args = parser.parse_args()
+
+    labeled_paths = generate_labeled_paths(args.count, args.seed)
+    paths = [path for path, _, _ in labeled_paths]
+
+    print(f"Splitting {args.count} paths\n")
+    print("Speed")
+    # Both parsers split the path after removing special characters, the cleanup is measured on its own
+    measure("special character cleanup", lambda items: [TextCleaner.clean_special_characters(path)
+                                                        for path in items], paths)
+    clean_paths = [TextCleaner.clean_special_characters(path) for path in paths]
+    measure("former separator search", lambda items: [legacy_split(path) for path in items], clean_paths)
+    measure("filename grammar", grammar_split, clean_paths)
+
+    print("\nAccuracy")
+    accuracy("former separator search", [legacy_split(path) for path in clean_paths], labeled_paths)
+    accuracy("filename grammar", grammar_split(clean_paths), labeled_paths)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the title noise tag removal.
+
+Compares the former chain of re.sub calls with the combined TitleNormalizer
+and shows that additional rules barely change the throughput.
+
+Example usage:
+    python benchmarks/bench_title_normalizer.py --count 200000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic.title_normalizer import DEFAULT_NOISE_TAGS, EXTRA_NOISE_TAGS, TitleNormalizer  # noqa: E402
+
+TITLES = [
+    "Cracker Island (Full Album) 2023",
+    "Magical Mystery Tour [Full Album] (1967)",
+    "The Wall [Complete Album] [HQ]",
+    "Rumours (High Quality)  1977",
+    "Kind of Blue",
+    "OK Computer (Official Audio) 320kbps",
+    "Discovery  [Remastered]",
+]
+
+
+def chained_cleanup(title: str) -> str:
+    """Title cleanup as done before the TitleNormalizer, one regex call per tag"""
+    title = title.replace("  ", " ")
+    title = title.replace("  ", " ")
+    title = re.sub(r"\[?\(?Full Album\)?]?", "", title, flags=re.IGNORECASE)
+    title = re.sub(r"\[?\(?complete album\)?]?", "", title, flags=re.IGNORECASE)
+    title = re.sub(r"\[?\(?High Quality\)?]?", "", title, flags=re.IGNORECASE)
+    title = re.sub(r"(\[?\(?HQ\s?\)?]?)", "", title, flags=re.IGNORECASE)
+    return title
+
+
+def measure(name: str, function, titles) -> float:
+    """Run function over all titles and print the throughput"""
+    start = time.perf_counter()
+    for title in titles:
+        function(title)
+    elapsed = time.perf_counter() - start
+    rate = len(titles) / elapsed
+    print(f"{name:<40} {rate:>12,.0f} filenames/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the title noise tag removal.')
+    parser.add_argument('--count', type=int, default=100000, help='Number of titles to clean')
+    args = parser.parse_args()
+
+    random.seed(0)
+    titles = [random.choice(TITLES) for _ in range(args.count)]
+
+    default_normalizer = TitleNormalizer()
+    extended_normalizer = TitleNormalizer(DEFAULT_NOISE_TAGS + EXTRA_NOISE_TAGS)
+    many_rules_normalizer = TitleNormalizer(
+        DEFAULT_NOISE_TAGS + EXTRA_NOISE_TAGS + tuple(f"Bonus Rule {i}" for i in range(100))
+    )
+
+    def normalize(normalizer):
+        return lambda title: normalizer.remove_noise_tags(normalizer.collapse_spaces(title))
+
+    print(f"Cleaning {args.count} titles")
+    measure("chained re.sub (4 rules)", chained_cleanup, titles)
+    measure(f"TitleNormalizer ({len(default_normalizer.noise_tags)} rules)",
+            normalize(default_normalizer), titles)
+    measure(f"TitleNormalizer ({len(extended_normalizer.noise_tags)} rules)",
+            normalize(extended_normalizer), titles)
+    measure(f"TitleNormalizer ({len(many_rules_normalizer.noise_tags)} rules)",
+            normalize(many_rules_normalizer), titles)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Synthetic full album library generator for benchmarks.
+
+File names mimic downloaded YouTube rips: combining underlines, en and em dashes,
+(Full Album) and quality tags, years in different brackets and all caps titles.
+
+Example usage:
+    python benchmarks/corpus.py /tmp/library --count 10000
+"""
+
+import argparse
+import os
+import random
+import shutil
+from typing import Iterator, List
+
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "logic", "tests", "emptyOpusFile.opus")
+
+GENRES = ["Rock", "ElectronicMusic", "Jazz", "Classical", "HipHop", "Metal", "Pop", "Folk"]
+
+ARTIST_WORDS = ["The", "Black", "Velvet", "Crystal", "Gorillaz", "Robbie", "Williams", "Cure", "Buffalo",
+                "Volcanic", "Miles", "Davis", "Electric", "Moon", "Orchestra", "Sinfonie", "Paavo", "Järvi"]
+TITLE_WORDS = ["Cracker", "Island", "Life", "Thru", "A", "Lens", "Three", "Imaginary", "Boys", "Kind", "Of",
+               "Blue", "Rock", "Magical", "Mystery", "Tour", "Nocturne", "d-Moll", "Night", "Dreams", "Live"]
+SEPARATORS = [" - ", " - ", " - ", " – ", " — ", " -"]
+NOISE_TAGS = ["", "", "(Full Album)", "[Full Album]", "(Complete Album)", "[HQ]", "(High Quality)",
+              "[Full Album] [HQ]"]
+FILE_ENDINGS = [".opus", ".opus", ".opus", ".mp3", ".ogg"]
+
+COMBINING_LOW_LINE = "̲"
+COMBINING_DIAERESIS_BELOW = "̤"
+
+
+def decorate(text: str, rng: random.Random) -> str:
+    """Apply one of the text decorations found in real downloads"""
+    choice = rng.random()
+    if choice < 0.08:
+        return "".join(char + COMBINING_LOW_LINE if char != " " else char for char in text)
+    if choice < 0.12:
+        return "".join(char + COMBINING_DIAERESIS_BELOW for char in text)
+    if choice < 0.22:
+        return text.upper()
+    if choice < 0.25:
+        return " ∙ ".join(text.split(" "))
+    return text
+
+
+def generate_names(count: int, seed: int = 0) -> Iterator[str]:
+    """
+    Generate messy full album file names, deterministic for a given seed.
+    :param count: Number of names
+    :param seed: Seed of the random generator
+    :return: Iterator over file names without folder
+    """
+    rng = random.Random(seed)
+    for number in range(count):
+        artist = " ".join(rng.sample(ARTIST_WORDS, rng.randint(1, 3)))
+        title = " ".join(rng.sample(TITLE_WORDS, rng.randint(1, 4)))
+        year_choice = rng.random()
+        year = rng.randint(1950, 2024)
+        if year_choice < 0.3:
+            year_text = str(year)
+        elif year_choice < 0.5:
+            year_text = f"({year})"
+        elif year_choice < 0.6:
+            year_text = f"[{year}]"
+        else:
+            year_text = ""
+        parts = [decorate(title, rng), rng.choice(NOISE_TAGS), year_text]
+        # The number keeps the names unique, like the catalog numbers of many rips
+        name = (decorate(artist, rng) + rng.choice(SEPARATORS) + " ".join(part for part in parts if part)
+                + f" {number}")
+        yield name + rng.choice(FILE_ENDINGS)
+
+
+def generate_paths(root: str, count: int, seed: int = 0) -> List[str]:
+    """
+    Generate paths of a library with genre folders.
+    :param root: Root folder of the library
+    :param count: Number of files
+    :param seed: Seed of the random generator
+    :return: List of paths
+    """
+    rng = random.Random(seed + 1)
+    return [os.path.join(root, rng.choice(GENRES), name) for name in generate_names(count, seed)]
+
+
+def materialize(root: str, count: int, seed: int = 0, template_file: str = TEMPLATE_FILE) -> List[str]:
+    """
+    Create a library on disk, every file is a copy of a small valid Opus file.
+    :param root: Root folder of the library, created if missing
+    :param count: Number of files
+    :param seed: Seed of the random generator
+    :param template_file: Audio file that is copied
+    :return: List of created paths
+    """
+    paths = generate_paths(root, count, seed)
+    for genre in GENRES:
+        os.makedirs(os.path.join(root, genre), exist_ok=True)
+    for path in paths:
+        # Keep the file ending of the name, the content is Opus for every file
+        shutil.copyfile(template_file, path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a synthetic full album library.')
+    parser.add_argument('folder_path', help='Root folder of the library')
+    parser.add_argument('--count', type=int, default=1000, help='Number of files')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator')
+    args = parser.parse_args()
+
+    paths = materialize(args.folder_path, args.count, args.seed)
+    print(f"Created {len(paths)} files in {args.folder_path}")
+
+
+if __name__ == '__main__':
+    main()
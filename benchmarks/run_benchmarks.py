@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite of the Full Album Indexer.
+
+Measures parse-only throughput on generated names, the end-to-end time of a dry run
+and the tag-write throughput on a generated library. Results are saved as JSON,
+so runs of different commits can be compared.
+
+Example usage:
+    python benchmarks/run_benchmarks.py --count 5000 --save benchmarks/results/baseline.json
+    python benchmarks/run_benchmarks.py --count 5000 --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import generate_paths, materialize  # noqa: E402
+from logic.album_logic import parse_many  # noqa: E402
+from main import run  # noqa: E402
+
+BENCHMARKS = ("parse", "dry_run", "tag_write")
+
+
+def git_commit() -> str:
+    """Get the current commit of the repository, empty if unknown"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def bench_parse(count: int, seed: int) -> dict:
+    """Parse generated names in memory"""
+    paths = generate_paths("/library", count, seed)
+    start = time.perf_counter()
+    parsed = sum(1 for album_obj in parse_many(paths) if album_obj is not None)
+    elapsed = time.perf_counter() - start
+    return {"files": count, "parsed": parsed, "seconds": elapsed, "files_per_second": count / elapsed}
+
+
+def bench_run(count: int, seed: int, dry_run: bool, jobs: int) -> dict:
+    """Run the indexer on a generated library"""
+    root = tempfile.mkdtemp(prefix="fullalbumindexerbench")
+    try:
+        materialize(root, count, seed)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = run(root, recursive=True, dry_run=dry_run, jobs=jobs)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(root)
+    return {"files": count, "processed": summary.processed_files, "seconds": elapsed,
+            "files_per_second": count / elapsed}
+
+
+def compare(results: dict, baseline: dict):
+    """Print the change of every benchmark against a baseline"""
+    print(f"\nComparison with baseline of commit {baseline.get('commit') or 'unknown'}")
+    for name, result in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous:
+            continue
+        change = (result["files_per_second"] / previous["files_per_second"] - 1) * 100
+        print(f"  {name:<10} {previous['files_per_second']:>12,.0f} -> {result['files_per_second']:>12,.0f}"
+              f" files/s ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parsing, dry runs and tag writes.')
+    parser.add_argument('--count', type=int, default=2000, help='Number of files of the generated library')
+    parser.add_argument('--parse-count', type=int, help='Number of names for the parse benchmark, '
+                                                        'defaults to 10 times --count')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the name generator')
+    parser.add_argument('--jobs', type=int, default=1, help='Jobs used for the run benchmarks')
+    parser.add_argument('--only', choices=BENCHMARKS, action='append', help='Run only this benchmark')
+    parser.add_argument('--save', metavar='FILE', help='Save the results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='Compare with results saved earlier')
+    args = parser.parse_args()
+
+    selected = args.only or BENCHMARKS
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "count": args.count,
+        "jobs": args.jobs,
+        "benchmarks": {},
+    }
+
+    if "parse" in selected:
+        results["benchmarks"]["parse"] = bench_parse(args.parse_count or args.count * 10, args.seed)
+    if "dry_run" in selected:
+        results["benchmarks"]["dry_run"] = bench_run(args.count, args.seed, dry_run=True, jobs=args.jobs)
+    if "tag_write" in selected:
+        results["benchmarks"]["tag_write"] = bench_run(args.count, args.seed, dry_run=False, jobs=args.jobs)
+
+    for name, result in results["benchmarks"].items():
+        print(f"{name:<10} {result['files']:>9} files {result['seconds']:>9.3f} s "
+              f"{result['files_per_second']:>12,.0f} files/s")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            compare(results, json.load(baseline_file))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as results_file:
+            json.dump(results, results_file, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,270 +2,404 @@ import os
 import shutil
 import string
 import sys
-from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional
 import re
 import music_tag
 from logic import objects
 from logic.objects import AlbumObject
+from logic.canonical_names import CanonicalNames
 from logic.char_replacer_helper import TextCleaner
+from logic.duplicates import DUPLICATES_FOLDER_NAME
+from logic.filename_grammar import FileNameParts, split_file_name, split_file_names
+from logic.genre import DEFAULT_GENRE_RESOLVER, GenreResolver
+from logic.log import get_logger
+from logic.profiling import get_profiler
+from logic.tag_writer import save_music_file
+from logic.rename_planner import build_rename_plan, execute_rename_plan
+from logic.splitter import SPLIT_MARKER_NAME
+from logic.title_normalizer import DEFAULT_NORMALIZER, TitleNormalizer
 
+logger = get_logger(__name__)
 
-def set_music_information(album_obj: objects.AlbumObject):
+
+def set_music_information(album_obj: objects.AlbumObject, skip_unchanged: bool = True):
     """
     Set information from album object in the music file and saves this to disk.
+    The existing tags are compared first, the file is only saved when at least one tag differs.
     :param album_obj: AlbumObject containing the metadata to set
+    :param skip_unchanged: If False, the file is saved even when all tags already match
+    :return: True if the file was saved, False if all tags were already up to date, None if error
+    """
+    loaded = load_music_information(album_obj)
+    if loaded is None:
+        return None
+
+    music_file, changed = loaded
+    if not changed and skip_unchanged:
+        logger.info("Tags already up to date, file not saved: %s", album_obj.complete_file_path)
+        return False
+
+    return save_music_information(album_obj, music_file)
+
+
+def load_music_information(album_obj: objects.AlbumObject):
+    """
+    Load the music file and set the information from album object on the loaded tags.
+    Nothing is written to disk, see save_music_information.
+    :param album_obj: AlbumObject containing the metadata to set
+    :return: Tuple of the loaded file and whether any tag changed, None if error
     """
     if album_obj is None:
-        print("ERROR: Album object is None")
+        logger.error("Album object is None")
         return None
 
     try:
-        print(f"INFO: Loading music file: {album_obj.complete_file_path}")
-        music_file = music_tag.load_file(album_obj.complete_file_path)
+        logger.debug("Loading music file: %s", album_obj.complete_file_path)
+        with get_profiler().stage("tag_load"):
+            music_file = music_tag.load_file(album_obj.complete_file_path)
     except Exception as ex:
-        print(f"ERROR: Failed to load music file")
-        print(f"  File: {album_obj.complete_file_path}")
-        print(f"  Error type: {type(ex).__name__}")
-        print(f"  Error message: {str(ex)}")
+        logger.error("Failed to load music file %s: %s: %s",
+                     album_obj.complete_file_path, type(ex).__name__, ex)
         return None
 
     try:
+        changed = False
+
         # Artist
         if album_obj.artist_name is not None and album_obj.artist_name.strip() != "":
-            music_file["artist"] = album_obj.artist_name.strip()
-            print(f"INFO: Set artist tag: {album_obj.artist_name}")
+            if set_tag_if_changed(music_file, "artist", album_obj.artist_name.strip()):
+                logger.debug("Set artist tag: %s", album_obj.artist_name)
+                changed = True
 
         # Year
         if album_obj.release_year is not None and album_obj.release_year.strip() != "":
             try:
                 clean_year = re.sub(r"[^0-9]", "", album_obj.release_year)
                 if clean_year.isdigit():
-                    music_file["year"] = int(clean_year)
-                    print(f"INFO: Set year tag: {clean_year}")
+                    if set_tag_if_changed(music_file, "year", int(clean_year)):
+                        logger.debug("Set year tag: %s", clean_year)
+                        changed = True
             except (ValueError, TypeError) as ex:
-                print(f"WARNING: Failed to set year tag")
-                print(f"  Invalid year format: {album_obj.release_year}")
-                print(f"  Error: {str(ex)}")
+                logger.warning("Failed to set year tag, invalid year format %r: %s", album_obj.release_year, ex)
 
         # Track title
         if "tracktitle" in music_file and album_obj.title_name is not None and album_obj.title_name.strip() != "":
-            music_file["tracktitle"] = album_obj.title_name.strip()
-            print(f"INFO: Set track title tag: {album_obj.title_name}")
+            if set_tag_if_changed(music_file, "tracktitle", album_obj.title_name.strip()):
+                logger.debug("Set track title tag: %s", album_obj.title_name)
+                changed = True
 
         # Album title
         if album_obj.title_name is not None and album_obj.title_name.strip() != "":
-            music_file["album"] = album_obj.title_name.strip()
-            print(f"INFO: Set album tag: {album_obj.title_name}")
+            if set_tag_if_changed(music_file, "album", album_obj.title_name.strip()):
+                logger.debug("Set album tag: %s", album_obj.title_name)
+                changed = True
 
         # Genre
         if album_obj.genre is not None and album_obj.genre.strip() != "":
-            music_file["genre"] = album_obj.genre.strip()
-            print(f"INFO: Set genre tag: {album_obj.genre}")
+            if set_tag_if_changed(music_file, "genre", album_obj.genre.strip()):
+                logger.debug("Set genre tag: %s", album_obj.genre)
+                changed = True
+
+    except Exception as ex:
+        logger.error("Failed to set metadata of %s: %s: %s", album_obj.complete_file_path, type(ex).__name__, ex)
+        return None
+
+    return music_file, changed
 
-        try:
-            print(f"INFO: Saving changes to file: {album_obj.complete_file_path}")
-            music_file.save()
-            print(f"INFO: Successfully saved metadata changes")
-        except Exception as ex:
-            print(f"ERROR: Failed to save metadata changes")
-            print(f"  File: {album_obj.complete_file_path}")
-            print(f"  Error type: {type(ex).__name__}")
-            print(f"  Error message: {str(ex)}")
-            return None
 
+def save_music_information(album_obj: objects.AlbumObject, music_file):
+    """
+    Save the tags of a music file loaded by load_music_information to disk.
+    :param album_obj: AlbumObject of the file
+    :param music_file: File loaded with music_tag
+    :return: True if the file was saved, None if error
+    """
+    try:
+        logger.debug("Saving changes to file: %s", album_obj.complete_file_path)
+        profiler = get_profiler()
+        with profiler.stage("tag_save"):
+            bytes_written = save_music_file(music_file)
+        profiler.add_bytes_written(bytes_written)
+        logger.info("Saved metadata changes: %s", album_obj.complete_file_path)
     except Exception as ex:
-        print(f"ERROR: Failed to set metadata")
-        print(f"  File: {album_obj.complete_file_path}")
-        print(f"  Error type: {type(ex).__name__}")
-        print(f"  Error message: {str(ex)}")
+        logger.error("Failed to save metadata changes to %s: %s: %s",
+                     album_obj.complete_file_path, type(ex).__name__, ex)
         return None
 
     return True
 
 
+def set_tag_if_changed(music_file, tag_name: str, value) -> bool:
+    """
+    Set a tag in the loaded music file, unless it already holds exactly this value.
+    :param music_file: File loaded with music_tag
+    :param tag_name: Name of the tag, e.g. artist
+    :param value: New value of the tag
+    :return: True if the tag was changed
+    """
+    current = music_file[tag_name]
+    if current is not None and current.values == [value]:
+        return False
+    music_file[tag_name] = value
+    return True
+
+
+# File endings of the audio formats supported by music_tag
+AUDIO_FILE_ENDINGS = frozenset({
+    ".aac", ".aif", ".aiff", ".dsf", ".flac", ".m4a", ".mp3",
+    ".oga", ".ogg", ".opus", ".wav", ".wma", ".wv",
+})
+
+
+def iter_music_files(folder_path: str, recursive: bool = True,
+                     file_endings: Optional[Iterable[str]] = AUDIO_FILE_ENDINGS) -> Iterator[os.DirEntry]:
+    """
+    Lazily walk a folder and yield its music files, so processing can start with the first match.
+    Every directory is read with a single os.scandir call, the yielded DirEntry objects
+    carry the file type information of that call and cache their stat result.
+    Entries are yielded sorted by name, files of a folder before its sub-folders.
+    Folders of tracks split from a full album file and moved duplicates are skipped.
+    :param folder_path: Folder to walk
+    :param recursive: Whether to descend into sub-folders
+    :param file_endings: Lower case file endings to yield, None yields every file
+    :return: Iterator[os.DirEntry]
+    """
+    if file_endings is not None:
+        file_endings = frozenset(file_endings)
+
+    pending_dirs = [os.path.abspath(folder_path)]
+    is_root = True
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        try:
+            # The listing of a folder is read completely before yielding, files renamed while
+            # processing it would otherwise show up a second time under their new name
+            with os.scandir(current_dir) as iterator:
+                entries = sorted(iterator, key=lambda dir_entry: dir_entry.name)
+        except OSError as ex:
+            if is_root:
+                raise
+            logger.warning("Could not read folder %s, skipping it: %s", current_dir, ex)
+            continue
+        is_root = False
+        if any(entry.name == SPLIT_MARKER_NAME for entry in entries):
+            continue
+
+        sub_dirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != DUPLICATES_FOLDER_NAME:
+                        sub_dirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if file_endings is None or os.path.splitext(entry.name)[1].lower() in file_endings:
+                yield entry
+
+        if recursive:
+            # Reversed, so the stack hands out the sub-folders in sorted order
+            pending_dirs.extend(reversed(sub_dirs))
+
+
 def list_files(folder_path):
     """
     List all files contains in the folder and sub-folders.
+    Prefer iter_music_files, which does not build the whole list before returning.
     :param folder_path:
     :return: List[string]
     """
-    file_list = []
+    return [entry.path for entry in iter_music_files(folder_path, file_endings=None)]
 
-    for current_dir, subdirs, files in os.walk(folder_path):
-        for filename in files:
-            relative_path = os.path.join(current_dir, filename)
-            absolute_path = os.path.abspath(relative_path)
-            file_list.append(absolute_path)
 
-    return file_list
+def get_album_from_file_path(file_path: string, normalizer: Optional[TitleNormalizer] = None,
+                             genre_resolver: Optional[GenreResolver] = None) -> Optional[AlbumObject]:
+    """
+    Get information from file name and adds to albumObject.
+    Renames file with cleaned file name.
+    :param file_path: Path to the music file
+    :param normalizer: Title cleanup rules, the default rules if not set
+    :param genre_resolver: Genre of the folders, the folder name if not set
+    :return: filled album object, null if error
+    """
+    album_object = parse_filename(file_path, normalizer, genre_resolver)
+    if album_object is None or not apply_rename(album_object):
+        return None
+    return album_object
 
 
-def get_album_from_file_path(file_path: string) -> Optional[AlbumObject]:
+def parse_many(file_paths: Iterable[str], normalizer: Optional[TitleNormalizer] = None,
+               genre_resolver: Optional[GenreResolver] = None,
+               canonical_names: Optional[CanonicalNames] = None) -> Iterator[Optional[AlbumObject]]:
+    """
+    Parse a batch of file names without touching the file system.
+    The names of the batch are split by the filename grammar at once, see split_file_names.
+    :param file_paths: Paths of the music files, only the names are used
+    :param normalizer: Title cleanup rules, the default rules if not set
+    :param genre_resolver: Genre of the folders, the folder name if not set
+    :param canonical_names: Canonical artist and album spellings the parsed names are snapped to
+    :return: One album object per path in the same order, None for names that could not be parsed
+    """
+    if normalizer is None:
+        normalizer = DEFAULT_NORMALIZER
+    if genre_resolver is None:
+        genre_resolver = DEFAULT_GENRE_RESOLVER
+    file_paths = list(file_paths)
+    clean_names = [TextCleaner.clean_special_characters(os.path.basename(file_path)) for file_path in file_paths]
+    for file_path, clean_name, parts in zip(file_paths, clean_names, split_file_names(clean_names)):
+        yield _build_album_object(file_path, clean_name, parts, normalizer, genre_resolver, canonical_names)
+
+
+def parse_filename(file_path: string, normalizer: Optional[TitleNormalizer] = None,
+                   genre_resolver: Optional[GenreResolver] = None,
+                   canonical_names: Optional[CanonicalNames] = None) -> Optional[AlbumObject]:
     """
     Get information from file name and adds to albumObject.
-    Renames file with cleaned file name.
+    Only the path string is inspected, the file itself is neither read nor renamed.
+    :param file_path: Path to the music file
+    :param normalizer: Title cleanup rules, the default rules if not set
+    :param genre_resolver: Genre of the folders, the folder name if not set
+    :param canonical_names: Canonical artist and album spellings the parsed names are snapped to
+    :return: filled album object, null if error
+    """
+    if normalizer is None:
+        normalizer = DEFAULT_NORMALIZER
+    if genre_resolver is None:
+        genre_resolver = DEFAULT_GENRE_RESOLVER
+
+    try:
+        clean_name = TextCleaner.clean_special_characters(os.path.basename(file_path))
+        parts = split_file_name(clean_name)
+    except Exception as ex:
+        logger.error("Unexpected error in parse_filename for %s: %s: %s", file_path, type(ex).__name__, ex)
+        return None
+    return _build_album_object(file_path, clean_name, parts, normalizer, genre_resolver, canonical_names)
+
+
+def _build_album_object(file_path: str, clean_name: str, parts: Optional[FileNameParts],
+                        normalizer: TitleNormalizer, genre_resolver: GenreResolver,
+                        canonical_names: Optional[CanonicalNames]) -> Optional[AlbumObject]:
+    """
+    Fill an album object from the parts of a file name split by the filename grammar.
     :param file_path: Path to the music file
+    :param clean_name: Base name of the file without special characters
+    :param parts: Result of split_file_name for the clean name, None if it could not be split
+    :param normalizer: Title cleanup rules
+    :param genre_resolver: Genre of the folders
+    :param canonical_names: Canonical artist and album spellings the parsed names are snapped to
     :return: filled album object, null if error
     """
     try:
+        if clean_name != os.path.basename(file_path):
+            logger.debug("Cleaned special characters from file name: %r -> %r",
+                         os.path.basename(file_path), clean_name)
+        if parts is None:
+            logger.info("No valid separator, artist, title or file extension found in file name, "
+                        "expected Artist - Title.ending: %s", file_path)
+            return None
+
         album_object = objects.AlbumObject()
         album_object.complete_file_path = file_path
         album_object.file_name = os.path.basename(file_path)
-        album_object.file_ending = album_object.file_name.endswith(file_path)
-
-        folder_path: Path = Path(file_path).parent.absolute()
-
-        # Clean file path from special characters
-        original_file_path = file_path
-        file_path = TextCleaner.clean_special_characters(file_path)
-        if file_path != original_file_path:
-            print(f"INFO: Cleaned special characters from file path")
-            print(f"  Original: {original_file_path}")
-            print(f"  Cleaned: {file_path}")
+        album_object.file_ending = parts.file_ending
 
         # used in clean path for rename
         clean_file_separator = "-"
 
-        separator: string = get_separator_from_filepath(file_path)
-        if separator is None:
-            print(f"ERROR: No valid separator found in file name")
-            print(f"  Expected one of: -, –, or —")
-            print(f"  File: {file_path}")
-            return None
-
-        # Split into artist name and album/track title
-        seperator_index: int = file_path.find(separator)
-        seperator_index_slash: int = file_path.rfind("/")
-
-        if seperator_index <= seperator_index_slash:
-            print(f"ERROR: Invalid file name format")
-            print(f"  Separator found before last directory separator")
-            print(f"  File: {file_path}")
-            return None
-
         # Artist_name ---------
-        artist_name: string = file_path[seperator_index_slash + 1:seperator_index - 1].strip()
-        if not artist_name:
-            print(f"ERROR: Empty artist name after parsing")
-            print(f"  File: {file_path}")
-            return None
-            
-        artist_name = TextCleaner.clean_special_characters(artist_name)
+        artist_name: string = parts.artist
+        if canonical_names is not None:
+            canonical_artist = canonical_names.canonical_artist(artist_name)
+            if canonical_artist != artist_name:
+                logger.debug("Snapped artist name to canonical spelling: %r -> %r", artist_name, canonical_artist)
+                artist_name = canonical_artist
         album_object.artist_name = artist_name
-        print(f"INFO: Extracted artist name: {artist_name}")
+        logger.debug("Extracted artist name: %s", artist_name)
 
-        album_object.file_ending = get_file_ending(file_path)
-        if not album_object.file_ending:
-            print(f"ERROR: No file extension found")
-            print(f"  File: {file_path}")
-            return None
-
-        title_name: string = file_path[seperator_index + 1:].strip()
-        if not title_name:
-            print(f"ERROR: Empty title after parsing")
-            print(f"  File: {file_path}")
-            return None
+        title_name: string = parts.title
 
         # Title ---------
-        title_name = title_name.replace("  ", " ")
-        title_name = title_name.replace("  ", " ")
+        title_name = normalizer.collapse_spaces(title_name)
 
         # Store original title for logging
         original_title = title_name
 
-        title_name = re.sub(r"\[?\(?Full Album\)?]?", "", title_name, flags=re.IGNORECASE)
-        title_name = re.sub(r"\[?\(?complete album\)?]?", "", title_name, flags=re.IGNORECASE)
-        title_name = re.sub(r"\[?\(?High Quality\)?]?", "", title_name, flags=re.IGNORECASE)
-        title_name = re.sub(r"(\[?\(?HQ\s?\)?]?)", "", title_name, flags=re.IGNORECASE)
+        title_name = normalizer.remove_noise_tags(title_name)
 
         if title_name != original_title:
-            print(f"INFO: Removed album/quality tags from title")
-            print(f"  Original: {original_title}")
-            print(f"  Cleaned: {title_name}")
+            logger.debug("Removed album/quality tags from title: %r -> %r", original_title, title_name)
 
         title_name = title_name.strip()
-        file_ending_len = (len(album_object.file_ending))
-        title_name = title_name[:(len(title_name) - file_ending_len)]
-
         album_object.title_name = title_name
 
         # Date ---------
-        year_pattern: string = r"(?:\[|\()?\d{4}(?:\]|\))?"
-        album_date_string: string = re.findall(year_pattern, title_name)
+        album_date_string = normalizer.find_years(title_name)
         if album_date_string:
-            year = re.search(r"\d{4}", album_date_string[0]).group()
+            year = normalizer.year_digits(album_date_string[0])
             album_object.release_year = year
             if len(album_date_string) > 1:
-                print(f"INFO: Multiple years found in title, using first year: {year}")
+                logger.debug("Multiple years found in title, using first year: %s", year)
                 album_object.title_name = title_name
             else:
-                album_object.title_name = re.sub(year_pattern, "", title_name)
+                album_object.title_name = normalizer.remove_years(title_name)
                 album_object.title_name = album_object.title_name.replace("-", "")
-            print(f"INFO: Extracted release year: {year}")
+            logger.debug("Extracted release year: %s", year)
         else:
-            print(f"INFO: No release year found in file name: {file_path}")
+            logger.debug("No release year found in file name: %s", file_path)
 
         # Capitalization handling
-        capital_latters_pattern: string = "[A-Z]{4,}"
-        capital_latters_stings = re.findall(capital_latters_pattern, title_name)
-        if capital_latters_stings:
-            if len(capital_latters_stings) > 1:
-                original_title = album_object.title_name
-                album_object.title_name = album_object.title_name.title()
-                print(f"INFO: Adjusted title capitalization")
-                print(f"  Original: {original_title}")
-                print(f"  Adjusted: {album_object.title_name}")
-
-        print(f"INFO: Final title: {album_object.title_name}")
+        if normalizer.count_capital_words(title_name) > 1:
+            original_title = album_object.title_name
+            album_object.title_name = album_object.title_name.title()
+            logger.debug("Adjusted title capitalization: %r -> %r", original_title, album_object.title_name)
+
+        if canonical_names is not None:
+            title_name = album_object.title_name.strip()
+            canonical_title = canonical_names.canonical_album(artist_name, title_name)
+            if canonical_title != title_name:
+                logger.debug("Snapped title to canonical spelling: %r -> %r", title_name, canonical_title)
+                album_object.title_name = canonical_title
+
+        logger.debug("Final title: %s", album_object.title_name)
 
         # Genre ---------
-        album_object.genre = folder_path.name
-        print(f"INFO: Extracted genre from folder name: {album_object.genre}")
+        album_object.genre = genre_resolver.resolve(os.path.dirname(album_object.complete_file_path))
+        logger.debug("Extracted genre from folder: %s", album_object.genre)
 
         # Create clean file name
         album_object.clean_file_name = (artist_name + " " + clean_file_separator + " "
                                       + album_object.title_name).strip() + album_object.file_ending
 
-        destination_path: string = str(folder_path.absolute()) + "/" + album_object.clean_file_name
-
-        # Rename file using clean file name
-        try:
-            if album_object.complete_file_path != destination_path:
-                os.rename(album_object.complete_file_path, destination_path)
-                print(f"INFO: Renamed file:")
-                print(f"  From: {album_object.complete_file_path}")
-                print(f"  To: {destination_path}")
-                album_object.complete_file_path = destination_path
-        except FileNotFoundError as ex:
-            print(f"ERROR: File not found during rename")
-            print(f"  From: {album_object.complete_file_path}")
-            print(f"  To: {destination_path}")
-            print(f"  Error: {str(ex)}")
-            return None
-        except FileExistsError as ex:
-            print(f"ERROR: Destination file already exists")
-            print(f"  From: {album_object.complete_file_path}")
-            print(f"  To: {destination_path}")
-            print(f"  Error: {str(ex)}")
-            return None
-        except Exception as ex:
-            print(f"ERROR: Failed to rename file")
-            print(f"  From: {album_object.complete_file_path}")
-            print(f"  To: {destination_path}")
-            print(f"  Error: {str(ex)}")
-            return None
-
         return album_object
         
     except Exception as ex:
-        print(f"ERROR: Unexpected error in get_album_from_file_path")
-        print(f"  File: {file_path}")
-        print(f"  Error type: {type(ex).__name__}")
-        print(f"  Error message: {str(ex)}")
+        logger.error("Unexpected error in parse_filename for %s: %s: %s", file_path, type(ex).__name__, ex)
         return None
 
 
+def get_rename_destination(album_object: AlbumObject) -> string:
+    """
+    Get the path the file of a parsed album object is renamed to.
+    :param album_object: Parsed album object
+    :return: Path with the clean file name in the folder of the file
+    """
+    folder_path = os.path.dirname(os.path.abspath(album_object.complete_file_path))
+    return os.path.join(folder_path, album_object.clean_file_name)
+
+
+def apply_rename(album_object: AlbumObject) -> bool:
+    """
+    Rename the file of a parsed album object to its clean file name.
+    If the clean file name is already taken, a number is added to it instead of overwriting.
+    :param album_object: Parsed album object, its path is updated after the rename
+    :return: True if the file has its clean name, False if error
+    """
+    plan = build_rename_plan([album_object])
+    return not execute_rename_plan(plan)
+
+
 def get_file_ending(file_path: string) -> string:
     """
     Get File Ending from Filename
@@ -291,6 +425,6 @@ def get_separator_from_filepath(file_path: string) -> string:
     elif "—" in file_path:
         separator = "—"
     else:
-        print("WARN: No seperator in album file path! " + file_path)
+        logger.debug("No seperator in album file path: %s", file_path)
         return None
     return separator
@@ -0,0 +1,95 @@
+import asyncio
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+_END = object()
+
+
+@dataclass
+class Stage:
+    """A step of the pipeline, blocking steps run on the executor"""
+    name: str
+    func: Callable
+    workers: int = 1
+    blocking: bool = True
+
+
+async def run_pipeline(items: Iterable, stages: List[Stage], consume: Callable,
+                       executor: Optional[Executor] = None, queue_size: int = 16) -> None:
+    """
+    Run items through a chain of stages connected by bounded queues.
+
+    Every stage has its own workers, so waiting for slow storage in one stage overlaps with
+    work in the others. At most queue_size items are in flight between reading an item and
+    consuming its result, which is the backpressure on the source. consume is called in the
+    event loop thread with the results in the order of the input items.
+    :param items: Source of the items, iterated on the executor since reading it may block
+    :param stages: Stages applied in order, each function maps an item to its next form
+    :param consume: Called once per result
+    :param executor: Executor for blocking work, the default executor of the loop if not set
+    :param queue_size: Maximum number of items in flight
+    """
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(queue_size)
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    # Results that finished before an earlier item, keyed by sequence number
+    finished = {}
+
+    async def read_source():
+        iterator = iter(items)
+        sequence = 0
+        while True:
+            await in_flight.acquire()
+            item = await loop.run_in_executor(executor, next, iterator, _END)
+            if item is _END:
+                in_flight.release()
+                break
+            await queues[0].put((sequence, item))
+            sequence += 1
+        for _ in range(stages[0].workers if stages else 1):
+            await queues[0].put(_END)
+
+    async def run_stage(stage_number: int, stage: Stage):
+        input_queue = queues[stage_number]
+        output_queue = queues[stage_number + 1]
+        while True:
+            entry = await input_queue.get()
+            if entry is _END:
+                break
+            sequence, item = entry
+            if stage.blocking:
+                item = await loop.run_in_executor(executor, stage.func, item)
+            else:
+                item = stage.func(item)
+            await output_queue.put((sequence, item))
+
+    async def finish_stage(stage_number: int, stage: Stage):
+        workers = [asyncio.create_task(run_stage(stage_number, stage)) for _ in range(stage.workers)]
+        await asyncio.gather(*workers)
+        next_workers = stages[stage_number + 1].workers if stage_number + 1 < len(stages) else 1
+        for _ in range(next_workers):
+            await queues[stage_number + 1].put(_END)
+
+    async def collect():
+        next_sequence = 0
+        output_queue = queues[-1]
+        while True:
+            entry = await output_queue.get()
+            if entry is _END:
+                break
+            sequence, result = entry
+            finished[sequence] = result
+            while next_sequence in finished:
+                consume(finished.pop(next_sequence))
+                next_sequence += 1
+                in_flight.release()
+
+    tasks = [asyncio.create_task(read_source())]
+    tasks += [asyncio.create_task(finish_stage(number, stage)) for number, stage in enumerate(stages)]
+    tasks.append(asyncio.create_task(collect()))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,320 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import music_tag
+
+from logic.log import get_logger
+
+logger = get_logger(__name__)
+
+# Minimum Dice coefficient of the trigrams of two names to count them as the same name
+ARTIST_SIMILARITY = 0.75
+ALBUM_SIMILARITY = 0.8
+# Number of looked up names whose canonical spelling is remembered
+LOOKUP_CACHE_SIZE = 65536
+
+DIGITS_PATTERN = re.compile(r"\d+")
+
+
+def name_key(name: str) -> str:
+    """
+    Key of a name for exact lookups, ignoring case and repeated whitespace.
+    :param name: Artist or album name
+    :return: Normalized key
+    """
+    return " ".join(name.casefold().split())
+
+
+def trigrams(key: str) -> frozenset:
+    """
+    Character trigrams of a key, padded so short names still have trigrams.
+    :param key: Normalized name
+    :return: Set of trigrams
+    """
+    padded = f" {key} "
+    return frozenset(padded[index:index + 3] for index in range(len(padded) - 2))
+
+
+class NameIndex:
+    """
+    Canonical spellings of one kind of names, e.g. artists.
+
+    Exact matches, ignoring case and whitespace, are a dictionary lookup. Other names are matched
+    through an inverted trigram index: only names sharing one of the rarest trigrams of the searched
+    name are compared, so the cost depends on the number of similar names, not on the size of the index.
+    """
+
+    def __init__(self, similarity: float = ARTIST_SIMILARITY, cache_size: int = LOOKUP_CACHE_SIZE):
+        self.similarity = similarity
+        # key -> [canonical spelling, number of times it was seen]
+        self._names: Dict[str, list] = {}
+        # key -> number of times every spelling was seen
+        self._spellings: Dict[str, Counter] = {}
+        # key of a variant spelling -> key of the canonical name
+        self._aliases: Dict[str, str] = {}
+        self._keys: List[str] = []
+        self._trigrams: List[frozenset] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._lookup_cached = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name: str, count: int = 1):
+        """
+        Add a spelling of a name. Of spellings differing only in case the most frequent one is canonical.
+        :param name: Artist or album name
+        :param count: Number of files with this spelling
+        """
+        name = " ".join(name.split())
+        key = name_key(name)
+        if not key:
+            return
+        entry = self._names.get(key)
+        if entry is None:
+            self._names[key] = [name, count]
+            grams = trigrams(key)
+            position = len(self._keys)
+            self._keys.append(key)
+            self._trigrams.append(grams)
+            for gram in grams:
+                self._postings[gram].append(position)
+        else:
+            entry[1] += count
+        spellings = self._spellings.setdefault(key, Counter())
+        spellings[name] += count
+        self._names[key][0] = spellings.most_common(1)[0][0]
+        self._lookup_cached.cache_clear()
+
+    def iter_spellings(self) -> Iterator[Tuple[str, int]]:
+        """
+        :return: Iterator over (spelling, count) of every spelling that was added
+        """
+        for spellings in self._spellings.values():
+            yield from spellings.items()
+
+    def iter_canonical(self) -> Iterator[Tuple[str, int]]:
+        """
+        :return: Iterator over (canonical spelling, count) sorted by name, misspellings are left out
+        """
+        for key, (name, count) in sorted(self._names.items()):
+            if key not in self._aliases:
+                yield name, count
+
+    def merge_similar(self):
+        """
+        Treat similar names as misspellings of the most frequent one,
+        e.g. "Gorilaz" seen once becomes an alias of "Gorillaz" seen a hundred times.
+        """
+        by_frequency = sorted(self._names, key=lambda key: -self._names[key][1])
+        canonical_keys = set()
+        for key in by_frequency:
+            match = self._best_match(key, canonical_keys)
+            if match is None:
+                canonical_keys.add(key)
+            else:
+                self._aliases[key] = match
+                self._names[match][1] += self._names[key][1]
+        self._lookup_cached.cache_clear()
+        logger.info("Merged %d of %d names into similar names", len(self._aliases), len(self._names))
+
+    def lookup(self, name: str) -> Optional[str]:
+        """
+        Get the canonical spelling of a name.
+        :param name: Artist or album name as parsed from a file name
+        :return: Canonical spelling, None if no similar name is known
+        """
+        return self._lookup_cached(name)
+
+    def canonicalize(self, name: str) -> str:
+        """
+        Snap a name to its canonical spelling.
+        :param name: Artist or album name
+        :return: Canonical spelling, the name itself if it is unknown
+        """
+        canonical = self.lookup(name)
+        return name if canonical is None else canonical
+
+    def cache_info(self):
+        """Hits and misses of the lookup cache"""
+        return self._lookup_cached.cache_info()
+
+    def _lookup(self, name: str) -> Optional[str]:
+        key = name_key(name)
+        if not key:
+            return None
+        if key not in self._names:
+            key = self._best_match(key)
+            if key is None:
+                return None
+        key = self._aliases.get(key, key)
+        return self._names[key][0]
+
+    def _best_match(self, key: str, allowed_keys: Optional[set] = None) -> Optional[str]:
+        grams = trigrams(key)
+        if not grams:
+            return None
+        # A similar name shares at least min_shared trigrams, so it has one of the
+        # len(grams) - min_shared + 1 rarest trigrams. Only their postings are read.
+        min_shared = max(1, math.ceil(self.similarity * len(grams) / (2 - self.similarity)))
+        rarest = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(grams) - min_shared + 1]:
+            candidates.update(self._postings.get(gram, ()))
+
+        digits = DIGITS_PATTERN.findall(key)
+        min_length = self.similarity * len(grams) / (2 - self.similarity)
+        max_length = len(grams) * (2 - self.similarity) / self.similarity
+        best_key = None
+        best_score = self.similarity
+        for position in candidates:
+            candidate_grams = self._trigrams[position]
+            if not min_length <= len(candidate_grams) <= max_length:
+                continue
+            score = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+            if score < best_score:
+                continue
+            candidate = self._keys[position]
+            if candidate == key or (allowed_keys is not None and candidate not in allowed_keys):
+                continue
+            # Names that only differ in a number, e.g. "Live 1998" and "Live 1999", are different names
+            if DIGITS_PATTERN.findall(candidate) != digits:
+                continue
+            if score > best_score or best_key is None or self._names[candidate][1] > self._names[best_key][1]:
+                best_key, best_score = candidate, score
+        return best_key
+
+
+class CanonicalNames:
+    """
+    Offline index of canonical artist and album names, built from a dump or from the tags of a library.
+    Albums are looked up among the albums of the canonical artist.
+    """
+
+    def __init__(self, cache_size: int = LOOKUP_CACHE_SIZE):
+        self.artists = NameIndex(ARTIST_SIMILARITY, cache_size)
+        self._albums: Dict[str, NameIndex] = {}
+        self._cache_size = cache_size
+
+    def add(self, artist: str, album: Optional[str] = None, count: int = 1):
+        """
+        Add an artist and optionally one of their albums.
+        :param artist: Artist name
+        :param album: Album name
+        :param count: Number of files with these names
+        """
+        if not artist or not artist.strip():
+            return
+        self.artists.add(artist, count)
+        if album and album.strip():
+            albums = self._albums.get(name_key(artist))
+            if albums is None:
+                albums = self._albums[name_key(artist)] = NameIndex(ALBUM_SIMILARITY, self._cache_size)
+            albums.add(album, count)
+
+    def merge_similar(self):
+        """Merge misspelled artists and albums into their most frequent similar spelling"""
+        self.artists.merge_similar()
+        merged_albums: Dict[str, NameIndex] = {}
+        for artist_key, albums in self._albums.items():
+            canonical_key = name_key(self.artists.canonicalize(artist_key))
+            target = merged_albums.get(canonical_key)
+            if target is None:
+                merged_albums[canonical_key] = albums
+            else:
+                for spelling, count in albums.iter_spellings():
+                    target.add(spelling, count)
+        for albums in merged_albums.values():
+            albums.merge_similar()
+        self._albums = merged_albums
+
+    def canonical_artist(self, artist: str) -> str:
+        """
+        :param artist: Artist name as parsed from a file name
+        :return: Canonical spelling, the name itself if it is unknown
+        """
+        return self.artists.canonicalize(artist)
+
+    def canonical_album(self, artist: str, album: str) -> str:
+        """
+        :param artist: Canonical artist name
+        :param album: Album name as parsed from a file name
+        :return: Canonical spelling, the name itself if it is unknown
+        """
+        albums = self._albums.get(name_key(artist))
+        if albums is None:
+            return album
+        return albums.canonicalize(album)
+
+    def iter_names(self) -> Iterator[Tuple[str, Optional[str], int]]:
+        """
+        :return: Iterator over (artist, album, count) of all canonical names, album is None for artists without albums
+        """
+        for artist, artist_count in self.artists.iter_canonical():
+            albums = self._albums.get(name_key(artist))
+            album_names = list(albums.iter_canonical()) if albums is not None else []
+            if not album_names:
+                yield artist, None, artist_count
+            for album, album_count in album_names:
+                yield artist, album, album_count
+
+    @classmethod
+    def from_dump(cls, dump_path: str) -> "CanonicalNames":
+        """
+        Load names from a tab separated dump, one "artist<TAB>album<TAB>count" per line.
+        Album and count are optional, lines starting with # are ignored.
+        :param dump_path: Path to the dump
+        :return: CanonicalNames
+        """
+        names = cls()
+        with open(dump_path, encoding="utf-8") as dump_file:
+            for line_number, line in enumerate(dump_file, 1):
+                line = line.rstrip("\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                fields = line.split("\t")
+                count = 1
+                if len(fields) > 2 and fields[2].strip():
+                    try:
+                        count = int(fields[2])
+                    except ValueError:
+                        raise ValueError(f"Invalid count in line {line_number} of {dump_path}: {fields[2]!r}")
+                names.add(fields[0], fields[1] if len(fields) > 1 else None, count)
+        logger.info("Loaded %d canonical artists from %s", len(names.artists), dump_path)
+        return names
+
+    @classmethod
+    def from_tags(cls, file_paths: Iterable[str]) -> "CanonicalNames":
+        """
+        Collect the artist and album tags of music files, misspellings are merged into the most frequent spelling.
+        :param file_paths: Paths of the music files
+        :return: CanonicalNames
+        """
+        names = cls()
+        for file_path in file_paths:
+            try:
+                music_file = music_tag.load_file(file_path)
+                artist = music_file["artist"].value
+                album = music_file["album"].value
+            except Exception as ex:
+                logger.warning("Failed to read tags of %s: %s: %s", file_path, type(ex).__name__, ex)
+                continue
+            names.add(str(artist), str(album))
+        names.merge_similar()
+        return names
+
+    def export_dump(self, dump_path: str):
+        """
+        Write all canonical names as tab separated dump, see from_dump.
+        :param dump_path: Path to the dump
+        """
+        temp_path = dump_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as dump_file:
+            dump_file.write("# artist\talbum\tcount\n")
+            for artist, album, count in self.iter_names():
+                dump_file.write(f"{artist}\t{album or ''}\t{count}\n")
+        os.replace(temp_path, dump_path)
@@ -0,0 +1,176 @@
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from logic.log import get_logger
+from logic.objects import AlbumObject
+
+logger = get_logger(__name__)
+
+# Number of recorded files after which the pending changes are committed to disk
+COMMIT_INTERVAL = 500
+
+# Columns the entries can be filtered and grouped by
+QUERY_COLUMNS = ("artist", "title", "year", "decade", "genre", "file_ending")
+
+
+@dataclass
+class CatalogEntry:
+    """One album file of the catalog"""
+    path: str
+    artist: str
+    title: str
+    year: Optional[int]
+    genre: str
+    file_ending: str
+    size: Optional[int]
+    # Length in seconds, None if the tags of the file were never loaded
+    duration: Optional[float]
+
+    @property
+    def decade(self) -> Optional[int]:
+        """First year of the decade, e.g. 1990"""
+        return self.year - self.year % 10 if self.year is not None else None
+
+
+def parse_year(release_year: str) -> Optional[int]:
+    """
+    :param release_year: Release year of an album object, may hold a full date
+    :return: Year as number, None if it has none
+    """
+    year_text = (release_year or "").strip()[:4]
+    return int(year_text) if len(year_text) == 4 and year_text.isdigit() else None
+
+
+class Catalog:
+    """
+    Queryable catalog of the parsed library, one row per album file.
+
+    The catalog is filled while a run processes the files, so listing all albums of a genre and decade
+    is an index lookup instead of another walk over the library with its tags loaded.
+    Artist, title and genre are compared ignoring case.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending = 0
+        # Files are recorded from worker threads, access is serialized by the lock
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS albums ("
+            " path TEXT PRIMARY KEY,"
+            " artist TEXT NOT NULL COLLATE NOCASE,"
+            " title TEXT NOT NULL COLLATE NOCASE,"
+            " year INTEGER,"
+            " decade INTEGER,"
+            " genre TEXT NOT NULL COLLATE NOCASE,"
+            " file_ending TEXT NOT NULL,"
+            " size INTEGER,"
+            " duration REAL"
+            ") WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS albums_artist ON albums (artist, title);"
+            "CREATE INDEX IF NOT EXISTS albums_title ON albums (title);"
+            "CREATE INDEX IF NOT EXISTS albums_genre ON albums (genre, decade, year);"
+            "CREATE INDEX IF NOT EXISTS albums_decade ON albums (decade, year);"
+        )
+        self._connection.commit()
+
+    def record(self, album_obj: AlbumObject, size: Optional[int] = None, duration: Optional[float] = None,
+               previous_path: Optional[str] = None):
+        """
+        Add or update the entry of a file. Size and duration that are not known keep their stored values.
+        :param album_obj: Parsed album object, its complete file path is the key
+        :param size: Size of the file in bytes
+        :param duration: Length of the file in seconds
+        :param previous_path: Path of the file before it was renamed, its entry is removed
+        """
+        path = os.path.abspath(album_obj.complete_file_path)
+        year = parse_year(album_obj.release_year)
+        with self._lock:
+            if previous_path is not None and os.path.abspath(previous_path) != path:
+                self._connection.execute("DELETE FROM albums WHERE path = ?", (os.path.abspath(previous_path),))
+            self._connection.execute(
+                "INSERT INTO albums (path, artist, title, year, decade, genre, file_ending, size, duration)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (path) DO UPDATE SET"
+                " artist = excluded.artist, title = excluded.title, year = excluded.year,"
+                " decade = excluded.decade, genre = excluded.genre, file_ending = excluded.file_ending,"
+                " size = coalesce(excluded.size, albums.size),"
+                " duration = coalesce(excluded.duration, albums.duration)",
+                (path, (album_obj.artist_name or "").strip(), (album_obj.title_name or "").strip(), year,
+                 year - year % 10 if year is not None else None, (album_obj.genre or "").strip(),
+                 album_obj.file_ending or "", size, duration)
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_INTERVAL:
+                self._connection.commit()
+                self._pending = 0
+
+    def query(self, artist: Optional[str] = None, title: Optional[str] = None, genre: Optional[str] = None,
+              decade: Optional[int] = None, year: Optional[int] = None,
+              limit: Optional[int] = None) -> List[CatalogEntry]:
+        """
+        Find the entries matching all given fields, ordered by artist, year and title.
+        :param artist: Artist name, compared ignoring case
+        :param title: Album title, compared ignoring case
+        :param genre: Genre, compared ignoring case
+        :param decade: Any year of the decade, e.g. 1990 or 1994
+        :param year: Release year
+        :param limit: Maximum number of entries, all if not set
+        :return: Matching entries
+        """
+        conditions, parameters = [], []
+        for column, value in (("artist", artist), ("title", title), ("genre", genre), ("year", year)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if decade is not None:
+            conditions.append("decade = ?")
+            parameters.append(decade - decade % 10)
+
+        sql = "SELECT path, artist, title, year, genre, file_ending, size, duration FROM albums"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY artist, year, title, path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        with self._lock:
+            rows = self._connection.execute(sql, parameters).fetchall()
+        return [CatalogEntry(*row) for row in rows]
+
+    def count_by(self, columns: Sequence[str]) -> List[Tuple]:
+        """
+        Count the entries per value of the given columns, e.g. per genre and decade.
+        :param columns: Names of columns from QUERY_COLUMNS
+        :return: Tuples of the column values followed by the number of entries and their total duration
+        """
+        columns = list(columns)
+        unknown = [column for column in columns if column not in QUERY_COLUMNS]
+        if not columns or unknown:
+            raise ValueError(f"Can only count by {', '.join(QUERY_COLUMNS)}")
+        column_list = ", ".join(columns)
+        with self._lock:
+            return self._connection.execute(
+                f"SELECT {column_list}, count(*), coalesce(sum(duration), 0) FROM albums"
+                f" GROUP BY {column_list} ORDER BY {column_list}"
+            ).fetchall()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT count(*) FROM albums").fetchone()[0]
+
+    def close(self):
+        """Commit pending changes and close the catalog"""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
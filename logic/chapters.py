@@ -0,0 +1,262 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional, Tuple
+
+from mutagen.flac import FLAC
+from mutagen.id3 import CHAP, CTOC, CTOCFlags, ID3, TIT2
+from mutagen.ogg import OggFileType
+
+from logic.log import get_logger
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+logger = get_logger(__name__)
+
+# Sidecar files written next to the audio file by downloaders like yt-dlp
+DESCRIPTION_SUFFIX = ".description"
+INFO_JSON_SUFFIX = ".info.json"
+
+TIMESTAMP_PATTERN = re.compile(r"(?<![\d:])(?:(\d{1,2}):)?(\d{1,2}):(\d{2})(?![\d:])")
+# Brackets, separators and track numbers left around a chapter title once its timestamp is removed
+EMPTY_BRACKETS_PATTERN = re.compile(r"[\[(][\s\-–—]*[\])]")
+TITLE_PREFIX_PATTERN = re.compile(r"^[\s\-–—|:.,]*(?:\d{1,3}[.)]\s+)?[\s\-–—|:.]*")
+TITLE_SUFFIX_PATTERN = re.compile(r"[\s\-–—|:,]*$")
+
+
+@dataclass
+class Chapter:
+    """A track of a full album file"""
+    start_ms: int
+    title: str
+
+
+def timestamp_to_ms(match: re.Match) -> int:
+    """
+    :param match: Match of TIMESTAMP_PATTERN
+    :return: Timestamp in milliseconds
+    """
+    hours, minutes, seconds = match.groups()
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000
+
+
+def format_timestamp(milliseconds: int) -> str:
+    """
+    :param milliseconds: Position in the file
+    :return: Timestamp as HH:MM:SS.mmm, the format of Vorbis chapter tags
+    """
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+def clean_chapter_title(title: str) -> str:
+    """
+    :param title: Text around a timestamp of a tracklist
+    :return: Title without track number, brackets and separators
+    """
+    title = EMPTY_BRACKETS_PATTERN.sub(" ", title)
+    title = TITLE_PREFIX_PATTERN.sub("", title)
+    title = TITLE_SUFFIX_PATTERN.sub("", title).strip()
+    # Closing bracket of a tracklist inside brackets, e.g. "(00:00 Intro 03:12 Outro)"
+    for opening, closing in (("(", ")"), ("[", "]")):
+        if title.endswith(closing) and title.count(closing) > title.count(opening):
+            title = title[:-1].rstrip()
+        if title.startswith(opening) and title.count(opening) > title.count(closing):
+            title = title[1:].lstrip()
+    return title
+
+
+def parse_tracklist(text: str) -> List[Chapter]:
+    """
+    Find a tracklist with timestamps in a text, e.g. a video description.
+    Lines like "00:00 Intro", "1. Intro - 0:00" or "Intro (1:02:03)" each start a chapter,
+    on a single line every timestamp starts a chapter titled by the text following it.
+    Lists of track lengths instead of start times are summed up.
+    :param text: Description, title or other text
+    :return: Chapters ordered by start, empty if no tracklist with at least two tracks was found
+    """
+    if not text:
+        return []
+
+    entries: List[Tuple[int, str]] = []
+    lines = [line for line in text.splitlines() if TIMESTAMP_PATTERN.search(line)]
+    if len(lines) > 1:
+        for line in lines:
+            match = TIMESTAMP_PATTERN.search(line)
+            # Further timestamps of the line are end times, e.g. "00:00 - 03:12 Intro"
+            title = TIMESTAMP_PATTERN.sub(" ", line)
+            entries.append((timestamp_to_ms(match), clean_chapter_title(title)))
+    else:
+        matches = list(TIMESTAMP_PATTERN.finditer(text))
+        for position, match in enumerate(matches):
+            end = matches[position + 1].start() if position + 1 < len(matches) else len(text)
+            entries.append((timestamp_to_ms(match), clean_chapter_title(text[match.end():end])))
+
+    if len(entries) < 2:
+        return []
+
+    starts = [start for start, _ in entries]
+    if any(later <= earlier for earlier, later in zip(starts, starts[1:])):
+        if starts[0] == 0:
+            logger.debug("Ignoring tracklist with unordered timestamps")
+            return []
+        # Track lengths, each track starts where the previous one ended
+        total = 0
+        for position, length in enumerate(starts):
+            starts[position] = total
+            total += length
+
+    return [Chapter(start, title or f"Track {number}")
+            for number, (start, (_, title)) in enumerate(zip(starts, entries), 1)]
+
+
+def read_info_json(info_path: str) -> Tuple[List[Chapter], Optional[str]]:
+    """
+    Read the chapters and the description of a yt-dlp .info.json file.
+    With ijson installed the file is streamed, so the large format lists of the file are never held in memory.
+    :param info_path: Path to the .info.json file
+    :return: Tuple of chapters, empty if the file has none, and the description
+    """
+    with open(info_path, "rb") as info_file:
+        if ijson is not None:
+            return _stream_info_json(info_file)
+        info = json.load(info_file)
+
+    chapters = []
+    for chapter in info.get("chapters") or []:
+        if isinstance(chapter, dict) and chapter.get("start_time") is not None:
+            chapters.append(Chapter(int(float(chapter["start_time"]) * 1000), str(chapter.get("title") or "")))
+    description = info.get("description")
+    return _numbered(chapters), description if isinstance(description, str) else None
+
+
+def _stream_info_json(info_file: BinaryIO) -> Tuple[List[Chapter], Optional[str]]:
+    chapters = []
+    description = None
+    start_time = title = None
+    try:
+        for prefix, event, value in ijson.parse(info_file):
+            if prefix == "description" and event == "string":
+                description = value
+            elif prefix == "chapters.item.start_time" and event == "number":
+                start_time = value
+            elif prefix == "chapters.item.title" and event == "string":
+                title = value
+            elif prefix == "chapters.item" and event == "end_map":
+                if start_time is not None:
+                    chapters.append(Chapter(int(float(start_time) * 1000), title or ""))
+                start_time = title = None
+    except ijson.JSONError as ex:
+        # Same error as json.load raises for a broken file
+        raise ValueError(f"Invalid JSON: {ex}") from ex
+    return _numbered(chapters), description
+
+
+def _numbered(chapters: List[Chapter]) -> List[Chapter]:
+    for number, chapter in enumerate(chapters, 1):
+        if not chapter.title:
+            chapter.title = f"Track {number}"
+    return chapters if len(chapters) > 1 else []
+
+
+def find_chapters(file_path: str) -> List[Chapter]:
+    """
+    Find the tracklist of a full album file in its sidecar files or its name.
+    The chapters of a .info.json file are used first, then timestamps in its description,
+    in a .description file and in the file name.
+    :param file_path: Path to the music file, before it is renamed
+    :return: Chapters ordered by start, empty if no tracklist was found
+    """
+    stem = os.path.splitext(file_path)[0]
+
+    info_path = stem + INFO_JSON_SUFFIX
+    if os.path.isfile(info_path):
+        try:
+            chapters, description = read_info_json(info_path)
+            if not chapters:
+                chapters = parse_tracklist(description)
+            if chapters:
+                return chapters
+        except (OSError, ValueError) as ex:
+            logger.warning("Failed to read %s: %s: %s", info_path, type(ex).__name__, ex)
+
+    description_path = stem + DESCRIPTION_SUFFIX
+    if os.path.isfile(description_path):
+        try:
+            with open(description_path, encoding="utf-8", errors="replace") as description_file:
+                chapters = parse_tracklist(description_file.read())
+            if chapters:
+                return chapters
+        except OSError as ex:
+            logger.warning("Failed to read %s: %s", description_path, ex)
+
+    return parse_tracklist(os.path.basename(stem))
+
+
+def write_chapters(music_file, chapters: List[Chapter]) -> bool:
+    """
+    Set chapter markers on a file loaded with music_tag, nothing is written to disk.
+    Ogg and FLAC files get CHAPTERxxx/CHAPTERxxxNAME comments, MP3 files ID3 CHAP frames and a CTOC frame.
+    :param music_file: File loaded with music_tag
+    :param chapters: Chapters ordered by start
+    :return: True if the chapters of the file changed
+    """
+    mutagen_file = music_file.mfile
+    tags = getattr(mutagen_file, "tags", None)
+    if tags is None:
+        return False
+
+    if isinstance(tags, ID3):
+        return _write_id3_chapters(tags, chapters, int(mutagen_file.info.length * 1000))
+    if isinstance(mutagen_file, (OggFileType, FLAC)):
+        return _write_vorbis_chapters(tags, chapters)
+    logger.debug("Chapters are not supported for %s", type(mutagen_file).__name__)
+    return False
+
+
+def _write_vorbis_chapters(tags, chapters: List[Chapter]) -> bool:
+    wanted = {}
+    for number, chapter in enumerate(chapters, 1):
+        wanted[f"CHAPTER{number:03d}"] = [format_timestamp(chapter.start_ms)]
+        wanted[f"CHAPTER{number:03d}NAME"] = [chapter.title]
+    existing = {key.upper(): list(values) for key, values in tags.as_dict().items()
+                if key.upper().startswith("CHAPTER")}
+    if existing == wanted:
+        return False
+
+    for key in existing:
+        del tags[key]
+    for key, values in wanted.items():
+        tags[key] = values
+    return True
+
+
+def _write_id3_chapters(tags, chapters: List[Chapter], length_ms: int) -> bool:
+    wanted = []
+    for number, chapter in enumerate(chapters):
+        end_ms = chapters[number + 1].start_ms if number + 1 < len(chapters) else max(length_ms, chapter.start_ms)
+        wanted.append((f"chp{number}", chapter.start_ms, end_ms, chapter.title))
+    existing = sorted(
+        ((frame.element_id, frame.start_time, frame.end_time, str(frame.sub_frames.get("TIT2", "")))
+         for frame in tags.getall("CHAP")),
+        key=lambda entry: entry[1]
+    )
+    if existing == wanted and tags.getall("CTOC"):
+        return False
+
+    tags.delall("CHAP")
+    tags.delall("CTOC")
+    for element_id, start_ms, end_ms, title in wanted:
+        tags.add(CHAP(element_id=element_id, start_time=start_ms, end_time=end_ms,
+                      start_offset=0xFFFFFFFF, end_offset=0xFFFFFFFF,
+                      sub_frames=[TIT2(encoding=3, text=[title])]))
+    tags.add(CTOC(element_id="toc", flags=CTOCFlags.TOP_LEVEL | CTOCFlags.ORDERED,
+                  child_element_ids=[entry[0] for entry in wanted],
+                  sub_frames=[TIT2(encoding=3, text=["Tracklist"])]))
+    return True
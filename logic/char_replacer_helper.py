@@ -1,27 +1,90 @@
 import unicodedata
+from typing import Dict, Optional
+
+# Marks YouTube rippers add to underline or decorate letters, removed after NFD decomposition
+DECORATION_MARKS = (
+    "̠",  # COMBINING MINUS SIGN BELOW
+    "̤",  # COMBINING DIAERESIS BELOW
+    "̱",  # COMBINING MACRON BELOW
+    "̲",  # COMBINING LOW LINE
+    "̳",  # COMBINING DOUBLE LOW LINE
+    "̵",  # COMBINING SHORT STROKE OVERLAY
+    "̶",  # COMBINING LONG STROKE OVERLAY
+    "̸",  # COMBINING LONG SOLIDUS OVERLAY
+    "͟",  # COMBINING DOUBLE MACRON BELOW
+)
+
+# Characters removed before anything else
+REMOVED_CHARACTERS = "_∙"
+
+# Ranges of look-alike glyphs that are mapped to their plain compatibility form
+LOOKALIKE_RANGES = (
+    (0x1D400, 0x1D7FF),  # Mathematical alphanumeric symbols, e.g. 𝐁𝐨𝐥𝐝
+    (0xFF01, 0xFF5E),  # Fullwidth ASCII forms, e.g. Ｆｕｌｌ
+    (0x24B6, 0x24E9),  # Circled letters, e.g. Ⓐ
+)
+
+
+class _CombiningDeletionMap(dict):
+    """Translation table deleting combining characters, each character is classified only once"""
+
+    def __missing__(self, code_point: int) -> Optional[int]:
+        value = None if unicodedata.combining(chr(code_point)) else code_point
+        self[code_point] = value
+        return value
+
+
+def _build_lookalike_table() -> Dict[int, str]:
+    table = {}
+    for first, last in LOOKALIKE_RANGES:
+        for code_point in range(first, last + 1):
+            char = chr(code_point)
+            plain = unicodedata.normalize("NFKC", char)
+            if plain != char and plain.isascii():
+                table[code_point] = plain
+    return table
+
 
 class TextCleaner:
+    # Applied to the raw text: removed characters and look-alike glyphs
+    _prepare_table: Dict[int, Optional[str]] = {
+        **_build_lookalike_table(),
+        **str.maketrans("", "", REMOVED_CHARACTERS),
+    }
+    # Applied to the NFD decomposed text
+    _decoration_table: Dict[int, None] = str.maketrans("", "", "".join(DECORATION_MARKS))
+    # Applied to the recomposed text, removes marks that could not be combined with a letter
+    _combining_table: Dict[int, Optional[int]] = _CombiningDeletionMap()
+
+    @classmethod
+    def register_lookalikes(cls, mapping: Dict[str, str]):
+        """
+        Add look-alike characters that are replaced by their plain equivalent.
+
+        Args:
+            mapping (Dict[str, str]): Single characters mapped to their replacement
+        """
+        cls._prepare_table.update(str.maketrans(mapping))
+
     @staticmethod
     def clean_special_characters(text: str) -> str:
         """
         Clean special characters from text, replacing them with their standard equivalents.
-        
+
+        Every step is a str.translate or unicodedata.normalize call on the whole text:
+        look-alike glyphs are mapped to plain letters, decoration marks are removed from the
+        decomposed text, letters are recomposed and remaining combining characters are dropped.
+        Regular accents like the umlaut in Järvi are kept.
+
         Args:
             text (str): The text to clean
             
         Returns:
             str: The cleaned text
         """
-        # Basic cleanup
-        text = text.replace("̤", "")  # U+0324 COMBINING DIAERESIS BELOW
-        text = text.replace("̲", "")  # U+0332 COMBINING LOW LINE
-        text = text.replace("͟", "")  # U+035F COMBINING DOUBLE MACRON BELOW
-        text = text.replace("_", "")
-        text = text.replace("∙", "")
-        
-        # Replace special characters with their normal equivalents
-        # Uppercase
-        # Remove any remaining combining characters
-        text = ''.join(c for c in text if not unicodedata.combining(c))
-        
-        return text.strip() 
\ No newline at end of file
+        text = text.translate(TextCleaner._prepare_table)
+        if not text.isascii():
+            text = unicodedata.normalize("NFD", text).translate(TextCleaner._decoration_table)
+            text = unicodedata.normalize("NFC", text).translate(TextCleaner._combining_table)
+
+        return text.strip()
@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from logic.log import get_logger
+from logic.objects import AlbumObject
+
+logger = get_logger(__name__)
+
+# Stored in the root of the processed library while a run is in progress
+CHECKPOINT_FILE_NAME = ".fullalbumindexer.checkpoint"
+
+CHECKPOINT_VERSION = 1
+
+# The checkpoint is written after this many finished files or seconds, whichever comes first
+CHECKPOINT_INTERVAL = 100
+CHECKPOINT_SECONDS = 30.0
+
+
+def folder_key(folder_path: str, root_path: str) -> Tuple[str, ...]:
+    """
+    Position of a folder in the walk of iter_music_files. The walk visits folders depth first
+    in name order, which is the order of their relative path components.
+    :param folder_path: Folder inside the library
+    :param root_path: Root folder of the music library
+    :return: Tuple of the path components relative to the root, empty for the root itself
+    """
+    relative_path = os.path.relpath(os.path.abspath(folder_path), root_path)
+    return () if relative_path == os.curdir else tuple(relative_path.split(os.sep))
+
+
+class Checkpoint:
+    """
+    Progress of a run, so an interrupted run can be resumed where it stopped.
+
+    Files are reported in the order of the walk, so the progress is a cursor: the folder of the
+    last finished file and the names finished in it. Every folder before the cursor is done.
+    Files that were already renamed but not yet tagged keep their parsed fields, a resumed run uses
+    them instead of parsing the clean name again, which lost the noise tags and the year.
+    The checkpoint is replaced atomically, a crash leaves either the old or the new one.
+    """
+
+    def __init__(self, checkpoint_path: str, root_path: str):
+        self.checkpoint_path = checkpoint_path
+        self.root_path = os.path.abspath(root_path)
+        self._lock = threading.Lock()
+        self._folder: Optional[Tuple[str, ...]] = None
+        self._done: Set[str] = set()
+        # Relative folder to the file names and fields of its renamed files that are not finished yet
+        self._renamed: Dict[Tuple[str, ...], Dict[str, dict]] = {}
+        self._pending = 0
+        self._saved_at = time.monotonic()
+        self._closed = False
+
+    @classmethod
+    def for_folder(cls, folder_path: str, shard_name: Optional[str] = None) -> "Checkpoint":
+        """
+        Get the checkpoint stored in the root of the given library folder.
+        :param folder_path: Root folder of the music library
+        :param shard_name: Name of the shard of a sharded run, every shard keeps its own checkpoint
+        :return: Checkpoint
+        """
+        if shard_name is not None:
+            base_name, ending = os.path.splitext(CHECKPOINT_FILE_NAME)
+            return cls(os.path.join(folder_path, f"{base_name}.{shard_name}{ending}"), folder_path)
+        return cls(os.path.join(folder_path, CHECKPOINT_FILE_NAME), folder_path)
+
+    def exists(self) -> bool:
+        """Check if an earlier run was interrupted"""
+        return os.path.exists(self.checkpoint_path)
+
+    def load(self) -> bool:
+        """
+        Continue from the checkpoint of an interrupted run.
+        :return: True if a checkpoint was found
+        """
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as checkpoint_file:
+                state = json.load(checkpoint_file)
+        except FileNotFoundError:
+            return False
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version in {self.checkpoint_path}")
+        with self._lock:
+            self._folder = tuple(state["folder"]) if state.get("folder") is not None else None
+            self._done = set(state.get("done", []))
+            self._renamed = {tuple(folder.split("/")) if folder else (): albums
+                             for folder, albums in state.get("renamed", {}).items()}
+        return True
+
+    @property
+    def cursor(self) -> Optional[Tuple[str, ...]]:
+        """Relative path components of the folder of the last finished file, None before the first one"""
+        return self._folder
+
+    def is_finished_folder(self, folder_path: str) -> bool:
+        """
+        :param folder_path: Folder inside the library
+        :return: True if all files of the folder were finished before the cursor
+        """
+        return self._folder is not None and folder_key(folder_path, self.root_path) < self._folder
+
+    def is_finished_file(self, file_path: str) -> bool:
+        """
+        :param file_path: Path to a music file in a folder that is not finished
+        :return: True if the file was finished before the cursor
+        """
+        with self._lock:
+            return (folder_key(os.path.dirname(file_path), self.root_path) == self._folder
+                    and os.path.basename(file_path) in self._done)
+
+    def renamed_album(self, file_path: str) -> Optional[AlbumObject]:
+        """
+        :param file_path: Path to a music file
+        :return: Parsed fields of the file if it was renamed by the interrupted run, None otherwise
+        """
+        key = folder_key(os.path.dirname(file_path), self.root_path)
+        with self._lock:
+            fields = self._renamed.get(key, {}).get(os.path.basename(file_path))
+        if fields is None:
+            return None
+        album_obj = AlbumObject(**fields)
+        album_obj.complete_file_path = os.path.abspath(file_path)
+        return album_obj
+
+    def add_renamed(self, album_objects: Iterable[AlbumObject]):
+        """
+        Remember the fields of files that are about to be renamed and write the checkpoint at once,
+        before their original names are gone. Files that end up not being renamed are forgotten
+        once the cursor moves past their folder.
+        :param album_objects: Album objects of files of the same folder with their final clean file names,
+            the fields are stored under the clean file name
+        """
+        albums = {album_obj.clean_file_name: album_obj.as_dict() for album_obj in album_objects}
+        if not albums:
+            return
+        key = folder_key(os.path.dirname(next(iter(albums.values()))["complete_file_path"]), self.root_path)
+        with self._lock:
+            self._renamed.setdefault(key, {}).update(albums)
+        self.save()
+
+    def file_done(self, file_path: str):
+        """
+        Move the cursor past a finished file, the checkpoint is written every CHECKPOINT_INTERVAL files
+        or CHECKPOINT_SECONDS seconds.
+        :param file_path: Final path of the file
+        """
+        key = folder_key(os.path.dirname(file_path), self.root_path)
+        with self._lock:
+            if key != self._folder:
+                # Files are finished in walk order, every earlier folder is done
+                self._renamed = {folder: albums for folder, albums in self._renamed.items() if folder >= key}
+                self._folder = key
+                self._done = set()
+            name = os.path.basename(file_path)
+            self._done.add(name)
+            self._renamed.get(key, {}).pop(name, None)
+            self._pending += 1
+            due = (self._pending >= CHECKPOINT_INTERVAL
+                   or time.monotonic() - self._saved_at >= CHECKPOINT_SECONDS)
+        if due:
+            self.save()
+
+    def save(self):
+        """Write the checkpoint to a temporary file and replace the old one with it"""
+        with self._lock:
+            state = {
+                "version": CHECKPOINT_VERSION,
+                "folder": list(self._folder) if self._folder is not None else None,
+                "done": sorted(self._done),
+                "renamed": {"/".join(folder): albums for folder, albums in self._renamed.items() if albums},
+            }
+            temp_path = self.checkpoint_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+                json.dump(state, checkpoint_file, ensure_ascii=False)
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+            os.replace(temp_path, self.checkpoint_path)
+            self._pending = 0
+            self._saved_at = time.monotonic()
+
+    def close(self, completed: bool = True):
+        """
+        Remove the checkpoint once the run finished, or write it a last time if the run was aborted.
+        :param completed: False if the run was aborted
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if not completed:
+            self.save()
+            return
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import shutil
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from logic.canonical_names import name_key
+from logic.log import get_logger
+from logic.objects import AlbumObject
+
+logger = get_logger(__name__)
+
+# Bytes read from the start and the end of a file for the partial hash
+PARTIAL_HASH_SIZE = 64 * 1024
+# Bytes read at once for the full hash
+CHUNK_SIZE = 1024 * 1024
+
+# Duplicates are moved here instead of being deleted, relative to the library folder
+DUPLICATES_FOLDER_NAME = ".fullalbumindexer-duplicates"
+
+
+@dataclass
+class DuplicateGroup:
+    """Files holding the same album, the first one is kept"""
+    paths: List[str]
+    # True if the files have identical content, False if only their parsed names match
+    identical: bool
+    size: int = 0
+
+    @property
+    def duplicates(self) -> List[str]:
+        """All files but the one to keep"""
+        return self.paths[1:]
+
+
+@dataclass
+class DuplicateReport:
+    """Result of a duplicate search"""
+    identical: List[DuplicateGroup] = field(default_factory=list)
+    similar: List[DuplicateGroup] = field(default_factory=list)
+    # Number of bytes read for hashing, compared to the total size of the files
+    bytes_read: int = 0
+    total_bytes: int = 0
+
+    @property
+    def wasted_bytes(self) -> int:
+        """Bytes taken by identical copies"""
+        return sum(group.size * len(group.duplicates) for group in self.identical)
+
+
+def partial_hash(file_path: str, size: int) -> Tuple[bytes, int]:
+    """
+    Hash the start and the end of a file.
+    :param file_path: Path to the file
+    :param size: Size of the file
+    :return: Tuple of the digest and the number of bytes read
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as file:
+        head = file.read(PARTIAL_HASH_SIZE)
+        digest.update(head)
+        bytes_read = len(head)
+        if size > 2 * PARTIAL_HASH_SIZE:
+            file.seek(size - PARTIAL_HASH_SIZE)
+            tail = file.read(PARTIAL_HASH_SIZE)
+            digest.update(tail)
+            bytes_read += len(tail)
+        elif size > PARTIAL_HASH_SIZE:
+            tail = file.read()
+            digest.update(tail)
+            bytes_read += len(tail)
+    return digest.digest(), bytes_read
+
+
+def full_hash(file_path: str) -> Tuple[str, int]:
+    """
+    Hash the whole content of a file, read in chunks.
+    :param file_path: Path to the file
+    :return: Tuple of the hex digest and the number of bytes read
+    """
+    digest = hashlib.blake2b()
+    bytes_read = 0
+    with open(file_path, "rb") as file:
+        while True:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            bytes_read += len(chunk)
+    return digest.hexdigest(), bytes_read
+
+
+def _group_by(paths: Iterable[str], key_func: Callable[[str], object]) -> List[List[str]]:
+    groups = defaultdict(list)
+    for path in paths:
+        try:
+            key = key_func(path)
+        except OSError as ex:
+            logger.warning("Could not read %s, skipping it: %s", path, ex)
+            continue
+        groups[key].append(path)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_duplicates(files: Iterable[Tuple[str, int]],
+                    parse: Optional[Callable[[str], Optional[AlbumObject]]] = None) -> DuplicateReport:
+    """
+    Find files with identical content, and optionally files whose names parse to the same album.
+
+    Files are compared in rounds that each read more of the files: first only their sizes are
+    compared, then files of the same size by a hash of their first and last 64 KiB, and only files
+    that still match are read completely. A file with a unique size is never opened.
+    :param files: Iterable of (path, size)
+    :param parse: Parses a path to an album object, files with the same artist and title are reported
+        as similar if their content differs. Not used if not set
+    :return: DuplicateReport
+    """
+    report = DuplicateReport()
+    sizes: Dict[str, int] = {}
+    for path, size in files:
+        sizes[path] = size
+        report.total_bytes += size
+
+    def partial_key(path: str) -> bytes:
+        digest, bytes_read = partial_hash(path, sizes[path])
+        report.bytes_read += bytes_read
+        return digest
+
+    def full_key(path: str) -> str:
+        digest, bytes_read = full_hash(path)
+        report.bytes_read += bytes_read
+        return digest
+
+    for same_size in _group_by(sorted(sizes), sizes.__getitem__):
+        for same_partial in _group_by(same_size, partial_key):
+            # Files up to twice the partial hash size were already read completely
+            if sizes[same_partial[0]] <= 2 * PARTIAL_HASH_SIZE:
+                groups = [same_partial]
+            else:
+                groups = _group_by(same_partial, full_key)
+            for group in groups:
+                report.identical.append(DuplicateGroup(_keep_first(group, sizes, parse), True, sizes[group[0]]))
+
+    if parse is not None:
+        identical_paths = {path for group in report.identical for path in group.duplicates}
+        albums = defaultdict(list)
+        for path in sorted(sizes):
+            if path in identical_paths:
+                continue
+            album_obj = parse(path)
+            if album_obj is None or not album_obj.artist_name or not album_obj.title_name:
+                continue
+            albums[(name_key(album_obj.artist_name), name_key(album_obj.title_name))].append(path)
+        for paths in albums.values():
+            if len(paths) > 1:
+                report.similar.append(DuplicateGroup(_keep_first(paths, sizes, parse), False,
+                                                     max(sizes[path] for path in paths)))
+
+    return report
+
+
+def _keep_first(paths: List[str], sizes: Dict[str, int],
+                parse: Optional[Callable[[str], Optional[AlbumObject]]]) -> List[str]:
+    """
+    Order a group so the copy to keep comes first: a file that already has its clean name,
+    then the largest one, then the shortest path.
+    """
+    def preference(path: str):
+        album_obj = parse(path) if parse is not None else None
+        has_clean_name = album_obj is not None and album_obj.clean_file_name == os.path.basename(path)
+        return not has_clean_name, -sizes[path], len(path), path
+
+    return sorted(paths, key=preference)
+
+
+def move_duplicates(report: DuplicateReport, folder_path: str, include_similar: bool = False) -> List[str]:
+    """
+    Move all copies but the one to keep into the duplicates folder of the library, keeping their relative paths.
+    Nothing is deleted, the folder can be reviewed and emptied by hand.
+    :param report: Result of find_duplicates
+    :param folder_path: Root folder of the library
+    :param include_similar: Also move files that only have the same parsed name
+    :return: New paths of the moved files
+    """
+    duplicates_folder = os.path.join(os.path.abspath(folder_path), DUPLICATES_FOLDER_NAME)
+    groups = report.identical + (report.similar if include_similar else [])
+    moved = []
+    for group in groups:
+        for path in group.duplicates:
+            relative_path = os.path.relpath(os.path.abspath(path), os.path.abspath(folder_path))
+            destination = os.path.join(duplicates_folder, relative_path)
+            if os.path.lexists(destination):
+                logger.warning("Not moving duplicate %s, %s already exists", path, destination)
+                continue
+            try:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.move(path, destination)
+            except OSError as ex:
+                logger.error("Failed to move duplicate %s: %s", path, ex)
+                continue
+            logger.info("Moved duplicate %s to %s", path, destination)
+            moved.append(destination)
+    return moved
@@ -0,0 +1,63 @@
+import re
+from typing import Iterable, List, NamedTuple, Optional
+
+# Hyphen-minus, hyphen, non-breaking hyphen, figure dash, en dash, em dash, horizontal bar and minus sign
+DASH_CHARACTERS = "-‐‑‒–—―−"
+
+
+def _rule(separator: str) -> re.Pattern:
+    # The artist is matched lazily, so the first separator splits the name. The title is matched greedily,
+    # the ending starting at the last dot is then found by backtracking over the ending only.
+    return re.compile(rf"^\s*(?P<artist>.+?){separator}(?P<title>.+)(?P<ending>\.[^.]*)$", re.DOTALL)
+
+
+# Grammar of a full album file name: "Artist - Title.ending", applied to the base name only.
+# The rules are tried in order, so a dash with spaces on both sides wins over a dash touching
+# a word: "Jay-Z - The Black Album" splits after "Jay-Z", "Artist -Album" and "Artist-Album" still split.
+FILENAME_GRAMMAR = (
+    _rule(rf"\s+[{DASH_CHARACTERS}]+\s+"),
+    _rule(rf"(?:\s+[{DASH_CHARACTERS}]+|[{DASH_CHARACTERS}]+\s+)"),
+    _rule(rf"[{DASH_CHARACTERS}]+"),
+)
+
+
+class FileNameParts(NamedTuple):
+    """Artist, title and file ending of a file name, the title still holds its noise tags and year"""
+    artist: str
+    title: str
+    file_ending: str
+
+
+def _parts(match: Optional[re.Match]) -> Optional[FileNameParts]:
+    if match is None:
+        return None
+    artist, title, file_ending = match.groups()
+    artist, title = artist.strip(), title.strip()
+    if not artist or not title or len(file_ending) < 2:
+        return None
+    return FileNameParts(artist, title, file_ending)
+
+
+def split_file_name(file_name: str) -> Optional[FileNameParts]:
+    """
+    Split a file name into artist, title and file ending.
+    Names with the common " - " separator are split by a single match of the first rule.
+    :param file_name: Base name of the music file, e.g. "Artist – Album (1999).opus"
+    :return: FileNameParts, None if the name has no separator, artist, title or file ending
+    """
+    for rule in FILENAME_GRAMMAR:
+        match = rule.match(file_name)
+        if match is not None:
+            return _parts(match)
+    return None
+
+
+def split_file_names(file_names: Iterable[str]) -> List[Optional[FileNameParts]]:
+    """
+    Split a batch of file names with the precompiled grammar.
+    Each match is turned into its parts right away, holding the matches of a whole batch
+    at once is slower than letting them go one by one.
+    :param file_names: Base names of the music files
+    :return: One FileNameParts per name in the same order, None for names that could not be split
+    """
+    return list(map(split_file_name, file_names))
@@ -0,0 +1,122 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from logic.log import get_logger
+
+logger = get_logger(__name__)
+
+# Number of folders whose genre is remembered
+GENRE_CACHE_SIZE = 4096
+
+NON_ALPHANUMERIC_PATTERN = re.compile(r"[\W_]+")
+
+
+def normalize_genre_key(folder_name: str) -> str:
+    """
+    Normalize a folder name for the lookup in the genre mapping,
+    so "ElectronicMusic", "electronic music" and "Electronic_Music" are the same key.
+    :param folder_name: Name of a folder
+    :return: Lowercase name without spaces and punctuation
+    """
+    return NON_ALPHANUMERIC_PATTERN.sub("", folder_name.casefold())
+
+
+class GenreResolver:
+    """
+    Resolves the genre of the files of a folder.
+
+    Without a mapping the genre is the name of the folder, as it always was. A mapping translates
+    folder names or nested folder paths like "Rock/Prog" to canonical genre names. The deepest folder
+    that is mapped decides, the longest matching path wins. Every folder is resolved only once,
+    all further files of the folder are answered from a cache.
+    """
+
+    def __init__(self, mapping: Optional[Dict[str, str]] = None, root_path: Optional[str] = None,
+                 cache_size: int = GENRE_CACHE_SIZE):
+        """
+        :param mapping: Folder name or path relative to the library, separated by "/", to genre
+        :param root_path: Library folder, folders above it are never used for the genre
+        :param cache_size: Number of folders whose genre is remembered
+        """
+        self.root_path = os.path.abspath(root_path) if root_path is not None else None
+        self._mapping: Dict[Tuple[str, ...], str] = {}
+        self._max_depth = 0
+        for folder_path, genre in (mapping or {}).items():
+            self.add_mapping(folder_path, genre)
+        self._resolve_cached = lru_cache(maxsize=cache_size)(self._resolve)
+
+    @classmethod
+    def from_file(cls, config_path: str, root_path: Optional[str] = None) -> "GenreResolver":
+        """
+        Load the genre mapping from a JSON file, e.g. {"ElectronicMusic": "Electronic", "Rock/Prog": "Progressive Rock"}
+        :param config_path: Path to the JSON file
+        :param root_path: Library folder
+        :return: GenreResolver
+        """
+        with open(config_path, encoding="utf-8") as config_file:
+            mapping = json.load(config_file)
+        if not isinstance(mapping, dict) or not all(isinstance(value, str) for value in mapping.values()):
+            raise ValueError(f"Genre mapping {config_path} must be a JSON object of folder names to genres")
+        return cls(mapping, root_path)
+
+    def add_mapping(self, folder_path: str, genre: str):
+        """
+        Map a folder name or nested folder path to a genre.
+        :param folder_path: Folder name or path separated by "/", e.g. "Rock/Prog"
+        :param genre: Canonical genre name
+        """
+        key = self._key(folder_path.replace("\\", "/").split("/"))
+        if not key:
+            raise ValueError(f"Invalid folder in genre mapping: {folder_path!r}")
+        self._mapping[key] = genre.strip()
+        self._max_depth = max(self._max_depth, len(key))
+        if hasattr(self, "_resolve_cached"):
+            self._resolve_cached.cache_clear()
+
+    def resolve(self, folder_path: str) -> str:
+        """
+        Get the genre of the files in a folder.
+        :param folder_path: Folder containing the music files, relative to the working directory or absolute
+        :return: Mapped genre, otherwise the folder name
+        """
+        return self._resolve_cached(folder_path)
+
+    def cache_info(self):
+        """Hits and misses of the folder cache"""
+        return self._resolve_cached.cache_info()
+
+    def _resolve(self, folder_path: str) -> str:
+        folder_path = os.path.abspath(folder_path)
+        folder_name = os.path.basename(folder_path)
+        if not self._mapping:
+            return folder_name
+
+        parts = self._relative_parts(folder_path)
+        key = self._key(parts)
+        # Deepest mapped folder first, then the longest path ending in it
+        for end in range(len(key), 0, -1):
+            for start in range(max(0, end - self._max_depth), end):
+                genre = self._mapping.get(key[start:end])
+                if genre is not None:
+                    logger.debug("Mapped folder %s to genre %s", folder_path, genre)
+                    return genre
+        return folder_name
+
+    def _relative_parts(self, folder_path: str) -> Iterable[str]:
+        if self.root_path is not None:
+            relative_path = os.path.relpath(folder_path, self.root_path)
+            if relative_path == os.curdir:
+                return [os.path.basename(folder_path)]
+            if not relative_path.startswith(os.pardir):
+                return relative_path.split(os.sep)
+        return [part for part in folder_path.split(os.sep) if part]
+
+    @staticmethod
+    def _key(parts: Iterable[str]) -> Tuple[str, ...]:
+        return tuple(key for key in (normalize_genre_key(part) for part in parts) if key)
+
+
+DEFAULT_GENRE_RESOLVER = GenreResolver()
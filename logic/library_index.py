@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from logic.log import get_logger
+from logic.objects import AlbumObject
+
+logger = get_logger(__name__)
+
+# Stored in the root of the processed library
+INDEX_FILE_NAME = ".fullalbumindex.sqlite"
+
+# Number of recorded files after which the pending changes are committed to disk
+COMMIT_INTERVAL = 500
+
+
+def file_identity(file_path: str) -> List[Any]:
+    """
+    Identity of a settings file, it changes when the file is replaced or edited.
+    :param file_path: Path to the file
+    :return: Absolute path, size and modification time
+    """
+    stat_result = os.stat(file_path)
+    return [os.path.abspath(file_path), stat_result.st_size, stat_result.st_mtime_ns]
+
+
+def file_digest(file_path: str) -> str:
+    """
+    :param file_path: Path to a small settings file
+    :return: Hash of the content of the file
+    """
+    with open(file_path, "rb") as settings_file:
+        return hashlib.sha256(settings_file.read()).hexdigest()
+
+
+def settings_fingerprint(settings: Dict[str, Any]) -> str:
+    """
+    :param settings: JSON serializable settings that decide the fields parsed from a file
+    :return: Hash of the settings
+    """
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LibraryIndex:
+    """
+    Persistent index of files that were already tagged by a previous run.
+
+    Every entry is keyed by absolute path and remembers size, modification time and inode of the file
+    right after its tags were written, together with the album fields that were written.
+    A file whose current stat still matches its entry has not been touched since and can be
+    skipped with a single primary key lookup, without parsing the name or loading its tags.
+    The entries only hold for the parse settings they were written with, the index remembers a fingerprint
+    of these settings and forgets all entries when it is opened with different ones.
+    """
+
+    def __init__(self, db_path: str, settings: Optional[str] = None):
+        """
+        :param db_path: Path to the database
+        :param settings: Fingerprint of the parse settings of the run, see settings_fingerprint.
+            The entries are kept as they are if not set.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending = 0
+        # Lookups happen on worker threads, access is serialized by the lock
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " artist TEXT,"
+            " title TEXT,"
+            " year TEXT,"
+            " genre TEXT"
+            ") WITHOUT ROWID"
+        )
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if settings is not None:
+            self._use_settings(settings)
+        self._connection.commit()
+
+    def _use_settings(self, settings: str):
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'settings'").fetchone()
+        if row is not None and row[0] == settings:
+            return
+        # The stored fields were parsed with other settings, every file has to be processed again
+        removed = self._connection.execute("DELETE FROM files").rowcount
+        if row is not None and removed:
+            logger.info("Parse settings changed, dropped %d entries of index %s", removed, self.db_path)
+        self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('settings', ?)", (settings,))
+
+    @classmethod
+    def for_folder(cls, folder_path: str, shard_name: Optional[str] = None,
+                   settings: Optional[str] = None) -> "LibraryIndex":
+        """
+        Open or create the index stored in the root of the given library folder.
+        :param folder_path: Root folder of the music library
+        :param shard_name: Name of the shard of a sharded run, every shard keeps its own index,
+            so hosts sharing the library never write to the same database
+        :param settings: Fingerprint of the parse settings of the run, see settings_fingerprint
+        :return: LibraryIndex
+        """
+        if shard_name is not None:
+            base_name, ending = os.path.splitext(INDEX_FILE_NAME)
+            return cls(os.path.join(folder_path, f"{base_name}.{shard_name}{ending}"), settings)
+        return cls(os.path.join(folder_path, INDEX_FILE_NAME), settings)
+
+    def is_unchanged(self, file_path: str, stat_result: Optional[os.stat_result] = None) -> bool:
+        """
+        Check if a file is still in the state it had when it was last recorded.
+        :param file_path: Path to the music file
+        :param stat_result: Already known stat of the file, avoids another stat call
+        :return: True if the file can be skipped
+        """
+        return self.lookup(file_path, stat_result) is not None
+
+    def lookup(self, file_path: str, stat_result: Optional[os.stat_result] = None) -> Optional[AlbumObject]:
+        """
+        Get the fields that were written to a file, if it is still in the state it had when it was last recorded.
+        :param file_path: Path to the music file
+        :param stat_result: Already known stat of the file, avoids another stat call
+        :return: Album object with the recorded fields, None if the file has to be processed
+        """
+        file_path = os.path.abspath(file_path)
+        if stat_result is None:
+            try:
+                stat_result = os.stat(file_path)
+            except OSError:
+                return None
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, inode, artist, title, year, genre FROM files WHERE path = ?", (file_path,)
+            ).fetchone()
+
+        if row is None or row[:3] != (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino):
+            return None
+        # Recorded files already carry their clean name
+        file_name = os.path.basename(file_path)
+        artist, title, year, genre = row[3:]
+        return AlbumObject(complete_file_path=file_path, clean_file_name=file_name, file_name=file_name,
+                           artist_name=artist or "", title_name=title or "",
+                           file_ending=os.path.splitext(file_name)[1], release_year=year or "", genre=genre or "")
+
+    def record(self, album_obj: AlbumObject) -> bool:
+        """
+        Remember the current state of a file whose tags were just written.
+        :param album_obj: Album object of the processed file, with its final path
+        :return: True if the file was recorded
+        """
+        file_path = os.path.abspath(album_obj.complete_file_path)
+        try:
+            stat_result = os.stat(file_path)
+        except OSError as ex:
+            logger.warning("Could not add file %s to index: %s", file_path, ex)
+            return False
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, artist, title, year, genre)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_path, stat_result.st_size, stat_result.st_mtime_ns,
+                 stat_result.st_ino, album_obj.artist_name, album_obj.title_name,
+                 album_obj.release_year, album_obj.genre)
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_INTERVAL:
+                self._connection.commit()
+                self._pending = 0
+        return True
+
+    def close(self):
+        """Commit pending changes and close the database"""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
@@ -0,0 +1,73 @@
+import json
+import logging
+import sys
+import time
+from typing import Optional
+
+LOGGER_NAME = "fullalbumindexer"
+
+# Attributes every log record has, everything else was passed with extra=
+_STANDARD_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message"}
+
+
+def get_logger(module_name: str) -> logging.Logger:
+    """
+    Get the logger of a module, all loggers are children of the fullalbumindexer logger.
+    Messages use %-style arguments, so they are only formatted if the level is enabled.
+    :param module_name: __name__ of the module
+    :return: logging.Logger
+    """
+    return logging.getLogger(f"{LOGGER_NAME}.{module_name.rsplit('.', 1)[-1]}")
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats every record as one JSON object per line, including fields passed with extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))
+                    + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(verbosity: int = 0, json_log_path: Optional[str] = None) -> None:
+    """
+    Set up console output and the optional JSON lines sink.
+
+    Without verbosity only warnings and errors are shown, so a default run formats no per-file
+    messages at all. Verbosity 1 adds INFO messages, 2 and more DEBUG messages.
+    The JSON lines sink records INFO and above, or DEBUG with verbosity 2.
+    :param verbosity: Number of -v options given
+    :param json_log_path: File the JSON lines are appended to, no JSON output if not set
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    logger.propagate = False
+
+    console_level = logging.WARNING if verbosity <= 0 else logging.INFO if verbosity == 1 else logging.DEBUG
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+    logger.addHandler(console_handler)
+    level = console_level
+
+    if json_log_path:
+        json_level = logging.DEBUG if verbosity >= 2 else logging.INFO
+        json_handler = logging.FileHandler(json_log_path, encoding="utf-8")
+        json_handler.setLevel(json_level)
+        json_handler.setFormatter(JsonLinesFormatter())
+        logger.addHandler(json_handler)
+        level = min(level, json_level)
+
+    logger.setLevel(level)
@@ -0,0 +1,165 @@
+import csv
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional, Tuple
+
+from logic.canonical_names import name_key
+from logic.log import get_logger
+from logic.objects import AlbumObject
+
+logger = get_logger(__name__)
+
+# Number of (artist, album) lookups whose result is remembered
+LOOKUP_CACHE_SIZE = 65536
+
+# Number of imported releases after which the import is committed
+IMPORT_BATCH_SIZE = 10000
+
+
+class MetadataDatabase:
+    """
+    Local database of releases, e.g. imported from a MusicBrainz dump, used to fill in missing metadata.
+
+    Releases are keyed by the normalized artist and album name, a lookup is a single primary key
+    search without any network access. An LRU cache in front of the database answers repeated
+    lookups, e.g. for all files of an album, without touching SQLite.
+    """
+
+    def __init__(self, db_path: str, cache_size: int = LOOKUP_CACHE_SIZE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Lookups happen on worker threads, access is serialized by the lock
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS releases ("
+            " artist_key TEXT NOT NULL,"
+            " album_key TEXT NOT NULL,"
+            " artist TEXT NOT NULL,"
+            " album TEXT NOT NULL,"
+            " year INTEGER,"
+            " genre TEXT,"
+            " PRIMARY KEY (artist_key, album_key)"
+            ") WITHOUT ROWID"
+        )
+        self._connection.commit()
+        self._lookup_cached = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def import_releases(self, releases: Iterable[Tuple[str, str, Optional[int], Optional[str]]]) -> int:
+        """
+        Add releases to the database. Of several releases of the same album the earliest year is kept.
+        :param releases: Iterable of (artist, album, year, genre), year and genre may be None
+        :return: Number of imported releases
+        """
+        count = 0
+        batch = []
+        for artist, album, year, genre in releases:
+            artist_key, album_key = name_key(artist), name_key(album)
+            if not artist_key or not album_key:
+                continue
+            batch.append((artist_key, album_key, artist.strip(), album.strip(), year, genre or None))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                count += self._insert(batch)
+                batch = []
+        if batch:
+            count += self._insert(batch)
+        self._lookup_cached.cache_clear()
+        return count
+
+    def import_dump(self, dump_path: str) -> int:
+        """
+        Import releases from a tab separated dump with one "artist<TAB>album<TAB>year<TAB>genre" per line.
+        Year and genre are optional, lines starting with # are ignored.
+        :param dump_path: Path to the dump
+        :return: Number of imported releases
+        """
+        with open(dump_path, encoding="utf-8", newline="") as dump_file:
+            count = self.import_releases(self._read_dump(dump_file, dump_path))
+        logger.info("Imported %d releases from %s", count, dump_path)
+        return count
+
+    def lookup(self, artist: str, album: str) -> Optional[Tuple[Optional[int], Optional[str]]]:
+        """
+        Get the release year and genre of an album.
+        :param artist: Artist name
+        :param album: Album name
+        :return: Tuple of year and genre, None if the album is unknown
+        """
+        return self._lookup_cached(name_key(artist), name_key(album))
+
+    def enrich(self, album_obj: AlbumObject, fill_genre: bool = False) -> bool:
+        """
+        Fill in the release year of an album object if it is missing.
+        :param album_obj: Parsed album object
+        :param fill_genre: If True, also replace the genre with the genre of the release
+        :return: True if a field was changed
+        """
+        if not album_obj.artist_name or not album_obj.title_name:
+            return False
+        release = self.lookup(album_obj.artist_name, album_obj.title_name)
+        if release is None:
+            return False
+
+        year, genre = release
+        changed = False
+        if year is not None and not album_obj.release_year:
+            album_obj.release_year = str(year)
+            logger.debug("Found release year %s of %s - %s", year, album_obj.artist_name, album_obj.title_name)
+            changed = True
+        if fill_genre and genre and genre != album_obj.genre:
+            album_obj.genre = genre
+            logger.debug("Found genre %s of %s - %s", genre, album_obj.artist_name, album_obj.title_name)
+            changed = True
+        return changed
+
+    def cache_info(self):
+        """Hits and misses of the lookup cache"""
+        return self._lookup_cached.cache_info()
+
+    def close(self):
+        """Commit pending changes and close the database"""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def _lookup(self, artist_key: str, album_key: str) -> Optional[Tuple[Optional[int], Optional[str]]]:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT year, genre FROM releases WHERE artist_key = ? AND album_key = ?", (artist_key, album_key)
+            ).fetchone()
+
+    def _insert(self, batch) -> int:
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO releases (artist_key, album_key, artist, album, year, genre)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (artist_key, album_key) DO UPDATE SET"
+                " year = CASE WHEN releases.year IS NULL OR excluded.year < releases.year"
+                " THEN excluded.year ELSE releases.year END,"
+                " genre = coalesce(releases.genre, excluded.genre)",
+                batch
+            )
+            self._connection.commit()
+        return len(batch)
+
+    @staticmethod
+    def _read_dump(dump_file, dump_path: str) -> Iterator[Tuple[str, str, Optional[int], Optional[str]]]:
+        reader = csv.reader(dump_file, delimiter="\t", quoting=csv.QUOTE_NONE)
+        for line_number, fields in enumerate(reader, 1):
+            if not fields or fields[0].startswith("#") or len(fields) < 2:
+                continue
+            year = None
+            if len(fields) > 2 and fields[2].strip():
+                year_text = fields[2].strip()[:4]
+                if not year_text.isdigit():
+                    logger.warning("Invalid year in line %d of %s: %r", line_number, dump_path, fields[2])
+                else:
+                    year = int(year_text)
+            genre = fields[3].strip() if len(fields) > 3 else None
+            yield fields[0], fields[1], year, genre
@@ -10,84 +10,48 @@ class WebPag:
 
 
 class AlbumObject:
-    def __init__(self):
-        self._complete_file_path = ""
-        self._clean_file_name = ""
-        self._file_name = ""
-        self._artist_name = ""
-        self._title_name = ""
-        self._file_ending = ""
-        self._release_year = ""
-        self._genre = ""
-
-        # self._complete_file_path: string
-        # self._clean_file_path: string
-        # self._file_name: string
-        # self._artist_name: string
-        # self._title_name: string
-        # self._file_ending: string
-        # self._release_year: string
-
-    @property
-    def file_name(self):
-        return self._file_name
-
-    @file_name.setter
-    def file_name(self, value):
-        self._file_name = value
-
-    @property
-    def artist_name(self):
-        return self._artist_name
-
-    @artist_name.setter
-    def artist_name(self, value):
-        self._artist_name = value
-
-    @property
-    def release_year(self):
-        return self._release_year
-
-    @release_year.setter
-    def release_year(self, value):
-        self._release_year = value
-
-    @property
-    def title_name(self):
-        return self._title_name
-
-    @title_name.setter
-    def title_name(self, value):
-        self._title_name = value
-
-    @property
-    def file_ending(self):
-        return self._file_ending
-
-    @file_ending.setter
-    def file_ending(self, value):
-        self._file_ending = value
-
-    @property
-    def complete_file_path(self):
-        return self._complete_file_path
-
-    @complete_file_path.setter
-    def complete_file_path(self, value):
-        self._complete_file_path = value
+    """
+    Metadata of a single full album file.
+
+    Fields are plain slots instead of properties, so instances have no __dict__ and attribute
+    access is a direct slot lookup. This keeps plans for hundreds of thousands of files small.
+    """
+    __slots__ = (
+        "complete_file_path",
+        "clean_file_name",
+        "file_name",
+        "artist_name",
+        "title_name",
+        "file_ending",
+        "release_year",
+        "genre",
+    )
+
+    def __init__(self, complete_file_path: str = "", clean_file_name: str = "", file_name: str = "",
+                 artist_name: str = "", title_name: str = "", file_ending: str = "",
+                 release_year: str = "", genre: str = ""):
+        self.complete_file_path = complete_file_path
+        self.clean_file_name = clean_file_name
+        self.file_name = file_name
+        self.artist_name = artist_name
+        self.title_name = title_name
+        self.file_ending = file_ending
+        self.release_year = release_year
+        self.genre = genre
 
     @property
     def clean_file_path(self):
-        return self._clean_file_name
+        """Former name of clean_file_name, both refer to the same value"""
+        return self.clean_file_name
 
     @clean_file_path.setter
     def clean_file_path(self, value):
-        self._clean_file_name = value
+        self.clean_file_name = value
 
-    @property
-    def genre(self):
-        return self._genre
+    def as_dict(self) -> dict:
+        """Get all fields as a dictionary"""
+        return {name: getattr(self, name) for name in self.__slots__}
 
-    @genre.setter
-    def genre(self, value):
-        self._genre = value
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"AlbumObject({fields})"
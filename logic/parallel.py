@@ -0,0 +1,35 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def bounded_map(func: Callable[[T], R], items: Iterable[T], jobs: int = 1) -> Iterator[R]:
+    """
+    Apply func to every item on a pool of worker threads and yield the results in input order.
+
+    At most 2 * jobs items are in flight at any time, so the input iterable is consumed lazily
+    and memory stays bounded no matter how many files are processed.
+    With jobs <= 1 everything runs in the calling thread.
+
+    :param func: Function to apply, must not raise for expected per-item failures
+    :param items: Items to process
+    :param jobs: Number of worker threads
+    :return: Iterator over the results, in the same order as items
+    """
+    if jobs <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    max_in_flight = jobs * 2
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
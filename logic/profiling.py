@@ -0,0 +1,202 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Stages recorded by the processing pipeline, in the order they are reported
+STAGES = ("discovery", "parse", "rename", "tag_load", "tag_save", "split")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Get a percentile of already sorted values using the nearest rank.
+    :param sorted_values: Values in ascending order
+    :param fraction: Percentile between 0 and 1, e.g. 0.95
+    :return: The value at the percentile, 0 for no values
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+
+class Profiler:
+    """
+    Collects the latency of every pipeline stage and the number of bytes written.
+    Thread-safe, stages may be recorded from worker threads.
+    """
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, List[float]] = {}
+        self.bytes_written = 0
+        self.files = 0
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Measure the wall time of the enclosed block as one sample of a stage.
+        :param name: Name of the stage, e.g. tag_save
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_sample(name, time.perf_counter() - start)
+
+    def add_sample(self, name: str, seconds: float):
+        """
+        Record one latency sample of a stage.
+        :param name: Name of the stage
+        :param seconds: Measured latency
+        """
+        with self._lock:
+            self._latencies.setdefault(name, []).append(seconds)
+
+    def add_bytes_written(self, count: int):
+        """
+        Record the size of a saved file.
+        :param count: Number of bytes
+        """
+        with self._lock:
+            self.bytes_written += count
+
+    def add_file(self):
+        """Count a finished file"""
+        with self._lock:
+            self.files += 1
+
+    def finish(self):
+        """Stop the wall clock of the run"""
+        self._finished = time.perf_counter()
+
+    def report(self) -> dict:
+        """
+        Summarize the recorded samples.
+        :return: Dictionary with totals and p50, p95 and max latency in milliseconds per stage
+        """
+        with self._lock:
+            latencies = {name: sorted(values) for name, values in self._latencies.items()}
+            bytes_written = self.bytes_written
+            files = self.files
+        elapsed = (self._finished or time.perf_counter()) - self._started
+
+        names = [name for name in STAGES if name in latencies]
+        names += sorted(name for name in latencies if name not in STAGES)
+        stages = {}
+        for name in names:
+            values = latencies[name]
+            stages[name] = {
+                "count": len(values),
+                "total_s": round(sum(values), 6),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+
+        return {
+            "elapsed_s": round(elapsed, 6),
+            "files": files,
+            "files_per_second": round(files / elapsed, 3) if elapsed > 0 else 0.0,
+            "bytes_written": bytes_written,
+            "stages": stages,
+        }
+
+    def display(self):
+        """Print the per-stage breakdown"""
+        report = self.report()
+        print("\n" + "=" * 50)
+        print("Profile")
+        print("=" * 50)
+        print(f"{'Stage':<12}{'Count':>8}{'Total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, stage in report["stages"].items():
+            print(f"{name:<12}{stage['count']:>8}{stage['total_s']:>10.3f}{stage['p50_ms']:>10.3f}"
+                  f"{stage['p95_ms']:>10.3f}{stage['max_ms']:>10.3f}")
+        print("-" * 50)
+        print(f"Elapsed:        {report['elapsed_s']:.3f} s")
+        print(f"Files/second:   {report['files_per_second']:.1f}")
+        print(f"Bytes written:  {report['bytes_written']}")
+        print("=" * 50)
+
+    def export_json(self, json_path: str):
+        """
+        Write the report to a JSON file.
+        :param json_path: Path of the file
+        """
+        with open(json_path, "w", encoding="utf-8") as json_file:
+            json.dump(self.report(), json_file, indent=2)
+
+
+class NullProfiler:
+    """Profiler used while profiling is disabled, every call is a no-op"""
+    enabled = False
+
+    def stage(self, name: str):
+        # A shared context manager, nothing is allocated per call
+        return _NULL_CONTEXT
+
+    def add_sample(self, name: str, seconds: float):
+        pass
+
+    def add_bytes_written(self, count: int):
+        pass
+
+    def add_file(self):
+        pass
+
+
+def profile_iterator(items: Iterable, name: str) -> Iterator:
+    """
+    Record the time spent producing every item of an iterator as a stage.
+    :param items: Iterable to consume, e.g. the file discovery
+    :param name: Name of the stage
+    :return: Iterator over the same items
+    """
+    profiler = get_profiler()
+    if not profiler.enabled:
+        yield from items
+        return
+
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        profiler.add_sample(name, time.perf_counter() - start)
+        yield item
+
+
+_NULL_CONTEXT = nullcontext()
+_NULL_PROFILER = NullProfiler()
+_active_profiler = _NULL_PROFILER
+
+
+def get_profiler():
+    """
+    Get the profiler of the current run.
+    :return: The enabled Profiler, or a NullProfiler if profiling is disabled
+    """
+    return _active_profiler
+
+
+def enable_profiling() -> Profiler:
+    """
+    Start recording stage latencies for the current run.
+    :return: The new active Profiler
+    """
+    global _active_profiler
+    _active_profiler = Profiler()
+    return _active_profiler
+
+
+def disable_profiling():
+    """Stop recording, later stages are not measured anymore"""
+    global _active_profiler
+    _active_profiler = _NULL_PROFILER
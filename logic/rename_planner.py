@@ -0,0 +1,293 @@
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from logic.log import get_logger
+from logic.objects import AlbumObject
+from logic.profiling import get_profiler
+
+logger = get_logger(__name__)
+
+# Stored in the root of the processed library while renames are in progress
+JOURNAL_FILE_NAME = ".fullalbumindexer.journal"
+
+# Prefix of the temporary names used to break rename cycles
+TEMP_NAME_PREFIX = ".fullalbumindexer-tmp-"
+
+
+@dataclass
+class RenameOperation:
+    """A single rename of the plan, album_obj is None for intermediate steps"""
+    source: str
+    destination: str
+    album_obj: Optional[AlbumObject] = None
+
+
+@dataclass
+class RenamePlan:
+    """Renames of a batch in an order in which no step overwrites a file"""
+    operations: List[RenameOperation] = field(default_factory=list)
+    # Album objects whose clean file name was changed to avoid a collision
+    resolved_collisions: List[AlbumObject] = field(default_factory=list)
+
+
+def add_collision_suffix(file_name: str, number: int) -> str:
+    """
+    Add a number to a file name, e.g. Artist - Album (2).opus
+    :param file_name: Clean file name
+    :param number: Number of the duplicate
+    :return: File name with number
+    """
+    stem, file_ending = os.path.splitext(file_name)
+    return f"{stem} ({number}){file_ending}"
+
+
+def build_rename_plan(album_objects: Iterable[AlbumObject],
+                      existing_paths: Optional[Set[str]] = None) -> RenamePlan:
+    """
+    Compute the renames of a batch of parsed files before any of them is executed.
+
+    Destinations are claimed in a hash index, a destination taken by another file of the batch
+    or by a file that is not renamed gets a number suffix. Chains like A -> B, B -> C are ordered
+    so B is moved first, cycles like A -> B, B -> A are broken with a temporary name.
+    Everything is done in O(n).
+    :param album_objects: Parsed album objects, their clean file names may be changed
+    :param existing_paths: Absolute paths of all files in the affected folders, if not set
+                           the file system is asked for every destination
+    :return: RenamePlan
+    """
+    album_objects = list(album_objects)
+    sources = {os.path.abspath(album_obj.complete_file_path) for album_obj in album_objects}
+
+    def is_occupied(path: str) -> bool:
+        # Files of the batch move away or keep their name, both cases are handled by the claims
+        if path in sources:
+            return False
+        if existing_paths is not None:
+            return path in existing_paths
+        return os.path.lexists(path)
+
+    plan = RenamePlan()
+    claimed: Dict[str, str] = {}
+
+    # Files that keep their name claim it first, so they are never pushed aside
+    for album_obj in album_objects:
+        source = os.path.abspath(album_obj.complete_file_path)
+        if _destination(album_obj) == source:
+            claimed[source] = source
+
+    by_source: Dict[str, RenameOperation] = {}
+    for album_obj in album_objects:
+        source = os.path.abspath(album_obj.complete_file_path)
+        destination = _destination(album_obj)
+        if claimed.get(destination) == source:
+            continue
+
+        clean_file_name = album_obj.clean_file_name
+        number = 1
+        while destination in claimed or is_occupied(destination):
+            number += 1
+            album_obj.clean_file_name = add_collision_suffix(clean_file_name, number)
+            destination = _destination(album_obj)
+        if number > 1:
+            plan.resolved_collisions.append(album_obj)
+
+        claimed[destination] = source
+        if destination != source:
+            by_source[source] = RenameOperation(source, destination, album_obj)
+
+    plan.operations = _order_operations(by_source)
+    return plan
+
+
+def _destination(album_obj: AlbumObject) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(album_obj.complete_file_path)),
+                        album_obj.clean_file_name)
+
+
+def _order_operations(by_source: Dict[str, RenameOperation]) -> List[RenameOperation]:
+    """
+    Order renames so every destination is free when its rename runs.
+    Destinations are unique, so the renames form simple chains and cycles.
+    """
+    ordered: List[RenameOperation] = []
+    done: Set[str] = set()
+
+    for start in by_source.values():
+        if start.source in done:
+            continue
+
+        # Follow the chain of renames whose source is the destination of the previous one
+        path: List[RenameOperation] = []
+        on_path: Set[str] = set()
+        operation = start
+        while operation is not None and operation.source not in done and operation.source not in on_path:
+            path.append(operation)
+            on_path.add(operation.source)
+            operation = by_source.get(operation.destination)
+
+        if operation is not None and operation.source in on_path:
+            # Cycle, park the first file under a temporary name to free its slot
+            first = path[0]
+            folder_path, file_name = os.path.split(first.source)
+            temp_path = os.path.join(folder_path, TEMP_NAME_PREFIX + file_name)
+            ordered.append(RenameOperation(first.source, temp_path))
+            ordered.extend(reversed(path[1:]))
+            ordered.append(RenameOperation(temp_path, first.destination, first.album_obj))
+        else:
+            # Chain, the last rename targets a free path and has to run first
+            ordered.extend(reversed(path))
+
+        done.update(on_path)
+
+    return ordered
+
+
+class RenameJournal:
+    """
+    Crash-safe log of planned renames in JSON lines format.
+
+    A batch is written and synced to disk before its first rename runs and marked as committed
+    after its last one. If a run is interrupted, the uncommitted batches are known without
+    rescanning the library and can be finished or rolled back with recover().
+    """
+
+    def __init__(self, journal_path: str):
+        self.journal_path = journal_path
+        self._file = None
+        self._batch_number = 0
+        self._open_batch: Optional[int] = None
+
+    @classmethod
+    def for_folder(cls, folder_path: str, shard_name: Optional[str] = None) -> "RenameJournal":
+        """
+        Get the journal stored in the root of the given library folder.
+        :param folder_path: Root folder of the music library
+        :param shard_name: Name of the shard of a sharded run, every shard keeps its own journal
+        :return: RenameJournal
+        """
+        if shard_name is not None:
+            base_name, ending = os.path.splitext(JOURNAL_FILE_NAME)
+            return cls(os.path.join(folder_path, f"{base_name}.{shard_name}{ending}"))
+        return cls(os.path.join(folder_path, JOURNAL_FILE_NAME))
+
+    def exists(self) -> bool:
+        """Check if an earlier run left renames behind"""
+        return os.path.exists(self.journal_path)
+
+    def begin(self, operations: List[RenameOperation]) -> int:
+        """
+        Record the renames of a batch before executing them.
+        :param operations: Ordered renames of the batch
+        :return: Number of the batch
+        """
+        if self._file is None:
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+        self._batch_number += 1
+        for operation in operations:
+            self._write({"batch": self._batch_number, "source": operation.source,
+                         "destination": operation.destination})
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._open_batch = self._batch_number
+        return self._batch_number
+
+    def commit(self, batch_number: int):
+        """
+        Mark all renames of a batch as finished.
+        :param batch_number: Number returned by begin
+        """
+        self._write({"batch": batch_number, "commit": True})
+        self._file.flush()
+        self._open_batch = None
+
+    def close(self):
+        """Close the journal, it is removed unless a batch was interrupted"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            if self._open_batch is None:
+                os.remove(self.journal_path)
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def recover(self, rollback: bool = False) -> int:
+        """
+        Finish or undo the renames of batches that were not committed, then remove the journal.
+        Whether a single rename already happened is decided by looking at its source and
+        destination, so a crash between a rename and its journal entry is handled as well.
+        :param rollback: If True, undo the renames, otherwise finish them
+        :return: Number of renames that were finished or undone
+        """
+        pending: Dict[int, List[RenameOperation]] = {}
+        with open(self.journal_path, "r", encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Incomplete last line of an interrupted write
+                    continue
+                if record.get("commit"):
+                    pending.pop(record["batch"], None)
+                else:
+                    pending.setdefault(record["batch"], []).append(
+                        RenameOperation(record["source"], record["destination"]))
+
+        count = 0
+        for batch_number in sorted(pending, reverse=rollback):
+            operations = pending[batch_number]
+            if rollback:
+                for operation in reversed(operations):
+                    if os.path.lexists(operation.destination) and not os.path.lexists(operation.source):
+                        os.rename(operation.destination, operation.source)
+                        count += 1
+            else:
+                for operation in operations:
+                    if os.path.lexists(operation.source) and not os.path.lexists(operation.destination):
+                        os.rename(operation.source, operation.destination)
+                        count += 1
+
+        os.remove(self.journal_path)
+        return count
+
+
+def execute_rename_plan(plan: RenamePlan, journal: Optional[RenameJournal] = None) -> List[AlbumObject]:
+    """
+    Execute the renames of a plan in order and update the paths of the album objects.
+    A destination that exists in the meantime is never overwritten.
+    :param plan: Plan returned by build_rename_plan
+    :param journal: Journal recording the batch, renames are not journaled if not set
+    :return: Album objects whose file could not be renamed
+    """
+    failed: List[AlbumObject] = []
+    if not plan.operations:
+        return failed
+
+    batch_number = journal.begin(plan.operations) if journal is not None else None
+    failed_sources: Set[str] = set()
+    profiler = get_profiler()
+    for operation in plan.operations:
+        try:
+            if operation.source in failed_sources:
+                # The first half of a broken cycle failed, there is nothing to move
+                raise FileNotFoundError(f"Temporary file missing: {operation.source}")
+            if os.path.lexists(operation.destination):
+                raise FileExistsError(f"Destination exists: {operation.destination}")
+            with profiler.stage("rename"):
+                os.rename(operation.source, operation.destination)
+            logger.info("Renamed file %s -> %s", operation.source, operation.destination)
+            if operation.album_obj is not None:
+                operation.album_obj.complete_file_path = operation.destination
+        except Exception as ex:
+            logger.error("Failed to rename file %s -> %s: %s: %s",
+                         operation.source, operation.destination, type(ex).__name__, ex)
+            if operation.album_obj is not None:
+                failed.append(operation.album_obj)
+            else:
+                failed_sources.add(operation.destination)
+
+    if journal is not None:
+        journal.commit(batch_number)
+    return failed
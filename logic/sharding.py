@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import re
+import socket
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from logic.log import get_logger
+from logic.objects import AlbumObject
+
+logger = get_logger(__name__)
+
+MANIFEST_VERSION = 1
+
+# Number of file records after which the manifest is flushed to disk
+FLUSH_INTERVAL = 100
+
+# Number added by the rename planner to a clean file name that is already taken, e.g. "Artist - Album (2)"
+COLLISION_SUFFIX_PATTERN = re.compile(r" \(\d+\)$")
+
+
+def relative_key(file_path: str, root_path: str) -> str:
+    """
+    Path of a file relative to the library folder with "/" separators,
+    the same on every host no matter where the library is mounted.
+    :param file_path: Path to the music file
+    :param root_path: Root folder of the music library
+    :return: Relative path
+    """
+    relative_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(root_path))
+    return relative_path.replace(os.sep, "/")
+
+
+def shard_key(relative_folder: str, clean_file_name: str) -> str:
+    """
+    Key a file is assigned to a shard by. Files of a folder that get the same clean file name
+    also get the same key, so only one shard ever renames files to that name and its numbered variants.
+    :param relative_folder: Folder of the file relative to the library folder, see relative_key
+    :param clean_file_name: Clean file name parsed from the name of the file, the name itself if it could not be parsed
+    :return: Key for Shard.contains
+    """
+    stem, file_ending = os.path.splitext(clean_file_name)
+    return f"{relative_folder}/{COLLISION_SUFFIX_PATTERN.sub('', stem)}{file_ending}".casefold()
+
+
+@dataclass(frozen=True)
+class Shard:
+    """One of count parts of a library, numbered from 1"""
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, spec: str) -> "Shard":
+        """
+        :param spec: Shard spec like "3/16"
+        :return: Shard
+        """
+        try:
+            index, count = (int(part) for part in spec.split("/"))
+        except ValueError:
+            raise ValueError(f"Invalid shard {spec!r}, expected K/N like 3/16")
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"Invalid shard {spec!r}, K must be between 1 and N")
+        return cls(index, count)
+
+    @property
+    def name(self) -> str:
+        """Name used for the per shard files in the library folder"""
+        return f"shard-{self.index}-of-{self.count}"
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+    def contains(self, key: str) -> bool:
+        """
+        Check if a file belongs to this shard. The hash of the key decides, so every host
+        assigns every file to the same shard without talking to the others.
+        :param key: Key of the file, see shard_key
+        :return: bool
+        """
+        digest = hashlib.blake2b(key.encode("utf-8", "surrogateescape"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.count == self.index - 1
+
+
+class ManifestWriter:
+    """
+    Result manifest of a run, one JSON object per line.
+
+    The first line describes the run, every processed file adds a line with its parsed fields,
+    status and processing time, and a last line holds the summary once the run finished.
+    A manifest without summary line belongs to a run that did not finish.
+    """
+
+    def __init__(self, manifest_path: str, root_path: str, shard: Optional[Shard] = None):
+        self.manifest_path = manifest_path
+        self.root_path = os.path.abspath(root_path)
+        self._counts = Counter()
+        self._pending = 0
+        self._started = time.time()
+        self._file = open(manifest_path, "w", encoding="utf-8")
+        self._write({
+            "type": "header",
+            "version": MANIFEST_VERSION,
+            "root": self.root_path,
+            "shard": str(shard) if shard is not None else None,
+            "host": socket.gethostname(),
+            "started": self._started,
+        })
+
+    def record(self, file_path: str, status: str, album_obj: Optional[AlbumObject], seconds: float):
+        """
+        Add the result of one file.
+        :param file_path: Path to the music file as discovered
+        :param status: Final status of the file
+        :param album_obj: Parsed fields, None if the name could not be parsed
+        :param seconds: Time spent on the file
+        """
+        self._counts[status] += 1
+        self._write({
+            "type": "file",
+            "path": relative_key(file_path, self.root_path),
+            "status": status,
+            "album": album_obj.as_dict() if album_obj is not None else None,
+            "seconds": round(seconds, 6),
+        })
+        self._pending += 1
+        if self._pending >= FLUSH_INTERVAL:
+            self._file.flush()
+            self._pending = 0
+
+    def close(self, completed: bool = True):
+        """
+        Write the summary line and close the manifest.
+        :param completed: False if the run was aborted, the summary is left out then
+        """
+        if self._file is None:
+            return
+        if completed:
+            self._write({
+                "type": "summary",
+                "counts": dict(self._counts),
+                "elapsed": round(time.time() - self._started, 3),
+            })
+        self._file.close()
+        self._file = None
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+@dataclass
+class MergedManifest:
+    """Combined results of the manifests of several shards"""
+    counts: Counter = field(default_factory=Counter)
+    # Shard spec to elapsed seconds, None for shards that did not finish
+    shards: Dict[str, Optional[float]] = field(default_factory=dict)
+    shard_count: Optional[int] = None
+    duplicate_paths: Set[str] = field(default_factory=set)
+    total_seconds: float = 0.0
+    files: int = 0
+
+    @property
+    def missing_shards(self) -> List[str]:
+        """Shards of the same split without a manifest"""
+        if self.shard_count is None:
+            return []
+        return [f"{index}/{self.shard_count}" for index in range(1, self.shard_count + 1)
+                if f"{index}/{self.shard_count}" not in self.shards]
+
+    @property
+    def incomplete_shards(self) -> List[str]:
+        """Shards whose manifest has no summary line"""
+        return sorted(shard for shard, elapsed in self.shards.items() if elapsed is None)
+
+
+def merge_manifests(manifest_paths: Iterable[str], output_path: Optional[str] = None) -> MergedManifest:
+    """
+    Combine the manifests of several shards, optionally into one manifest file.
+    The manifests are streamed line by line, only the paths are kept in memory to find files
+    that were processed by more than one shard.
+    :param manifest_paths: Paths to the manifests
+    :param output_path: Path of a combined manifest to write, not written if not set
+    :return: MergedManifest
+    """
+    merged = MergedManifest()
+    seen_paths: Set[str] = set()
+    manifest_paths = list(manifest_paths)
+    output = None
+    if output_path is not None:
+        output = open(output_path, "w", encoding="utf-8")
+        output.write(json.dumps({"type": "header", "version": MANIFEST_VERSION, "root": None, "shard": None,
+                                 "merged": manifest_paths}, ensure_ascii=False) + "\n")
+    try:
+        for manifest_path in manifest_paths:
+            shard = manifest_path
+            with open(manifest_path, encoding="utf-8") as manifest:
+                for line_number, line in enumerate(manifest, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # The last line of an interrupted run may be cut off
+                        logger.warning("Invalid line %d in manifest %s", line_number, manifest_path)
+                        continue
+                    record_type = record.get("type")
+                    if record_type == "header":
+                        if record.get("version") != MANIFEST_VERSION:
+                            raise ValueError(f"Unsupported manifest version in {manifest_path}")
+                        shard = record.get("shard") or manifest_path
+                        if record.get("shard"):
+                            merged.shard_count = Shard.parse(record["shard"]).count
+                        merged.shards.setdefault(shard, None)
+                    elif record_type == "file":
+                        path = record["path"]
+                        if path in seen_paths:
+                            merged.duplicate_paths.add(path)
+                        seen_paths.add(path)
+                        merged.counts[record["status"]] += 1
+                        merged.total_seconds += record.get("seconds") or 0.0
+                        merged.files += 1
+                        if output is not None:
+                            output.write(line if line.endswith("\n") else line + "\n")
+                    elif record_type == "summary":
+                        merged.shards[shard] = record.get("elapsed")
+        if output is not None:
+            output.write(json.dumps({"type": "summary", "counts": dict(merged.counts),
+                                     "shards": merged.shards}, ensure_ascii=False) + "\n")
+    finally:
+        if output is not None:
+            output.close()
+    return merged
@@ -0,0 +1,273 @@
+import bisect
+import os
+import struct
+from typing import BinaryIO, List, Optional, Tuple
+
+from mutagen.ogg import OggPage
+from mutagen.oggopus import OggOpus
+
+from logic.chapters import Chapter
+from logic.log import get_logger
+from logic.objects import AlbumObject
+from logic.rename_planner import TEMP_NAME_PREFIX
+
+logger = get_logger(__name__)
+
+# Written into every folder of split tracks, such folders are not processed again
+SPLIT_MARKER_NAME = ".fullalbumindexer-split"
+
+# Opus granule positions always count samples at 48 kHz
+OPUS_SAMPLE_RATE = 48000
+
+# File endings that can be split without re-encoding
+SPLIT_FILE_ENDINGS = frozenset({".opus"})
+
+# Characters that can not be part of a file name
+INVALID_FILE_NAME_CHARS = str.maketrans({"/": "-", "\\": "-", "\0": ""})
+
+
+class SplitError(Exception):
+    """Raised if a file can not be split"""
+
+
+def can_split(file_path: str) -> bool:
+    """
+    :param file_path: Path to the music file
+    :return: True if the file type can be split without re-encoding
+    """
+    return os.path.splitext(file_path)[1].lower() in SPLIT_FILE_ENDINGS
+
+
+def is_split_folder(folder_path: str) -> bool:
+    """
+    :param folder_path: Folder to check
+    :return: True if the folder holds tracks split from a full album file
+    """
+    return os.path.exists(os.path.join(folder_path, SPLIT_MARKER_NAME))
+
+
+def get_split_folder(file_path: str) -> str:
+    """
+    :param file_path: Path to the full album file
+    :return: Folder the tracks are written to, named like the file without its ending
+    """
+    return os.path.splitext(os.path.abspath(file_path))[0]
+
+
+def get_track_file_name(number: int, title: str, file_ending: str) -> str:
+    """
+    :param number: Track number, starting at 1
+    :param title: Track title
+    :param file_ending: File ending including the dot
+    :return: File name of a split track, e.g. "01 Intro.opus"
+    """
+    return f"{number:02d} {title.translate(INVALID_FILE_NAME_CHARS).strip()}{file_ending}"
+
+
+class _TrackWriter:
+    """Writes the pages of one track, always holding back the latest page so it can be closed as last page"""
+
+    def __init__(self, file: BinaryIO, serial: int):
+        self.file = file
+        self.serial = serial
+        self.sequence = 0
+        # Page waiting to be written and its new granule position
+        self._held: Optional[Tuple[OggPage, int]] = None
+        # Last written page and its offset in the file, so it can still be marked as last page
+        self._written: Optional[Tuple[OggPage, int]] = None
+
+    def write_headers(self, head_packet: bytes, tags_packet: bytes):
+        head_page = OggPage()
+        head_page.packets = [head_packet]
+        head_page.first = True
+        self._write(head_page, 0)
+        for page in OggPage.from_packets([tags_packet], sequence=self.sequence):
+            self._write(page, 0)
+
+    def add(self, page: OggPage, position: int):
+        if self._held is not None:
+            self._write(*self._held)
+        self._held = (page, position)
+
+    def close(self) -> Optional[OggPage]:
+        """
+        Write the held page as last page of the track.
+        :return: The held page before a packet continuing on the next page was removed from it
+        """
+        if self._held is None:
+            return None
+        page, position = self._held
+        self._held = None
+        original_packets = list(page.packets)
+        if not page.complete:
+            # The packet continues on the first page of the next track
+            page.packets = page.packets[:-1]
+            page.complete = True
+        if page.packets or self._written is None:
+            page.last = True
+            self._write(page, position)
+        else:
+            # Nothing is left of the page, the page before it ends the track instead of an empty page
+            written_page, offset = self._written
+            written_page.last = True
+            end = self.file.tell()
+            self.file.seek(offset)
+            self.file.write(written_page.write())
+            self.file.seek(end)
+        page.packets = original_packets
+        return page
+
+    def _write(self, page: OggPage, position: int):
+        page.serial = self.serial
+        page.sequence = self.sequence
+        page.position = position
+        offset = self.file.tell()
+        self.file.write(page.write())
+        self._written = (page, offset)
+        self.sequence += 1
+
+
+def split_ogg_opus(file_path: str, chapters: List[Chapter], album_obj: AlbumObject) -> List[str]:
+    """
+    Cut an Ogg Opus file into one file per chapter without re-encoding.
+
+    The audio pages are copied as they are, so every cut happens at the page boundary
+    closest after the start of a chapter, about a second at most. Only one page is held in
+    memory at a time, no matter how long the file is. Every track gets new comment headers
+    with the album fields and its title and number, granule positions start at zero again.
+    :param file_path: Path to the full album Opus file
+    :param chapters: Chapters ordered by start
+    :param album_obj: Album object of the file, its fields are written to every track
+    :return: Paths of the written tracks
+    """
+    output_folder = get_split_folder(file_path)
+    if is_split_folder(output_folder):
+        logger.info("File was already split into %s", output_folder)
+        return []
+    if len(chapters) < 2:
+        raise SplitError(f"Need at least two chapters to split {file_path}")
+
+    comments = OggOpus(file_path).tags
+    file_ending = os.path.splitext(file_path)[1]
+    track_paths = [os.path.join(output_folder, get_track_file_name(number, chapter.title, file_ending))
+                   for number, chapter in enumerate(chapters, 1)]
+
+    os.makedirs(output_folder, exist_ok=True)
+    # The marker comes first, so a watcher never picks up the tracks
+    with open(os.path.join(output_folder, SPLIT_MARKER_NAME), "w", encoding="utf-8") as marker:
+        marker.write(os.path.basename(file_path) + "\n")
+
+    temp_paths = [os.path.join(output_folder, TEMP_NAME_PREFIX + os.path.basename(path)) for path in track_paths]
+    try:
+        with open(file_path, "rb") as source:
+            _copy_tracks(source, chapters, album_obj, comments, temp_paths)
+        for temp_path, track_path in zip(temp_paths, track_paths):
+            os.replace(temp_path, track_path)
+    except Exception:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        os.remove(os.path.join(output_folder, SPLIT_MARKER_NAME))
+        try:
+            os.rmdir(output_folder)
+        except OSError:
+            pass
+        raise
+
+    logger.info("Split %s into %d tracks", file_path, len(track_paths))
+    return track_paths
+
+
+def _copy_tracks(source: BinaryIO, chapters: List[Chapter], album_obj: AlbumObject, comments,
+                 temp_paths: List[str]):
+    head_page = OggPage(source)
+    if not head_page.packets or not head_page.packets[0].startswith(b"OpusHead"):
+        raise SplitError("Not an Ogg Opus file")
+    head_packet = head_page.packets[0]
+    serial = head_page.serial
+    pre_skip = struct.unpack("<H", head_packet[10:12])[0]
+    # Only the start of the stream has encoder delay to skip, later tracks begin with audio of the album
+    later_head_packet = head_packet[:10] + struct.pack("<H", 0) + head_packet[12:]
+
+    # Skip the comment header, it ends on its own page
+    page = OggPage(source)
+    while page.serial != serial or not (page.complete or len(page.packets) > 1):
+        page = OggPage(source)
+
+    chapter_starts = [chapter.start_ms for chapter in chapters]
+    track_index = -1
+    writer = None
+    output = None
+    # Granule position of the last page before the current track
+    cut_position = 0
+    last_position = 0
+    previous_page = None
+
+    try:
+        while True:
+            try:
+                page = OggPage(source)
+            except EOFError:
+                break
+            if page.serial != serial:
+                continue
+
+            page_start_ms = max(0, last_position - pre_skip) * 1000 // OPUS_SAMPLE_RATE
+            page_track = max(0, bisect.bisect_right(chapter_starts, page_start_ms) - 1)
+            if page_track > track_index + 1:
+                # Cuts only happen between pages, a chapter that ends before the next page starts has no page
+                short_index = track_index + 1
+                raise SplitError(f"Chapter {short_index + 1} \"{chapters[short_index].title}\" is too short "
+                                 f"to be cut at a page boundary")
+            if page_track != track_index:
+                if writer is not None:
+                    previous_page = writer.close()
+                    output.close()
+                track_index = page_track
+                cut_position = last_position
+                output = open(temp_paths[track_index], "wb")
+                writer = _TrackWriter(output, serial)
+                writer.write_headers(head_packet if track_index == 0 else later_head_packet,
+                                     _track_comments(comments, album_obj, chapters, track_index))
+                if page.continued and previous_page is not None and previous_page.packets:
+                    # Complete the packet that started on the last page of the previous track
+                    page.packets[0] = previous_page.packets[-1] + page.packets[0]
+                    page.continued = False
+                elif page.continued:
+                    page.packets = page.packets[1:]
+                    page.continued = False
+
+            page.first = False
+            page.last = False
+            if page.position >= 0:
+                writer.add(page, page.position - cut_position)
+                last_position = page.position
+            else:
+                writer.add(page, -1)
+
+        if writer is not None:
+            writer.close()
+    finally:
+        if output is not None:
+            output.close()
+
+    if track_index < len(chapters) - 1:
+        raise SplitError(f"Chapter {track_index + 2} starts after the end of the audio")
+
+
+def _track_comments(comments, album_obj: AlbumObject, chapters: List[Chapter], track_index: int) -> bytes:
+    for key in list(comments.keys()):
+        del comments[key]
+    fields = {
+        "ARTIST": album_obj.artist_name,
+        "ALBUM": album_obj.title_name,
+        "TITLE": chapters[track_index].title,
+        "TRACKNUMBER": str(track_index + 1),
+        "TRACKTOTAL": str(len(chapters)),
+        "DATE": album_obj.release_year,
+        "GENRE": album_obj.genre,
+    }
+    for key, value in fields.items():
+        if value is not None and str(value).strip():
+            comments[key] = [str(value).strip()]
+    return b"OpusTags" + comments.write(framing=False)
@@ -0,0 +1,69 @@
+import os
+
+from mutagen import PaddingInfo
+from mutagen.aiff import AIFF
+from mutagen.asf import ASF
+from mutagen.dsf import DSF
+from mutagen.flac import FLAC
+from mutagen.id3 import ID3FileType
+from mutagen.mp4 import MP4
+from mutagen.ogg import OggFileType
+from mutagen.wave import WAVE
+
+from logic.log import get_logger
+
+logger = get_logger(__name__)
+
+# Padding reserved behind the tags when a file has to be rewritten anyway, enough for a few
+# rounds of longer tags and chapter markers without rewriting the audio payload again
+RESERVED_PADDING = 16 * 1024
+
+# mutagen file types whose save() accepts a padding strategy
+PADDING_FILE_TYPES = (OggFileType, FLAC, ID3FileType, MP4, ASF, AIFF, WAVE, DSF)
+
+
+class PaddingStrategy:
+    """
+    Padding callback for mutagen that never gives up existing padding.
+
+    As long as the new tags fit into the old tag block plus its padding, the tag block is
+    overwritten in place and the audio data behind it is not touched. Only when the padding
+    is exhausted the file is rewritten, reserving RESERVED_PADDING for the next time.
+    """
+
+    def __init__(self, reserved_padding: int = RESERVED_PADDING):
+        self.reserved_padding = reserved_padding
+        self.in_place = True
+        # Size of the data behind the tag block, reported by mutagen
+        self.trailing_size = 0
+
+    def __call__(self, info: PaddingInfo) -> int:
+        self.trailing_size = info.size
+        if info.padding >= 0:
+            return info.padding
+        self.in_place = False
+        return self.reserved_padding
+
+
+def save_music_file(music_file, reserved_padding: int = RESERVED_PADDING) -> int:
+    """
+    Save the tags of a file loaded with music_tag, in place whenever the padding allows it.
+    :param music_file: File loaded with music_tag
+    :param reserved_padding: Padding reserved when the file has to be rewritten
+    :return: Approximate number of bytes written, the tag block for an in place update,
+             the whole file otherwise
+    """
+    if not isinstance(music_file.mfile, PADDING_FILE_TYPES):
+        # No padding support, e.g. APEv2 tags of WavPack files
+        music_file.save()
+        return os.path.getsize(music_file.filename)
+
+    strategy = PaddingStrategy(reserved_padding)
+    music_file.save(padding=strategy)
+    file_size = os.path.getsize(music_file.filename)
+    if strategy.in_place:
+        logger.debug("Updated tags in place: %s", music_file.filename)
+        return max(0, file_size - strategy.trailing_size)
+
+    logger.debug("Rewrote file to grow its tag padding to %d bytes: %s", reserved_padding, music_file.filename)
+    return file_size
@@ -1,14 +1,24 @@
 #!/usr/bin/env python3
 
+import json
 import unittest
 import os
 import shutil
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
-from main import run
-from logic.album_logic import get_album_from_file_path, set_music_information
+import music_tag
+
+from main import main, run, watch
+from logic.album_logic import (get_album_from_file_path, set_music_information, iter_music_files, parse_many,
+                               get_rename_destination)
+from logic.async_pipeline import Stage, run_pipeline
+from logic.char_replacer_helper import TextCleaner
+from logic.library_index import LibraryIndex
 from logic.objects import AlbumObject
+from logic.tag_writer import save_music_file
+from logic.profiling import disable_profiling, enable_profiling, get_profiler, percentile
+from logic.watcher import FileWatcher
 
 
 class TestAlbumIndexer(unittest.TestCase):
@@ -145,6 +155,17 @@ class TestAlbumIndexer(unittest.TestCase):
             self.assertNotIn("̤", result.clean_file_name)
             self.assertNotIn("∙", result.clean_file_name)
 
+    def test_lookalike_glyphs_handling(self):
+        """Test replacement of mathematical and fullwidth look-alike letters"""
+        print("\nTesting look-alike glyph handling...")
+        test_cases = [
+            ("𝐆𝐨𝐫𝐢𝐥𝐥𝐚𝐳 - 𝘊𝘳𝘢𝘤𝘬𝘦𝘳 𝘐𝘴𝘭𝘢𝘯𝘥", "Gorillaz - Cracker Island"),
+            ("Ｇｏｒｉｌｌａｚ － Ｄｅｍｏｎ Ｄａｙｓ", "Gorillaz - Demon Days"),
+            ("Paavo Järvi", "Paavo Järvi"),
+        ]
+        for text, expected in test_cases:
+            self.assertEqual(TextCleaner.clean_special_characters(text), expected)
+
     def test_full_album_tag_removal(self):
         """Test removal of [Full Album] and similar tags"""
         print("\nTesting full album tag removal...")
@@ -212,6 +233,324 @@ class TestAlbumIndexer(unittest.TestCase):
             self.assertEqual(result.artist_name, test_case["expected"]["artist"])
             self.assertEqual(result.title_name.strip(), test_case["expected"]["title"])
 
+    def test_parallel_run_matches_sequential(self):
+        """Test that running with several jobs gives the same summary as a single job"""
+        print("\nTesting parallel processing...")
+        file_names = [
+            "Artist One - First Album (Full Album) 2001.opus",
+            "Artist Two - Second Album [HQ].opus",
+            "Artist Three - Third Album 1999.opus",
+            "No Separator Here.opus",
+        ]
+        for file_name in file_names:
+            self.create_test_file(file_name)
+
+        summary = run(str(self.test_folder_path), jobs=4)
+
+        self.assertIsNotNone(summary)
+        self.assertEqual(summary.total_files, 4)
+        self.assertEqual(summary.processed_files, 3)
+        self.assertEqual(summary.skipped_files, 1)
+        self.assertEqual(summary.error_files, 0)
+        self.assertTrue((self.test_folder_path / "Artist One - First Album.opus").exists())
+
+    def test_index_skips_unchanged_files(self):
+        """Test that a second indexed run skips files that were already tagged"""
+        print("\nTesting incremental index...")
+        self.create_test_file("Artist - Album (Full Album) 2001.opus")
+        self.create_test_file("Other Artist - Other Album.opus")
+
+        first = run(str(self.test_folder_path), use_index=True)
+        self.assertEqual(first.processed_files, 2)
+        self.assertEqual(first.unchanged_files, 0)
+
+        second = run(str(self.test_folder_path), use_index=True)
+        self.assertEqual(second.total_files, 2)
+        self.assertEqual(second.processed_files, 0)
+        self.assertEqual(second.unchanged_files, 2)
+
+        # A modified file is no longer considered unchanged
+        modified_path = str(self.test_folder_path / "Artist - Album.opus")
+        with open(modified_path, "ab") as music_file:
+            music_file.write(b"\0")
+        with LibraryIndex.for_folder(str(self.test_folder_path)) as index:
+            self.assertFalse(index.is_unchanged(modified_path))
+            self.assertTrue(index.is_unchanged(str(self.test_folder_path / "Other Artist - Other Album.opus")))
+
+    def test_index_is_dropped_when_parse_settings_change(self):
+        """Test that indexed files are tagged again when the parse settings of a run change"""
+        print("\nTesting index with changed parse settings...")
+        self.create_test_file("Artist - Album 2001.opus")
+        genre_map_path = self.test_folder_path / "genres.json"
+        genre_map_path.write_text('{"test_folder": "Classic Rock"}', encoding="utf-8")
+
+        self.assertEqual(run(str(self.test_folder_path), use_index=True).processed_files, 1)
+        second = run(str(self.test_folder_path), use_index=True, genre_map=str(genre_map_path))
+        self.assertEqual((second.processed_files, second.unchanged_files), (1, 0))
+        music_file = music_tag.load_file(str(self.test_folder_path / "Artist - Album.opus"))
+        self.assertEqual(str(music_file["genre"]), "Classic Rock")
+
+        third = run(str(self.test_folder_path), use_index=True, genre_map=str(genre_map_path))
+        self.assertEqual(third.unchanged_files, 1)
+
+        file_path = str(self.test_folder_path / "Artist - Album.opus")
+        with LibraryIndex.for_folder(str(self.test_folder_path), settings="other") as index:
+            self.assertFalse(index.is_unchanged(file_path))
+
+    def test_index_is_dropped_when_chapters_are_enabled(self):
+        """Test that chapters are written to an indexed library once --chapters is added"""
+        print("\nTesting index with chapters enabled later...")
+        self.create_test_file("Artist - Album.opus")
+        (self.test_folder_path / "Artist - Album.description").write_text("00:00 Intro\n03:12 Outro\n",
+                                                                          encoding="utf-8")
+        self.assertEqual(run(str(self.test_folder_path), use_index=True).processed_files, 1)
+        self.assertEqual(run(str(self.test_folder_path), use_index=True).unchanged_files, 1)
+
+        summary = run(str(self.test_folder_path), use_index=True, chapters=True)
+        self.assertEqual((summary.processed_files, summary.unchanged_files), (1, 0))
+        self.assertEqual(run(str(self.test_folder_path), use_index=True, chapters=True).unchanged_files, 1)
+
+    def test_unchanged_tags_are_not_saved(self):
+        """Test that a file already holding the target tags is not written again"""
+        print("\nTesting skip of identical tag writes...")
+        self.create_test_file("Artist - Album 2001.opus")
+        file_path = str(self.test_folder_path / "Artist - Album 2001.opus")
+        album_obj = get_album_from_file_path(file_path)
+
+        self.assertTrue(set_music_information(album_obj))
+        with patch("music_tag.file.AudioFile.save") as save_mock:
+            self.assertFalse(set_music_information(album_obj))
+            save_mock.assert_not_called()
+            self.assertTrue(set_music_information(album_obj, skip_unchanged=False))
+            save_mock.assert_called_once()
+
+        summary = run(str(self.test_folder_path))
+        self.assertEqual(summary.unchanged_files, 1)
+        self.assertEqual(summary.processed_files, 0)
+
+    def test_music_file_discovery(self):
+        """Test lazy discovery of music files with extension filter and ordering"""
+        print("\nTesting music file discovery...")
+        os.makedirs(self.test_folder_path / "Rock")
+        for file_name in ["B - Second.opus", "A - First.MP3", "cover.jpg", "notes.txt",
+                          "Rock/C - Third.flac"]:
+            self.create_test_file(file_name)
+
+        names = [entry.name for entry in iter_music_files(str(self.test_folder_path))]
+        self.assertEqual(names, ["A - First.MP3", "B - Second.opus", "C - Third.flac"])
+
+        names = [entry.name for entry in iter_music_files(str(self.test_folder_path), recursive=False)]
+        self.assertEqual(names, ["A - First.MP3", "B - Second.opus"])
+
+        summary = run(str(self.test_folder_path), recursive=True, dry_run=True)
+        self.assertEqual(summary.total_files, 3)
+
+    def test_parse_without_file_system(self):
+        """Test that parsing works on names of files that do not exist"""
+        print("\nTesting pure parsing...")
+        names = [
+            "/music/Rock/Gorillaz - Cracker Island (Full Album) 2023.opus",
+            "/music/Rock/No Separator.opus",
+            "/music/Jazz/Miles Davis - Kind of Blue [HQ].mp3",
+        ]
+        albums = list(parse_many(names))
+
+        self.assertEqual(len(albums), 3)
+        self.assertEqual(albums[0].artist_name, "Gorillaz")
+        self.assertEqual(albums[0].title_name.strip(), "Cracker Island")
+        self.assertEqual(albums[0].release_year, "2023")
+        self.assertEqual(albums[0].genre, "Rock")
+        self.assertEqual(albums[0].complete_file_path, names[0])
+        self.assertIsNone(albums[1])
+        self.assertEqual(albums[2].clean_file_name, "Miles Davis - Kind of Blue.mp3")
+        self.assertEqual(get_rename_destination(albums[2]), "/music/Jazz/Miles Davis - Kind of Blue.mp3")
+
+    def test_dry_run_does_not_rename(self):
+        """Test that a dry run leaves the files untouched"""
+        print("\nTesting dry run...")
+        file_name = "Artist - Album (Full Album) 2001.opus"
+        self.create_test_file(file_name)
+
+        summary = run(str(self.test_folder_path), dry_run=True)
+
+        self.assertEqual(summary.processed_files, 1)
+        self.assertTrue((self.test_folder_path / file_name).exists())
+        self.assertFalse((self.test_folder_path / "Artist - Album.opus").exists())
+
+    def test_run_keeps_files_with_same_clean_name(self):
+        """Test that two rips of the same album are both kept"""
+        print("\nTesting rename collisions...")
+        self.create_test_file("Artist - Album (Full Album).opus")
+        self.create_test_file("Artist - Album [HQ].opus")
+
+        summary = run(str(self.test_folder_path))
+
+        self.assertEqual(summary.processed_files, 2)
+        self.assertEqual(sorted(os.listdir(self.test_folder_path)),
+                         ["Artist - Album (2).opus", "Artist - Album.opus"])
+
+    def test_album_object_fields(self):
+        """Test the slotted album object and the clean file name alias"""
+        album_obj = AlbumObject(artist_name="Artist", title_name="Album")
+        album_obj.clean_file_path = "Artist - Album.opus"
+
+        self.assertEqual(album_obj.clean_file_name, "Artist - Album.opus")
+        self.assertFalse(hasattr(album_obj, "__dict__"))
+        with self.assertRaises(AttributeError):
+            album_obj.unknown_field = "value"
+        self.assertEqual(album_obj.as_dict()["artist_name"], "Artist")
+        self.assertEqual(album_obj.as_dict(), AlbumObject(artist_name="Artist", title_name="Album",
+                                                          clean_file_name="Artist - Album.opus").as_dict())
+        # Album objects are compared and hashed by identity, e.g. as keys of the rename results
+        self.assertEqual(len({album_obj, AlbumObject(**album_obj.as_dict())}), 2)
+
+    def test_async_run_matches_sequential(self):
+        """Test that the asyncio pipeline gives the same summary as the default run"""
+        print("\nTesting asyncio pipeline...")
+        for file_name in ["A - First (Full Album).opus", "B - Second 1999.opus", "No Separator.opus",
+                          "C - Third [HQ].opus"]:
+            self.create_test_file(file_name)
+
+        summary = run(str(self.test_folder_path), jobs=3, use_async=True)
+
+        self.assertEqual(summary.total_files, 4)
+        self.assertEqual(summary.processed_files, 3)
+        self.assertEqual(summary.skipped_files, 1)
+        self.assertTrue((self.test_folder_path / "B - Second.opus").exists())
+
+        summary = run(str(self.test_folder_path), use_async=True)
+        self.assertEqual(summary.unchanged_files, 3)
+
+    def test_async_pipeline_keeps_order(self):
+        """Test that results of the asyncio pipeline are consumed in input order"""
+        import asyncio
+        import random
+        import time
+
+        def slow_double(value):
+            time.sleep(random.random() / 100)
+            return value * 2
+
+        results = []
+        stages = [Stage("double", slow_double, workers=4), Stage("increment", lambda value: value + 1, workers=2)]
+        asyncio.run(run_pipeline(range(50), stages, results.append, queue_size=8))
+        self.assertEqual(results, [value * 2 + 1 for value in range(50)])
+
+    def test_profiling_records_stages(self):
+        """Test that an enabled profiler records every stage of a run"""
+        print("\nTesting profiling...")
+        self.create_test_file("Artist - Album (Full Album).opus")
+        profiler = enable_profiling()
+        try:
+            run(str(self.test_folder_path))
+        finally:
+            disable_profiling()
+
+        report = profiler.report()
+        self.assertEqual(report["files"], 1)
+        self.assertGreater(report["bytes_written"], 0)
+        for stage in ("discovery", "parse", "rename", "tag_load", "tag_save"):
+            self.assertEqual(report["stages"][stage]["count"], 1)
+        self.assertFalse(get_profiler().enabled)
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0], 0.5), 2.0)
+        self.assertEqual(percentile([float(value) for value in range(1, 101)], 0.95), 95.0)
+
+    def test_profile_json_in_other_modes(self):
+        """Test that --profile-json is written by modes that do not run the indexer"""
+        print("\nTesting profiling of other modes...")
+        self.create_test_file("Artist - Album.opus")
+        profile_path = self.test_folder_path / "profile.json"
+        with patch("sys.argv", ["main.py", "--find-duplicates", "--profile-json", str(profile_path),
+                                str(self.test_folder_path)]):
+            main()
+        with open(profile_path, encoding="utf-8") as profile_file:
+            self.assertIn("stages", json.load(profile_file))
+        self.assertFalse(get_profiler().enabled)
+
+    def test_tags_are_updated_in_place(self):
+        """Test that reserved padding lets later tag changes skip rewriting the audio data"""
+        print("\nTesting in place tag updates...")
+        self.create_test_file("Artist - Album.opus")
+        file_path = str(self.test_folder_path / "Artist - Album.opus")
+
+        music_file = music_tag.load_file(file_path)
+        music_file["artist"] = "Artist"
+        save_music_file(music_file)
+        size_after_first_save = os.path.getsize(file_path)
+
+        for artist in ("A much longer artist name " * 20, "Short"):
+            music_file = music_tag.load_file(file_path)
+            music_file["artist"] = artist
+            bytes_written = save_music_file(music_file)
+            self.assertLess(bytes_written, size_after_first_save)
+            self.assertEqual(os.path.getsize(file_path), size_after_first_save)
+            self.assertEqual(music_tag.load_file(file_path)["artist"].value, artist)
+
+    def test_watcher_waits_for_files_to_settle(self):
+        """Test that the polling watcher reports new files only after they stopped changing"""
+        print("\nTesting watcher debouncing...")
+        self.create_test_file("Existing - Album.opus")
+        watcher = FileWatcher(str(self.test_folder_path), settle_seconds=10, use_inotify=False)
+        watcher.start()
+        watcher.poll()
+        self.assertEqual(list(watcher.settled_files(now=1000)), [])
+
+        os.makedirs(self.test_folder_path / "New")
+        file_path = str(self.test_folder_path / "New" / "Artist - Album.opus")
+        with open(file_path, "wb") as file:
+            file.write(b"partial")
+        watcher.poll()
+        self.assertEqual(list(watcher.settled_files(now=0)), [])
+
+        with open(file_path, "ab") as file:
+            file.write(b" download")
+        now = 100
+        self.assertEqual(list(watcher.settled_files(now=now)), [])
+        self.assertEqual(list(watcher.settled_files(now=now + 5)), [])
+        self.assertEqual(list(watcher.settled_files(now=now + 10)), [os.path.abspath(file_path)])
+        self.assertEqual(list(watcher.settled_files(now=now + 20)), [])
+
+    def test_polling_watcher_reports_rewritten_files(self):
+        """Test that the polling watcher reports a file rewritten in place, like inotify does"""
+        print("\nTesting watcher with rewritten files...")
+        self.create_test_file("Existing - Album.opus")
+        file_path = str(self.test_folder_path / "Existing - Album.opus")
+        watcher = FileWatcher(str(self.test_folder_path), settle_seconds=0, use_inotify=False)
+        watcher.start()
+        folder_mtime = os.stat(self.test_folder_path).st_mtime_ns
+        watcher.poll()
+        self.assertEqual(list(watcher.settled_files()), [])
+
+        with open(file_path, "ab") as file:
+            file.write(b"\0")
+        # Make sure only the file changed
+        os.utime(self.test_folder_path, ns=(folder_mtime, folder_mtime))
+        watcher.poll()
+        self.assertEqual(list(watcher.settled_files()), [os.path.abspath(file_path)])
+        watcher.poll()
+        self.assertEqual(list(watcher.settled_files()), [])
+
+    def test_watch_processes_new_files(self):
+        """Test that watch mode renames and tags a file once it landed in the folder"""
+        print("\nTesting watch mode...")
+        watcher = FileWatcher(str(self.test_folder_path), settle_seconds=0, poll_interval=0.01,
+                              use_inotify=False)
+        original_poll = watcher.poll
+
+        def poll_with_download():
+            # The download finishes after watching started
+            if not (self.test_folder_path / "Artist - Album (Full Album).opus").exists():
+                self.create_test_file("Artist - Album (Full Album).opus")
+            original_poll()
+
+        with patch.object(watcher, "poll", side_effect=poll_with_download):
+            summary = watch(str(self.test_folder_path), watcher=watcher, max_files=1)
+
+        self.assertEqual(summary.processed_files, 1)
+        clean_path = self.test_folder_path / "Artist - Album.opus"
+        self.assertTrue(clean_path.exists())
+        self.assertEqual(music_tag.load_file(str(clean_path))["artist"].value, "Artist")
+
 
 def run_tests():
     """Run all tests with detailed output"""
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from logic.album_logic import parse_filename
+from logic.canonical_names import CanonicalNames, NameIndex
+
+
+class TestCanonicalNames(unittest.TestCase):
+    def setUp(self):
+        self.names = CanonicalNames()
+        self.names.add("Gorillaz", "Demon Days", 40)
+        self.names.add("GORILLAZ", "demon days", 2)
+        self.names.add("Gorilaz", "Demon Dayz", 1)
+        self.names.add("Gorillaz", "Live 1998", 1)
+        self.names.add("Blur", "Parklife", 10)
+        self.names.merge_similar()
+
+    def test_exact_lookup_ignores_case(self):
+        """Test that spellings differing in case snap to the most frequent one"""
+        for artist in ("Gorillaz", "GORILLAZ", "gorillaz", " gorillaz  "):
+            self.assertEqual(self.names.canonical_artist(artist), "Gorillaz")
+
+    def test_fuzzy_lookup(self):
+        """Test that misspelled names snap to similar known names"""
+        self.assertEqual(self.names.canonical_artist("Gorilaz"), "Gorillaz")
+        self.assertEqual(self.names.canonical_artist("Gorrillaz"), "Gorillaz")
+        self.assertEqual(self.names.canonical_album("Gorillaz", "Demon  Dayz"), "Demon Days")
+        self.assertEqual(self.names.canonical_artist("Unknown Artist"), "Unknown Artist")
+
+    def test_numbers_must_match(self):
+        """Test that names only differing in a number are not merged"""
+        self.assertEqual(self.names.canonical_album("Gorillaz", "live 1998"), "Live 1998")
+        self.assertEqual(self.names.canonical_album("Gorillaz", "Live 1999"), "Live 1999")
+
+    def test_albums_are_looked_up_per_artist(self):
+        """Test that an album is only snapped to albums of the same artist"""
+        self.assertEqual(self.names.canonical_album("Blur", "Demon Dayz"), "Demon Dayz")
+        self.assertEqual(self.names.canonical_album("Blur", "PARKLIFE"), "Parklife")
+
+    def test_lookups_are_cached(self):
+        """Test that repeated names are answered from the cache"""
+        index = NameIndex()
+        index.add("Gorillaz")
+        for _ in range(5):
+            self.assertEqual(index.canonicalize("Gorilaz"), "Gorillaz")
+        self.assertEqual(index.cache_info().hits, 4)
+
+    def test_parser_snaps_names(self):
+        """Test that the parsed artist, title and clean file name use the canonical spellings"""
+        album = parse_filename("/music/Rock/GORILAZ - demon dayz (Full Album).opus", canonical_names=self.names)
+        self.assertEqual(album.artist_name, "Gorillaz")
+        self.assertEqual(album.title_name, "Demon Days")
+        self.assertEqual(album.clean_file_name, "Gorillaz - Demon Days.opus")
+
+    def test_dump_round_trip(self):
+        """Test that an exported dump loads the same canonical names"""
+        with tempfile.TemporaryDirectory() as folder_path:
+            dump_path = os.path.join(folder_path, "names.tsv")
+            self.names.export_dump(dump_path)
+            loaded = CanonicalNames.from_dump(dump_path)
+        self.assertEqual(list(loaded.iter_names()), list(self.names.iter_names()))
+        self.assertEqual(loaded.canonical_artist("gorilaz"), "Gorillaz")
+
+
+if __name__ == '__main__':
+    unittest.main()
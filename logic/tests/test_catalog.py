@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from logic.catalog import Catalog, parse_year
+from logic.objects import AlbumObject
+from main import run
+
+EMPTY_OPUS_PATH = Path(__file__).parent / "emptyOpusFile.opus"
+
+
+def make_album(path: str, artist: str, title: str, year: str = "", genre: str = "") -> AlbumObject:
+    return AlbumObject(complete_file_path=path, artist_name=artist, title_name=title, release_year=year,
+                       genre=genre, file_ending=".opus")
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder_path = self.temp_dir.name
+        self.catalog_path = os.path.join(self.folder_path, "catalog.sqlite")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parse_year(self):
+        """Test that years are read from plain years and dates"""
+        self.assertEqual(parse_year("1994"), 1994)
+        self.assertEqual(parse_year("1994-05-01"), 1994)
+        self.assertIsNone(parse_year(""))
+        self.assertIsNone(parse_year("94"))
+
+    def test_query(self):
+        """Test filtering by genre and decade, ignoring the case of names"""
+        with Catalog(self.catalog_path) as catalog:
+            catalog.record(make_album("/music/a.opus", "Artist", "First", "1994", "Rock"), 100, 2400.0)
+            catalog.record(make_album("/music/b.opus", "Artist", "Second", "1999", "Rock"), 200)
+            catalog.record(make_album("/music/c.opus", "Other", "Third", "2001", "Rock"), 300)
+            catalog.record(make_album("/music/d.opus", "Other", "Fourth", "", "Jazz"))
+
+        with Catalog(self.catalog_path) as catalog:
+            self.assertEqual(len(catalog), 4)
+            self.assertEqual([entry.title for entry in catalog.query(genre="rock", decade=1995)],
+                             ["First", "Second"])
+            self.assertEqual([entry.title for entry in catalog.query(artist="OTHER")], ["Fourth", "Third"])
+            entry = catalog.query(title="First")[0]
+            self.assertEqual((entry.year, entry.decade, entry.size, entry.duration), (1994, 1990, 100, 2400.0))
+            self.assertEqual(catalog.count_by(["genre", "decade"]),
+                             [("Jazz", None, 1, 0), ("Rock", 1990, 2, 2400.0), ("Rock", 2000, 1, 0)])
+            with self.assertRaises(ValueError):
+                catalog.count_by(["path; DROP TABLE albums"])
+
+    def test_update_keeps_known_values(self):
+        """Test that an update keeps the stored length and removes the entry of the old path"""
+        with Catalog(self.catalog_path) as catalog:
+            catalog.record(make_album("/music/old.opus", "Artist", "Album"), 100, 60.0)
+            catalog.record(make_album("/music/old.opus", "Artist", "Album", "2001"), 120)
+            self.assertEqual([(entry.year, entry.size, entry.duration) for entry in catalog.query()],
+                             [(2001, 120, 60.0)])
+            catalog.record(make_album("/music/new.opus", "Artist", "Album", "2001"), previous_path="/music/old.opus")
+            self.assertEqual([entry.path for entry in catalog.query()], ["/music/new.opus"])
+
+    def test_run_writes_catalog(self):
+        """Test that a run records every tagged file with its size and length"""
+        os.makedirs(os.path.join(self.folder_path, "Rock"))
+        shutil.copy(EMPTY_OPUS_PATH, os.path.join(self.folder_path, "Rock", "Artist - Album (Full Album) 1994.opus"))
+        shutil.copy(EMPTY_OPUS_PATH, os.path.join(self.folder_path, "Rock", "No Separator Here.opus"))
+
+        summary = run(self.folder_path, recursive=True, catalog=self.catalog_path)
+        self.assertEqual(summary.processed_files, 1)
+
+        with Catalog(self.catalog_path) as catalog:
+            entries = catalog.query(genre="Rock", decade=1990)
+        self.assertEqual(len(entries), 1)
+        self.assertEqual((entries[0].artist, entries[0].title, entries[0].year), ("Artist", "Album", 1994))
+        renamed_path = os.path.join(os.path.abspath(self.folder_path), "Rock", "Artist - Album.opus")
+        self.assertEqual(entries[0].path, renamed_path)
+        self.assertEqual(entries[0].size, os.path.getsize(renamed_path))
+        self.assertGreater(entries[0].duration, 0)
+
+    def test_catalog_of_indexed_library(self):
+        """Test that files skipped by the index are recorded with the fields stored in the index"""
+        os.makedirs(os.path.join(self.folder_path, "Rock"))
+        shutil.copy(EMPTY_OPUS_PATH, os.path.join(self.folder_path, "Rock", "Artist - Album 1994.opus"))
+        shutil.copy(EMPTY_OPUS_PATH, os.path.join(self.folder_path, "Rock", "Other - Second 2001.opus"))
+        run(self.folder_path, recursive=True, use_index=True)
+
+        summary = run(self.folder_path, recursive=True, use_index=True, catalog=self.catalog_path)
+        self.assertEqual(summary.unchanged_files, 2)
+        with Catalog(self.catalog_path) as catalog:
+            entries = catalog.query(genre="Rock")
+        self.assertEqual([(entry.artist, entry.title, entry.year) for entry in entries],
+                         [("Artist", "Album", 1994), ("Other", "Second", 2001)])
+        renamed_path = os.path.join(os.path.abspath(self.folder_path), "Rock", "Artist - Album.opus")
+        self.assertEqual((entries[0].path, entries[0].size), (renamed_path, os.path.getsize(renamed_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
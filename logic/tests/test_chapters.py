@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import music_tag
+from mutagen.id3 import ID3
+
+from logic import chapters as chapters_module
+from logic.chapters import Chapter, _write_id3_chapters, find_chapters, parse_tracklist, write_chapters
+
+TEST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emptyOpusFile.opus")
+
+
+class TestChapters(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, "Artist - Album [abc123].opus")
+        shutil.copy(TEST_FILE, self.file_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_tracklist_formats(self):
+        """Test the common tracklist layouts of video descriptions"""
+        expected = [Chapter(0, "Intro"), Chapter(192000, "Song Two"), Chapter(3723000, "Last (Live)")]
+        test_cases = [
+            "Tracklist:\n00:00 Intro\n03:12 Song Two\n1:02:03 Last (Live)\nThanks for listening",
+            "1. Intro - 0:00\n2. Song Two - 3:12\n3. Last (Live) - 1:02:03",
+            "[00:00] Intro\n[03:12] Song Two\n[1:02:03] Last (Live)",
+            "Album (00:00 Intro 03:12 Song Two 1:02:03 Last (Live))",
+        ]
+        for text in test_cases:
+            self.assertEqual(parse_tracklist(text), expected)
+
+    def test_track_lengths_are_summed_up(self):
+        """Test that a list of track lengths becomes start times"""
+        self.assertEqual(parse_tracklist("Intro 3:00\nSong 4:00\nOutro 2:30"),
+                         [Chapter(0, "Intro"), Chapter(180000, "Song"), Chapter(420000, "Outro")])
+
+    def test_no_tracklist(self):
+        """Test that single timestamps are not a tracklist"""
+        self.assertEqual(parse_tracklist("Live at 10:30"), [])
+        self.assertEqual(parse_tracklist(""), [])
+
+    def test_info_json(self):
+        """Test that chapters are read from a .info.json file, with and without ijson"""
+        info = {"formats": [{"url": "x" * 1000}] * 100, "description": "00:00 Wrong\n01:00 Tracklist",
+                "chapters": [{"start_time": 0.0, "title": "Intro"}, {"start_time": 192.5, "title": ""}]}
+        with open(os.path.join(self.temp_dir.name, "Artist - Album [abc123].info.json"), "w") as info_file:
+            json.dump(info, info_file)
+        expected = [Chapter(0, "Intro"), Chapter(192500, "Track 2")]
+        self.assertEqual(find_chapters(self.file_path), expected)
+        with patch.object(chapters_module, "ijson", None):
+            self.assertEqual(find_chapters(self.file_path), expected)
+
+    def test_truncated_info_json(self):
+        """Test that a broken .info.json is skipped for the other sources, with and without ijson"""
+        info = json.dumps({"description": "00:00 Wrong\n01:00 Tracklist",
+                           "chapters": [{"start_time": 0.0, "title": "Intro"}, {"start_time": 192.5}]})
+        with open(os.path.join(self.temp_dir.name, "Artist - Album [abc123].info.json"), "w") as info_file:
+            info_file.write(info[:len(info) // 2])
+        with open(os.path.join(self.temp_dir.name, "Artist - Album [abc123].description"), "w") as description:
+            description.write("00:00 Intro\n03:12 Outro\n")
+        expected = [Chapter(0, "Intro"), Chapter(192000, "Outro")]
+        with self.assertLogs(chapters_module.logger, level="WARNING"):
+            self.assertEqual(find_chapters(self.file_path), expected)
+        with patch.object(chapters_module, "ijson", None):
+            self.assertEqual(find_chapters(self.file_path), expected)
+
+    def test_description_sidecar(self):
+        """Test that chapters are read from a .description file"""
+        with open(os.path.join(self.temp_dir.name, "Artist - Album [abc123].description"), "w") as description:
+            description.write("00:00 Intro\n03:12 Outro\n")
+        self.assertEqual(find_chapters(self.file_path), [Chapter(0, "Intro"), Chapter(192000, "Outro")])
+
+    def test_vorbis_chapters(self):
+        """Test that Opus files get CHAPTERxxx comments and unchanged chapters are not rewritten"""
+        chapters = [Chapter(0, "Intro"), Chapter(192000, "Outro")]
+        music_file = music_tag.load_file(self.file_path)
+        self.assertTrue(write_chapters(music_file, chapters))
+        music_file.save()
+
+        music_file = music_tag.load_file(self.file_path)
+        tags = music_file.mfile.tags
+        self.assertEqual(tags["CHAPTER002"], ["00:03:12.000"])
+        self.assertEqual(tags["CHAPTER002NAME"], ["Outro"])
+        self.assertFalse(write_chapters(music_file, chapters))
+        self.assertTrue(write_chapters(music_file, chapters[:1] + [Chapter(200000, "Outro")]))
+
+    def test_id3_chapters(self):
+        """Test that ID3 tags get CHAP frames ending at the next chapter and a CTOC frame"""
+        tags = ID3()
+        chapters = [Chapter(0, "Intro"), Chapter(192000, "Outro")]
+        self.assertTrue(_write_id3_chapters(tags, chapters, 300000))
+        frames = sorted(tags.getall("CHAP"), key=lambda frame: frame.start_time)
+        self.assertEqual([(frame.start_time, frame.end_time) for frame in frames], [(0, 192000), (192000, 300000)])
+        self.assertEqual(str(frames[1].sub_frames["TIT2"]), "Outro")
+        self.assertEqual(tags.getall("CTOC")[0].child_element_ids, ["chp0", "chp1"])
+        self.assertFalse(_write_id3_chapters(tags, chapters, 300000))
+
+
+if __name__ == '__main__':
+    unittest.main()
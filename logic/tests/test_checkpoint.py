@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import music_tag
+
+import main
+from logic.album_logic import iter_music_files
+from logic.checkpoint import CHECKPOINT_FILE_NAME, Checkpoint, folder_key
+from logic.objects import AlbumObject
+from main import run
+
+EMPTY_OPUS_PATH = Path(__file__).parent / "emptyOpusFile.opus"
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder_path = os.path.abspath(self.temp_dir.name)
+        self.checkpoint_path = os.path.join(self.folder_path, CHECKPOINT_FILE_NAME)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def create_file(self, relative_path: str) -> str:
+        path = os.path.join(self.folder_path, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy(EMPTY_OPUS_PATH, path)
+        return path
+
+    def test_folder_key_follows_walk_order(self):
+        """Test that the folder keys of the walk are in ascending order"""
+        for relative_path in ("a.opus", "B/a.opus", "B/C/a.opus", "B/C/D/a.opus", "B-C/a.opus", "b/a.opus",
+                              "Bc/a.opus"):
+            self.create_file(relative_path)
+        folders = []
+        for entry in iter_music_files(self.folder_path):
+            key = folder_key(os.path.dirname(entry.path), self.folder_path)
+            if not folders or folders[-1] != key:
+                folders.append(key)
+        self.assertEqual(folders[0], ())
+        self.assertEqual(len(folders), 7)
+        self.assertEqual(folders, sorted(folders))
+
+    def test_save_and_load(self):
+        """Test that a loaded checkpoint skips finished folders and files and keeps renamed fields"""
+        checkpoint = Checkpoint(self.checkpoint_path, self.folder_path)
+        checkpoint.file_done(os.path.join(self.folder_path, "A", "One.opus"))
+        checkpoint.file_done(os.path.join(self.folder_path, "B", "Two.opus"))
+        checkpoint.add_renamed([AlbumObject(complete_file_path=os.path.join(self.folder_path, "B", "Three.opus"),
+                                            clean_file_name="Three.opus", artist_name="Artist", title_name="Three",
+                                            release_year="1999")])
+        checkpoint.close(completed=False)
+
+        loaded = Checkpoint(self.checkpoint_path, self.folder_path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.cursor, ("B",))
+        self.assertTrue(loaded.is_finished_folder(os.path.join(self.folder_path, "A")))
+        self.assertFalse(loaded.is_finished_folder(os.path.join(self.folder_path, "B")))
+        self.assertFalse(loaded.is_finished_folder(os.path.join(self.folder_path, "B", "Sub")))
+        self.assertTrue(loaded.is_finished_file(os.path.join(self.folder_path, "B", "Two.opus")))
+        self.assertFalse(loaded.is_finished_file(os.path.join(self.folder_path, "B", "Three.opus")))
+        self.assertEqual(loaded.renamed_album(os.path.join(self.folder_path, "B", "Three.opus")).release_year, "1999")
+        self.assertIsNone(loaded.renamed_album(os.path.join(self.folder_path, "B", "Two.opus")))
+
+        loaded.close(completed=True)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_resume_interrupted_run(self):
+        """Test that a resumed run skips finished files and tags renamed files with their original fields"""
+        self.create_file("A/Band - One 1990.opus")
+        self.create_file("A/Band - Two (Full Album) 1991.opus")
+        self.create_file("B/Other - Three.opus")
+
+        load_file_tags = main.load_file_tags
+
+        def interrupt_second_file(result, options=None):
+            if "Two" in result.file_path:
+                raise KeyboardInterrupt
+            return load_file_tags(result, options)
+
+        with patch("main.load_file_tags", side_effect=interrupt_second_file):
+            with self.assertRaises(KeyboardInterrupt):
+                run(self.folder_path, recursive=True)
+
+        with open(self.checkpoint_path, encoding="utf-8") as checkpoint_file:
+            state = json.load(checkpoint_file)
+        self.assertEqual((state["folder"], state["done"]), (["A"], ["Band - One.opus"]))
+        self.assertEqual(state["renamed"]["A"]["Band - Two.opus"]["release_year"], "1991")
+
+        summary = run(self.folder_path, recursive=True, resume=True)
+        self.assertEqual((summary.total_files, summary.processed_files), (2, 2))
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+        # The clean name has no year anymore, it comes from the checkpoint
+        music_file = music_tag.load_file(os.path.join(self.folder_path, "A", "Band - Two.opus"))
+        self.assertEqual(str(music_file["year"]), "1991")
+
+    def test_resume_run_interrupted_while_renaming(self):
+        """Test that fields are saved before the files lose their names, so a crash while renaming keeps them"""
+        self.create_file("A/Band - Two (Full Album) 1991.opus")
+
+        execute_rename_plan = main.execute_rename_plan
+
+        def interrupt_after_renaming(plan, journal=None):
+            execute_rename_plan(plan, journal)
+            raise KeyboardInterrupt
+
+        with patch("main.execute_rename_plan", side_effect=interrupt_after_renaming):
+            with self.assertRaises(KeyboardInterrupt):
+                run(self.folder_path, recursive=True)
+
+        self.assertTrue(os.path.exists(os.path.join(self.folder_path, "A", "Band - Two.opus")))
+        with open(self.checkpoint_path, encoding="utf-8") as checkpoint_file:
+            state = json.load(checkpoint_file)
+        self.assertEqual(state["renamed"]["A"]["Band - Two.opus"]["release_year"], "1991")
+
+        summary = run(self.folder_path, recursive=True, resume=True)
+        self.assertEqual((summary.total_files, summary.processed_files), (1, 1))
+        music_file = music_tag.load_file(os.path.join(self.folder_path, "A", "Band - Two.opus"))
+        self.assertEqual(str(music_file["year"]), "1991")
+
+    def test_run_without_resume_starts_over(self):
+        """Test that a checkpoint is only used with resume"""
+        self.create_file("A/Band - One.opus")
+        checkpoint = Checkpoint(self.checkpoint_path, self.folder_path)
+        checkpoint.file_done(os.path.join(self.folder_path, "A", "Band - One.opus"))
+        checkpoint.close(completed=False)
+
+        summary = run(self.folder_path, recursive=True)
+        self.assertEqual(summary.total_files, 1)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from logic.album_logic import iter_music_files, parse_filename
+from logic.duplicates import DUPLICATES_FOLDER_NAME, PARTIAL_HASH_SIZE, find_duplicates, move_duplicates
+
+
+class TestDuplicates(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder_path = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_file(self, relative_path: str, content: bytes) -> str:
+        path = os.path.join(self.folder_path, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def find(self):
+        files = [(entry.path, entry.stat().st_size) for entry in iter_music_files(self.folder_path)]
+        return find_duplicates(files, parse=parse_filename)
+
+    def test_identical_files(self):
+        """Test that copies are found and the copy with the clean name is kept"""
+        content = os.urandom(3 * PARTIAL_HASH_SIZE)
+        kept = self.write_file("Rock/Artist - Album.opus", content)
+        copy = self.write_file("New/Artist - Album (Full Album).opus", content)
+        # Same size, start and end, only the middle differs
+        self.write_file("Other/Other - Album.opus",
+                        content[:PARTIAL_HASH_SIZE] + os.urandom(PARTIAL_HASH_SIZE) + content[-PARTIAL_HASH_SIZE:])
+
+        report = self.find()
+        self.assertEqual([group.paths for group in report.identical], [[kept, copy]])
+        self.assertEqual(report.wasted_bytes, len(content))
+        self.assertEqual(report.similar, [])
+
+    def test_unique_sizes_are_not_read(self):
+        """Test that files of different size are told apart without reading them"""
+        self.write_file("A - One.opus", b"a" * 10)
+        self.write_file("B - Two.opus", b"b" * 20)
+        report = self.find()
+        self.assertEqual((report.identical, report.bytes_read, report.total_bytes), ([], 0, 30))
+
+    def test_similar_files(self):
+        """Test that different files of the same album are reported as similar"""
+        first = self.write_file("Artist - Album (Full Album).opus", b"first rip")
+        second = self.write_file("Rock/ARTIST - album.opus", b"second rip, better")
+        report = self.find()
+        self.assertEqual(report.identical, [])
+        self.assertEqual([sorted(group.paths) for group in report.similar], [sorted([first, second])])
+
+    def test_move_duplicates(self):
+        """Test that copies are moved into the duplicates folder and skipped afterwards"""
+        content = b"same"
+        kept = self.write_file("Artist - Album.opus", content)
+        copy = self.write_file("Rock/Artist - Album 2.opus", content)
+
+        moved = move_duplicates(self.find(), self.folder_path)
+        self.assertEqual(moved, [os.path.join(self.folder_path, DUPLICATES_FOLDER_NAME, "Rock", "Artist - Album 2.opus")])
+        self.assertTrue(os.path.exists(kept))
+        self.assertFalse(os.path.exists(copy))
+        self.assertEqual([entry.path for entry in iter_music_files(self.folder_path)], [kept])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from logic.album_logic import parse_filename, parse_many
+from logic.filename_grammar import FileNameParts, split_file_name, split_file_names
+
+
+class TestFilenameGrammar(unittest.TestCase):
+    def test_dash_variants(self):
+        """Test that every dash character splits artist and title"""
+        for dash in "-‐‑‒–—―−":
+            self.assertEqual(split_file_name(f"Artist {dash} Album.opus"), FileNameParts("Artist", "Album", ".opus"))
+
+    def test_spaced_dash_wins(self):
+        """Test that a dash with spaces is preferred over a dash inside the artist name"""
+        self.assertEqual(split_file_name("Jay-Z - The Black Album.opus"),
+                         FileNameParts("Jay-Z", "The Black Album", ".opus"))
+        self.assertEqual(split_file_name("Artist - Album - Live.opus"),
+                         FileNameParts("Artist", "Album - Live", ".opus"))
+
+    def test_dash_without_spaces(self):
+        """Test that dashes touching a word still split and keep the last character of the title"""
+        self.assertEqual(split_file_name("Artist- Album.opus"), FileNameParts("Artist", "Album", ".opus"))
+        self.assertEqual(split_file_name("Artist -Album.opus"), FileNameParts("Artist", "Album", ".opus"))
+        self.assertEqual(split_file_name("Artist-Album.opus"), FileNameParts("Artist", "Album", ".opus"))
+
+    def test_unsplittable_names(self):
+        """Test that names without separator, artist, title or file ending are rejected"""
+        for file_name in ("No Separator.opus", "Artist - Album", " - Album.opus", "Artist - .opus"):
+            self.assertIsNone(split_file_name(file_name), file_name)
+
+    def test_folder_is_ignored(self):
+        """Test that dashes in folder names do not split the path"""
+        album_obj = parse_filename("/music/Post-Rock/Artist – Album.opus")
+        self.assertEqual((album_obj.artist_name, album_obj.title_name), ("Artist", "Album"))
+        self.assertIsNone(parse_filename("/music/Post-Rock/No Separator.opus"))
+
+    def test_batch_equals_single(self):
+        """Test that the batch split gives the same result as splitting one name at a time"""
+        file_names = ["Jay-Z - The Black Album.opus", "No Separator.opus", "Artist—Album (1999).mp3"]
+        self.assertEqual(split_file_names(file_names), [split_file_name(name) for name in file_names])
+        paths = ["/music/Hip-Hop/" + name for name in file_names]
+        self.assertEqual([album_obj and album_obj.as_dict() for album_obj in parse_many(paths)],
+                         [album_obj and album_obj.as_dict() for album_obj in map(parse_filename, paths)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import unittest
+
+from logic.album_logic import parse_filename
+from logic.genre import GenreResolver, normalize_genre_key
+
+
+class TestGenreResolver(unittest.TestCase):
+    def test_folder_name_is_default_genre(self):
+        """Test that without a mapping the folder name is the genre"""
+        resolver = GenreResolver()
+        self.assertEqual(resolver.resolve("/music/Album/ElectronicMusic"), "ElectronicMusic")
+
+    def test_folder_names_are_normalized(self):
+        """Test that spelling variants of a folder name use the same mapping"""
+        resolver = GenreResolver({"Electronic Music": "Electronic"})
+        for folder_name in ("ElectronicMusic", "electronic_music", "ELECTRONIC-MUSIC"):
+            self.assertEqual(resolver.resolve(os.path.join("/music", folder_name)), "Electronic")
+        self.assertEqual(normalize_genre_key("Hip-Hop & Rap"), "hiphoprap")
+
+    def test_nested_folders(self):
+        """Test that the deepest mapped folder and the longest path win"""
+        resolver = GenreResolver({"Rock": "Rock", "Rock/Prog": "Progressive Rock", "Prog": "Progressive"},
+                                 root_path="/music")
+        self.assertEqual(resolver.resolve("/music/Rock/Prog"), "Progressive Rock")
+        self.assertEqual(resolver.resolve("/music/Jazz/Prog"), "Progressive")
+        self.assertEqual(resolver.resolve("/music/Rock/Prog/Live"), "Progressive Rock")
+        self.assertEqual(resolver.resolve("/music/Rock/Classic"), "Rock")
+        self.assertEqual(resolver.resolve("/music/Jazz"), "Jazz")
+
+    def test_folders_above_root_are_ignored(self):
+        """Test that only folders inside the library are mapped"""
+        resolver = GenreResolver({"Rock": "Rock"}, root_path="/Rock/library")
+        self.assertEqual(resolver.resolve("/Rock/library/Jazz"), "Jazz")
+
+    def test_folder_is_resolved_once(self):
+        """Test that all files of a folder share one resolution"""
+        resolver = GenreResolver({"Rock": "Rock Music"})
+        for index in range(10):
+            album = parse_filename(f"/music/Rock/Artist - Album {index}.opus", genre_resolver=resolver)
+            self.assertEqual(album.genre, "Rock Music")
+        cache_info = resolver.cache_info()
+        self.assertEqual(cache_info.misses, 1)
+        self.assertEqual(cache_info.hits, 9)
+
+    def test_mapping_file(self):
+        """Test loading of the mapping from a JSON file"""
+        with tempfile.TemporaryDirectory() as folder_path:
+            config_path = os.path.join(folder_path, "genres.json")
+            with open(config_path, "w", encoding="utf-8") as config_file:
+                json.dump({"Rock/Prog": "Progressive Rock"}, config_file)
+            resolver = GenreResolver.from_file(config_path, root_path=folder_path)
+            self.assertEqual(resolver.resolve(os.path.join(folder_path, "Rock", "Prog")), "Progressive Rock")
+
+            with open(config_path, "w", encoding="utf-8") as config_file:
+                json.dump(["Rock"], config_file)
+            self.assertRaises(ValueError, GenreResolver.from_file, config_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from logic.album_logic import parse_filename
+from logic.metadata_db import MetadataDatabase
+
+
+class TestMetadataDatabase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.database = MetadataDatabase(os.path.join(self.temp_dir.name, "metadata.sqlite"))
+
+    def tearDown(self):
+        self.database.close()
+        self.temp_dir.cleanup()
+
+    def test_import_dump(self):
+        """Test that a dump is imported and the earliest year of an album is kept"""
+        dump_path = os.path.join(self.temp_dir.name, "releases.tsv")
+        with open(dump_path, "w", encoding="utf-8") as dump_file:
+            dump_file.write("# artist\talbum\tyear\tgenre\n")
+            dump_file.write("Gorillaz\tDemon Days\t2006\tAlternative\n")
+            dump_file.write("Gorillaz\tDemon Days\t2005-05-11\t\n")
+            dump_file.write("Blur\tParklife\n")
+            dump_file.write("Broken line\n")
+        self.assertEqual(self.database.import_dump(dump_path), 3)
+        self.assertEqual(self.database.lookup("GORILLAZ", "demon  days"), (2005, "Alternative"))
+        self.assertEqual(self.database.lookup("Blur", "Parklife"), (None, None))
+        self.assertIsNone(self.database.lookup("Blur", "The Great Escape"))
+
+    def test_enrich_fills_missing_year(self):
+        """Test that only missing years are filled in and the genre only on request"""
+        self.database.import_releases([("Gorillaz", "Demon Days", 2005, "Alternative")])
+
+        album = parse_filename("/music/Rock/Gorillaz - Demon Days (Full Album).opus")
+        self.assertTrue(self.database.enrich(album))
+        self.assertEqual(album.release_year, "2005")
+        self.assertEqual(album.genre, "Rock")
+        self.assertTrue(self.database.enrich(album, fill_genre=True))
+        self.assertEqual(album.genre, "Alternative")
+
+        album = parse_filename("/music/Rock/Gorillaz - Demon Days 2006.opus")
+        self.assertFalse(self.database.enrich(album))
+        self.assertEqual(album.release_year, "2006")
+
+    def test_lookups_are_cached(self):
+        """Test that the files of one album query the database only once"""
+        self.database.import_releases([("Gorillaz", "Demon Days", 2005, None)])
+        for _ in range(5):
+            self.database.lookup("Gorillaz", "Demon Days")
+        cache_info = self.database.cache_info()
+        self.assertEqual((cache_info.misses, cache_info.hits), (1, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
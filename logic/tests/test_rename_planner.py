@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from logic.objects import AlbumObject
+from logic.rename_planner import RenameJournal, build_rename_plan, execute_rename_plan
+
+
+class TestRenamePlanner(unittest.TestCase):
+    def setUp(self):
+        """Create an empty folder for the files of a test"""
+        self.folder_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the folder of the test"""
+        shutil.rmtree(self.folder_path)
+
+    def create_file(self, file_name: str, content: str = "") -> str:
+        """Create a file with the given content and return its path"""
+        file_path = os.path.join(self.folder_path, file_name)
+        with open(file_path, "w") as music_file:
+            music_file.write(content or file_name)
+        return file_path
+
+    def read_file(self, file_name: str) -> str:
+        with open(os.path.join(self.folder_path, file_name)) as music_file:
+            return music_file.read()
+
+    def album(self, file_name: str, clean_file_name: str) -> AlbumObject:
+        """Create a parsed album object for an existing file"""
+        album_obj = AlbumObject()
+        album_obj.complete_file_path = self.create_file(file_name)
+        album_obj.clean_file_name = clean_file_name
+        return album_obj
+
+    def test_collisions_get_number_suffix(self):
+        """Test that two files with the same clean name do not overwrite each other"""
+        first = self.album("A - Album (Full Album).opus", "A - Album.opus")
+        second = self.album("A - Album [HQ].opus", "A - Album.opus")
+
+        plan = build_rename_plan([first, second])
+        self.assertEqual(execute_rename_plan(plan), [])
+
+        self.assertEqual(first.clean_file_name, "A - Album.opus")
+        self.assertEqual(second.clean_file_name, "A - Album (2).opus")
+        self.assertEqual(self.read_file("A - Album.opus"), "A - Album (Full Album).opus")
+        self.assertEqual(self.read_file("A - Album (2).opus"), "A - Album [HQ].opus")
+
+    def test_existing_file_is_not_overwritten(self):
+        """Test that a file that keeps its name is never replaced"""
+        self.create_file("A - Album.opus", "existing")
+        renamed = self.album("A - Album (Full Album).opus", "A - Album.opus")
+
+        plan = build_rename_plan([renamed])
+        execute_rename_plan(plan)
+
+        self.assertEqual(self.read_file("A - Album.opus"), "existing")
+        self.assertEqual(renamed.clean_file_name, "A - Album (2).opus")
+
+    def test_chains_and_cycles(self):
+        """Test that renames into paths freed by other renames are ordered correctly"""
+        chain_first = self.album("1.opus", "2.opus")
+        chain_second = self.album("2.opus", "3.opus")
+        cycle_first = self.album("x.opus", "y.opus")
+        cycle_second = self.album("y.opus", "x.opus")
+
+        plan = build_rename_plan([chain_first, chain_second, cycle_first, cycle_second])
+        self.assertEqual(plan.resolved_collisions, [])
+        self.assertEqual(execute_rename_plan(plan), [])
+
+        self.assertEqual(self.read_file("2.opus"), "1.opus")
+        self.assertEqual(self.read_file("3.opus"), "2.opus")
+        self.assertEqual(self.read_file("y.opus"), "x.opus")
+        self.assertEqual(self.read_file("x.opus"), "y.opus")
+        self.assertFalse(os.path.exists(os.path.join(self.folder_path, "1.opus")))
+
+    def test_journal_recovery(self):
+        """Test that an interrupted batch can be finished or rolled back"""
+        journal_path = os.path.join(self.folder_path, "journal")
+        for rollback in (False, True):
+            source = self.create_file("A - Album (Full Album).opus")
+            destination = os.path.join(self.folder_path, "A - Album.opus")
+            other_source = self.create_file("B - Album [HQ].opus")
+            other_destination = os.path.join(self.folder_path, "B - Album.opus")
+
+            # Simulate a crash after the first of two renames
+            with open(journal_path, "w") as journal_file:
+                for path_from, path_to in ((source, destination), (other_source, other_destination)):
+                    journal_file.write(json.dumps({"batch": 1, "source": path_from, "destination": path_to}) + "\n")
+            os.rename(source, destination)
+
+            count = RenameJournal(journal_path).recover(rollback=rollback)
+
+            self.assertEqual(count, 1)
+            self.assertFalse(os.path.exists(journal_path))
+            self.assertEqual(sorted(os.listdir(self.folder_path)),
+                             sorted(os.path.basename(path) for path in (
+                                 (source, other_source) if rollback else (destination, other_destination))))
+            for file_name in os.listdir(self.folder_path):
+                os.remove(os.path.join(self.folder_path, file_name))
+
+    def test_journal_is_removed_after_committed_batches(self):
+        """Test that a journal of a completed run does not stay behind"""
+        journal = RenameJournal(os.path.join(self.folder_path, "journal"))
+        plan = build_rename_plan([self.album("A - Album [HQ].opus", "A - Album.opus")])
+        execute_rename_plan(plan, journal)
+        journal.close()
+        self.assertFalse(journal.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import main
+from logic.objects import AlbumObject
+from logic.sharding import ManifestWriter, Shard, merge_manifests, relative_key, shard_key
+from main import run
+
+EMPTY_OPUS_PATH = Path(__file__).parent / "emptyOpusFile.opus"
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder_path = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parse_shard(self):
+        """Test parsing of K/N shard specs"""
+        self.assertEqual(Shard.parse("3/16"), Shard(3, 16))
+        self.assertEqual(Shard(3, 16).name, "shard-3-of-16")
+        self.assertEqual(str(Shard(3, 16)), "3/16")
+        for spec in ("0/4", "5/4", "1/0", "a/4", "1/2/3", "4"):
+            with self.assertRaises(ValueError):
+                Shard.parse(spec)
+
+    def test_shards_partition_files(self):
+        """Test that every file belongs to exactly one shard and the files of a folder are spread"""
+        keys = [shard_key(f"Genre {number % 7}", f"Artist {number} - Album.opus") for number in range(1000)]
+        shards = [Shard(index, 4) for index in range(1, 5)]
+        for key in keys:
+            self.assertEqual(sum(shard.contains(key) for shard in shards), 1)
+        # The split is roughly even, also within one folder
+        for shard in shards:
+            self.assertGreater(sum(shard.contains(key) for key in keys), 150)
+            self.assertTrue(any(shard.contains(key) for key in keys if key.startswith("genre 0/")))
+
+    def test_shard_key(self):
+        """Test that files renamed to the same name or its numbered variants get the same key"""
+        self.assertEqual(shard_key("Rock", "Artist - Album (2).opus"), shard_key("Rock", "artist - album.opus"))
+        self.assertNotEqual(shard_key("Rock", "Artist - Album.opus"), shard_key("Jazz", "Artist - Album.opus"))
+        self.assertNotEqual(shard_key("Rock", "Artist - Album (Live).opus"), shard_key("Rock", "Artist - Album.opus"))
+
+    def test_relative_key(self):
+        """Test that the key does not depend on where the library is mounted"""
+        self.assertEqual(relative_key("/mnt/a/music/Rock/A - B.opus", "/mnt/a/music"), "Rock/A - B.opus")
+        self.assertEqual(relative_key("/nas/music/Rock/A - B.opus", "/nas/music/"), "Rock/A - B.opus")
+
+    def test_merge_manifests(self):
+        """Test that the manifests of all shards are combined and missing or unfinished shards are reported"""
+        album_obj = AlbumObject()
+        album_obj.artist_name = "Artist"
+        album_obj.title_name = "Album"
+        first_path = os.path.join(self.folder_path, "first.jsonl")
+        first = ManifestWriter(first_path, self.folder_path, Shard(1, 3))
+        first.record(os.path.join(self.folder_path, "Rock", "A - B.opus"), "processed", album_obj, 0.5)
+        first.record(os.path.join(self.folder_path, "C.opus"), "skipped", None, 0.1)
+        first.close()
+        second_path = os.path.join(self.folder_path, "second.jsonl")
+        second = ManifestWriter(second_path, self.folder_path, Shard(2, 3))
+        second.record(os.path.join(self.folder_path, "Rock", "A - B.opus"), "unchanged", album_obj, 0.2)
+        second.close(completed=False)
+
+        output_path = os.path.join(self.folder_path, "merged.jsonl")
+        merged = merge_manifests([first_path, second_path], output_path)
+        self.assertEqual(merged.files, 3)
+        self.assertEqual(dict(merged.counts), {"processed": 1, "skipped": 1, "unchanged": 1})
+        self.assertAlmostEqual(merged.total_seconds, 0.8)
+        self.assertEqual(merged.missing_shards, ["3/3"])
+        self.assertEqual(merged.incomplete_shards, ["2/3"])
+        self.assertEqual(merged.duplicate_paths, {"Rock/A - B.opus"})
+
+        with open(output_path, encoding="utf-8") as output:
+            records = [json.loads(line) for line in output]
+        self.assertEqual([record["type"] for record in records], ["header", "file", "file", "file", "summary"])
+        self.assertEqual(records[1]["album"]["artist_name"], "Artist")
+
+    def test_sharded_run(self):
+        """Test that the shards of a run together process every file once"""
+        for number in range(12):
+            os.makedirs(os.path.join(self.folder_path, f"Genre {number % 6}"), exist_ok=True)
+            shutil.copy(EMPTY_OPUS_PATH, os.path.join(self.folder_path, f"Genre {number % 6}",
+                                                      f"Artist {number} - Album (Full Album).opus"))
+
+        manifest_paths = []
+        total = 0
+        for index in (1, 2):
+            manifest_path = os.path.join(self.folder_path, f"shard-{index}.jsonl")
+            summary = run(self.folder_path, recursive=True, shard=f"{index}/2", manifest=manifest_path,
+                          use_index=True)
+            self.assertEqual(summary.error_files, 0)
+            total += summary.total_files
+            manifest_paths.append(manifest_path)
+            self.assertTrue(os.path.exists(os.path.join(self.folder_path,
+                                                        f".fullalbumindex.shard-{index}-of-2.sqlite")))
+
+        self.assertEqual(total, 12)
+        merged = merge_manifests(manifest_paths)
+        self.assertEqual((merged.files, merged.counts["processed"]), (12, 12))
+        self.assertEqual((merged.missing_shards, merged.incomplete_shards, merged.duplicate_paths), ([], [], set()))
+        self.assertTrue(os.path.exists(os.path.join(self.folder_path, "Genre 0", "Artist 0 - Album.opus")))
+        # Every shard got some of the files
+        self.assertTrue(all(merge_manifests([manifest_path]).files for manifest_path in manifest_paths))
+
+        # Files skipped by the index are recorded with the fields stored in the index
+        files = []
+        for index, manifest_path in enumerate(manifest_paths, 1):
+            run(self.folder_path, recursive=True, shard=f"{index}/2", manifest=manifest_path, use_index=True)
+            with open(manifest_path, encoding="utf-8") as manifest:
+                files.extend(record for record in map(json.loads, manifest) if record["type"] == "file")
+        self.assertEqual(len(files), 12)
+        self.assertTrue(all(record["status"] == "unchanged" and record["album"]["title_name"] == "Album"
+                            for record in files))
+
+    def test_sharded_run_with_same_clean_names(self):
+        """Test that files of a folder renamed to the same name are handled by the same shard"""
+        folder = os.path.join(self.folder_path, "Rock")
+        os.makedirs(folder)
+        for file_name in ("Artist - Album (Full Album).opus", "Artist - Album [HQ].opus", "Artist - Album.opus"):
+            shutil.copy(EMPTY_OPUS_PATH, os.path.join(folder, file_name))
+
+        for index in (1, 2):
+            self.assertEqual(run(self.folder_path, recursive=True, shard=f"{index}/2").error_files, 0)
+        self.assertEqual(sorted(os.listdir(folder)),
+                         ["Artist - Album (2).opus", "Artist - Album (3).opus", "Artist - Album.opus"])
+
+    def test_sharded_run_parses_names_once(self):
+        """Test that the fields parsed to choose the shard of a file are not parsed again"""
+        for number in range(6):
+            shutil.copy(EMPTY_OPUS_PATH, os.path.join(self.folder_path, f"Artist {number} - Album.opus"))
+        for index in (1, 2):
+            with patch("main.parse_filename", wraps=main.parse_filename) as parse_filename:
+                run(self.folder_path, shard=f"{index}/2")
+            self.assertEqual(parse_filename.call_count, 6)
+
+    def test_invalid_shard(self):
+        """Test that an invalid shard spec stops the run"""
+        self.assertIsNone(run(self.folder_path, shard="3/2"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from mutagen.ogg import OggPage
+from mutagen.oggopus import OggOpus
+
+from main import run
+from logic.chapters import Chapter
+from logic.objects import AlbumObject
+from logic.splitter import SPLIT_MARKER_NAME, SplitError, split_ogg_opus
+
+PRE_SKIP = 312
+# One page per second of 50 packets of 20 ms
+PACKETS_PER_PAGE = 50
+SAMPLES_PER_PACKET = 960
+
+
+def write_opus_file(file_path: str, seconds: int, split_packet_page: int = -1, single_packet_page: int = -1):
+    """
+    Write an Ogg Opus stream with dummy audio packets, one page per second.
+    The page split_packet_page ends with a packet continuing on the next page,
+    the page single_packet_page only holds the start of such a packet.
+    """
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, 2, PRE_SKIP, 48000, 0, 0)
+    vendor = b"test"
+    tags = b"OpusTags" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0)
+    pages = []
+    for packet in (head, tags):
+        page = OggPage()
+        page.packets = [packet]
+        pages.append(page)
+    pages[0].first = True
+
+    for second in range(seconds):
+        page = OggPage()
+        page.packets = [bytes([second % 256]) * 10 for _ in range(PACKETS_PER_PAGE)]
+        page.position = PRE_SKIP + (second + 1) * PACKETS_PER_PAGE * SAMPLES_PER_PACKET
+        if second == split_packet_page:
+            # The last packet continues on the next page, its last lacing value is 255
+            page.packets[-1] = b"A" * 510
+            page.complete = False
+        if second == single_packet_page:
+            page.packets = [b"C" * 510]
+            page.complete = False
+        if second in (split_packet_page + 1, single_packet_page + 1):
+            page.packets[0] = b"B" * 50
+            page.continued = True
+        pages.append(page)
+    pages[-1].last = True
+
+    with open(file_path, "wb") as file:
+        for sequence, page in enumerate(pages):
+            page.serial = 1234
+            page.sequence = sequence
+            file.write(page.write())
+
+
+def read_pages(file_path: str):
+    with open(file_path, "rb") as file:
+        pages = []
+        while True:
+            try:
+                pages.append(OggPage(file))
+            except EOFError:
+                return pages
+
+
+class TestSplitter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, "Artist - Album.opus")
+        self.album = AlbumObject(complete_file_path=self.file_path, artist_name="Artist", title_name="Album",
+                                 release_year="2001", genre="Rock")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_split_at_page_boundaries(self):
+        """Test that tracks start at the first page of their chapter and have their own headers and tags"""
+        write_opus_file(self.file_path, 20, split_packet_page=4)
+        chapters = [Chapter(0, "Intro"), Chapter(5000, "Song/Two"), Chapter(12000, "Outro")]
+        track_paths = split_ogg_opus(self.file_path, chapters, self.album)
+
+        folder_path = os.path.join(self.temp_dir.name, "Artist - Album")
+        self.assertEqual(track_paths, [os.path.join(folder_path, name)
+                                       for name in ("01 Intro.opus", "02 Song-Two.opus", "03 Outro.opus")])
+        self.assertTrue(os.path.exists(os.path.join(folder_path, SPLIT_MARKER_NAME)))
+
+        # Only the first track skips the encoder delay at the start of the stream
+        pre_skips = [struct.unpack("<H", read_pages(path)[0].packets[0][10:12])[0] for path in track_paths]
+        self.assertEqual(pre_skips, [PRE_SKIP, 0, 0])
+
+        lengths = [round(OggOpus(path).info.length) for path in track_paths]
+        self.assertEqual(lengths, [5, 7, 8])
+
+        tags = OggOpus(track_paths[1]).tags
+        self.assertEqual(tags["title"], ["Song/Two"])
+        self.assertEqual(tags["tracknumber"], ["2"])
+        self.assertEqual(tags["tracktotal"], ["3"])
+        self.assertEqual(tags["artist"], ["Artist"])
+        self.assertEqual(tags["album"], ["Album"])
+        self.assertEqual(tags["date"], ["2001"])
+        self.assertEqual(tags["genre"], ["Rock"])
+
+        for track_path in track_paths:
+            pages = read_pages(track_path)
+            self.assertEqual([page.sequence for page in pages], list(range(len(pages))))
+            self.assertTrue(pages[0].first)
+            self.assertTrue(pages[-1].last)
+            self.assertTrue(pages[-1].complete)
+            self.assertFalse(pages[2].continued)
+
+        # The packet crossing the cut is moved completely into the second track
+        self.assertNotIn(b"A" * 510, read_pages(track_paths[0])[-1].packets)
+        self.assertEqual(read_pages(track_paths[1])[2].packets[0], b"A" * 510 + b"B" * 50)
+
+        # A second split leaves the tracks alone
+        self.assertEqual(split_ogg_opus(self.file_path, chapters, self.album), [])
+
+    def test_incomplete_packet_on_last_page(self):
+        """Test that a packet cut off at the end of the file leaves no empty page behind"""
+        chapters = [Chapter(0, "Intro"), Chapter(5000, "Outro")]
+        for options in ({"split_packet_page": 9}, {"single_packet_page": 9}):
+            write_opus_file(self.file_path, 10, **options)
+            track_paths = split_ogg_opus(self.file_path, chapters, self.album)
+            pages = read_pages(track_paths[1])
+            self.assertTrue(all(page.packets for page in pages), options)
+            self.assertEqual([page.last for page in pages], [False] * (len(pages) - 1) + [True], options)
+            self.assertTrue(pages[-1].complete, options)
+            shutil.rmtree(os.path.dirname(track_paths[1]))
+
+    def test_chapter_after_end(self):
+        """Test that a tracklist longer than the audio is rejected without leaving files behind"""
+        write_opus_file(self.file_path, 3)
+        with self.assertRaises(Exception):
+            split_ogg_opus(self.file_path, [Chapter(0, "Intro"), Chapter(60000, "Outro")], self.album)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, "Artist - Album")))
+
+    def test_chapter_within_one_page(self):
+        """Test that a chapter starting and ending within one page is named in the error, without leaving files"""
+        write_opus_file(self.file_path, 20)
+        chapters = [Chapter(0, "Intro"), Chapter(5200, "Skit"), Chapter(5400, "Song"), Chapter(12000, "Outro")]
+        with self.assertRaisesRegex(SplitError, 'Chapter 2 "Skit"'):
+            split_ogg_opus(self.file_path, chapters, self.album)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, "Artist - Album")))
+
+    def test_run_splits_and_skips_tracks(self):
+        """Test that a run splits a file with a tracklist and later runs skip the tracks"""
+        write_opus_file(self.file_path, 10)
+        with open(os.path.join(self.temp_dir.name, "Artist - Album.description"), "w") as description:
+            description.write("00:00 Intro\n00:04 Outro\n")
+
+        summary = run(self.temp_dir.name, recursive=True, split=True)
+        self.assertEqual(summary.total_files, 1)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.temp_dir.name, "Artist - Album"))),
+                         [SPLIT_MARKER_NAME, "01 Intro.opus", "02 Outro.opus"])
+
+        summary = run(self.temp_dir.name, recursive=True, split=True)
+        self.assertEqual(summary.total_files, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from logic.title_normalizer import DEFAULT_NOISE_TAGS, EXTRA_NOISE_TAGS, TitleNormalizer
+
+
+class TestTitleNormalizer(unittest.TestCase):
+    def test_default_noise_tags_are_removed(self):
+        """Test removal of the default noise tags in one pass"""
+        normalizer = TitleNormalizer()
+        test_cases = [
+            ("Album [Full Album]", "Album"),
+            ("Album (full album)", "Album"),
+            ("Album [Complete Album]", "Album"),
+            ("Album (High Quality)", "Album"),
+            ("Album [HQ] (Full Album)", "Album"),
+            ("Album (HQ )", "Album"),
+            ("Album (Official Audio)", "Album (Official Audio)"),
+        ]
+        for title, expected in test_cases:
+            self.assertEqual(normalizer.remove_noise_tags(title).strip(), expected)
+
+    def test_configured_noise_tags_are_removed(self):
+        """Test that additional rules from the rule table are applied"""
+        normalizer = TitleNormalizer(DEFAULT_NOISE_TAGS + EXTRA_NOISE_TAGS)
+        title = normalizer.remove_noise_tags("Album (Official  Audio) [Remastered] 320KBPS (Full Album)")
+        self.assertEqual(normalizer.collapse_spaces(title).strip(), "Album")
+
+    def test_years(self):
+        """Test year detection and removal"""
+        normalizer = TitleNormalizer()
+        years = normalizer.find_years("Album (1967) 2009")
+        self.assertEqual(years, ["(1967)", "2009"])
+        self.assertEqual(normalizer.year_digits(years[0]), "1967")
+        self.assertEqual(normalizer.remove_years("Album (1967)").strip(), "Album")
+
+    def test_empty_rule_table(self):
+        """Test that a normalizer without rules leaves titles untouched"""
+        normalizer = TitleNormalizer(())
+        self.assertEqual(normalizer.remove_noise_tags("Album [Full Album]"), "Album [Full Album]")
+
+
+if __name__ == '__main__':
+    unittest.main()
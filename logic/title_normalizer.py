@@ -0,0 +1,137 @@
+import re
+from typing import Iterable, List, Optional
+
+# Noise tags removed from album titles, matched case-insensitively and with optional
+# surrounding brackets. Spaces inside a tag match any run of whitespace.
+DEFAULT_NOISE_TAGS = (
+    "Full Album",
+    "Complete Album",
+    "High Quality",
+    "HQ",
+)
+
+# Further tags often found in downloaded albums, not removed unless configured
+EXTRA_NOISE_TAGS = (
+    "Official Audio",
+    "Official Album",
+    "Remastered",
+    "320kbps",
+    "Lyrics",
+)
+
+YEAR_PATTERN = re.compile(r"(?:\[|\()?\d{4}(?:\]|\))?")
+YEAR_DIGITS_PATTERN = re.compile(r"\d{4}")
+CAPITAL_LETTERS_PATTERN = re.compile(r"[A-Z]{4,}")
+MULTIPLE_SPACES_PATTERN = re.compile(r" {2,}")
+
+
+def build_phrase_pattern(phrases: Iterable[str]) -> str:
+    """
+    Build a regular expression matching any of the phrases, with common prefixes merged into a trie.
+    The matcher follows a single path through the trie per position instead of trying every
+    phrase, so adding phrases hardly changes the cost per title.
+    :param phrases: Phrases to match, compared case-insensitively
+    :return: Regular expression source
+    """
+    trie = {}
+    for phrase in phrases:
+        phrase = " ".join(phrase.lower().split())
+        if not phrase:
+            continue
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def to_pattern(node: dict) -> str:
+        alternatives = []
+        optional = False
+        for char, child in sorted(node.items()):
+            if char == "":
+                optional = True
+                continue
+            char_pattern = r"\s+" if char == " " else re.escape(char)
+            alternatives.append(char_pattern + to_pattern(child))
+
+        if not alternatives:
+            return ""
+        if len(alternatives) == 1 and not optional:
+            return alternatives[0]
+        pattern = "(?:" + "|".join(alternatives) + ")"
+        return pattern + "?" if optional else pattern
+
+    return to_pattern(trie)
+
+
+class TitleNormalizer:
+    """
+    Precompiled cleanup of album titles.
+
+    All noise tags of the rule table are removed with a single combined regular expression,
+    so a title is scanned once no matter how many tags are configured.
+    """
+
+    def __init__(self, noise_tags: Iterable[str] = DEFAULT_NOISE_TAGS):
+        self.noise_tags = tuple(noise_tags)
+        phrase_pattern = build_phrase_pattern(self.noise_tags)
+        self._noise_pattern: Optional[re.Pattern] = None
+        if phrase_pattern:
+            self._noise_pattern = re.compile(r"\[?\(?" + phrase_pattern + r"\s?\)?]?", re.IGNORECASE)
+
+    @staticmethod
+    def collapse_spaces(title: str) -> str:
+        """
+        Replace runs of spaces with a single space.
+        :param title: Title to clean
+        :return: Cleaned title
+        """
+        return MULTIPLE_SPACES_PATTERN.sub(" ", title)
+
+    def remove_noise_tags(self, title: str) -> str:
+        """
+        Remove all configured noise tags like (Full Album) or [HQ] from a title.
+        :param title: Title to clean
+        :return: Title without noise tags
+        """
+        if self._noise_pattern is None:
+            return title
+        return self._noise_pattern.sub("", title)
+
+    @staticmethod
+    def find_years(title: str) -> List[str]:
+        """
+        Find four digit years in a title, including surrounding brackets.
+        :param title: Title to search
+        :return: Matches in order of appearance, e.g. ["(1967)"]
+        """
+        return YEAR_PATTERN.findall(title)
+
+    @staticmethod
+    def year_digits(year_match: str) -> str:
+        """
+        Get the plain year of a match returned by find_years.
+        :param year_match: Match like (1967)
+        :return: Year like 1967
+        """
+        return YEAR_DIGITS_PATTERN.search(year_match).group()
+
+    @staticmethod
+    def remove_years(title: str) -> str:
+        """
+        Remove all years with their surrounding brackets from a title.
+        :param title: Title to clean
+        :return: Title without years
+        """
+        return YEAR_PATTERN.sub("", title)
+
+    @staticmethod
+    def count_capital_words(title: str) -> int:
+        """
+        Count runs of at least four capital letters, used to detect all caps titles.
+        :param title: Title to check
+        :return: Number of runs
+        """
+        return len(CAPITAL_LETTERS_PATTERN.findall(title))
+
+
+DEFAULT_NORMALIZER = TitleNormalizer()
@@ -0,0 +1,250 @@
+import os
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from logic.album_logic import AUDIO_FILE_ENDINGS
+from logic.log import get_logger
+from logic.rename_planner import TEMP_NAME_PREFIX
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+logger = get_logger(__name__)
+
+# Seconds a file has to stay unchanged before it is considered completely written
+DEFAULT_SETTLE_SECONDS = 5.0
+# Seconds between two checks of the polling watcher
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+class FileWatcher:
+    """
+    Reports music files that appear or change below a folder, once they are completely written.
+
+    Uses inotify if the optional inotify_simple package is installed, otherwise lists every known
+    folder on each poll and compares the size and modification time of its music files, so files
+    rewritten in place are found as well as new ones. Files are debounced:
+    a file is reported after its size and modification time stayed the same for settle_seconds,
+    so partially downloaded files are never processed.
+    Existing files are not reported, the library is never rescanned as a whole.
+    """
+
+    def __init__(self, folder_path: str, recursive: bool = True,
+                 settle_seconds: float = DEFAULT_SETTLE_SECONDS, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 file_endings: Iterable[str] = AUDIO_FILE_ENDINGS, use_inotify: Optional[bool] = None):
+        self.folder_path = os.path.abspath(folder_path)
+        self.recursive = recursive
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.file_endings = frozenset(file_endings)
+        if use_inotify is None:
+            use_inotify = inotify_simple is not None
+        self.use_inotify = use_inotify
+        # Files waiting to settle: path -> (size, mtime_ns, time of the last change)
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        # Polling state: folder -> (mtime_ns, name of each music file -> (size, mtime_ns))
+        self._folders: Dict[str, Tuple[int, Dict[str, Tuple[int, int]]]] = {}
+        self._inotify = None
+        self._watch_folders: Dict[int, str] = {}
+        self._file_mask = 0
+
+    def is_music_file(self, file_name: str) -> bool:
+        """
+        Check if a file name has a music file ending and is not a temporary file of the indexer.
+        :param file_name: Name of the file
+        :return: bool
+        """
+        return (not file_name.startswith(TEMP_NAME_PREFIX)
+                and os.path.splitext(file_name)[1].lower() in self.file_endings)
+
+    def notify(self, file_path: str, now: Optional[float] = None):
+        """
+        Mark a file as changed, it is reported once it settled.
+        :param file_path: Path of the file
+        :param now: Current time, time.monotonic() if not set
+        """
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            self._pending.pop(file_path, None)
+            return
+        self._pending[file_path] = (stat_result.st_size, stat_result.st_mtime_ns,
+                                    time.monotonic() if now is None else now)
+
+    def settled_files(self, now: Optional[float] = None) -> Iterator[str]:
+        """
+        Get the pending files that did not change for settle_seconds and forget them.
+        A file that changed since it was last seen starts to settle again.
+        :param now: Current time, time.monotonic() if not set
+        :return: Iterator over paths, sorted
+        """
+        if now is None:
+            now = time.monotonic()
+        ready = []
+        for file_path, (size, mtime_ns, changed_at) in list(self._pending.items()):
+            try:
+                stat_result = os.stat(file_path)
+            except OSError:
+                # Deleted or moved away before it settled
+                del self._pending[file_path]
+                continue
+            if (stat_result.st_size, stat_result.st_mtime_ns) != (size, mtime_ns):
+                self._pending[file_path] = (stat_result.st_size, stat_result.st_mtime_ns, now)
+            elif now - changed_at >= self.settle_seconds:
+                del self._pending[file_path]
+                ready.append(file_path)
+        return iter(sorted(ready))
+
+    def start(self):
+        """Remember the current state of the folders, only later changes are reported"""
+        if self.use_inotify:
+            flags = inotify_simple.flags
+            self._inotify = inotify_simple.INotify()
+            self._file_mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.MODIFY
+            for folder_path in self._iter_folders(self.folder_path):
+                self._add_watch(folder_path)
+        else:
+            for folder_path in self._iter_folders(self.folder_path):
+                self._folders[folder_path] = (self._folder_mtime(folder_path),
+                                              self._list_music_files(folder_path) or {})
+
+    def watch(self) -> Iterator[str]:
+        """
+        Start watching and yield the paths of new or changed music files once they settled.
+        :return: Endless iterator over paths, blocks while waiting for changes
+        """
+        self.start()
+        if self.use_inotify:
+            logger.info("Watching %s with inotify", self.folder_path)
+            return self._watch_inotify()
+        logger.info("Watching %s by polling every %.1f seconds", self.folder_path, self.poll_interval)
+        return self._watch_polling()
+
+    def close(self):
+        """Release the inotify file descriptor"""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _iter_folders(self, folder_path: str) -> Iterator[str]:
+        yield folder_path
+        if not self.recursive:
+            return
+        for current_dir, sub_dirs, _ in os.walk(folder_path):
+            sub_dirs.sort()
+            for sub_dir in sub_dirs:
+                yield os.path.join(current_dir, sub_dir)
+
+    # inotify ---------
+
+    def _watch_inotify(self) -> Iterator[str]:
+        flags = inotify_simple.flags
+        while True:
+            timeout = None
+            if self._pending:
+                # Wake up in time to report files that settle
+                timeout = int(min(self.settle_seconds, self.poll_interval) * 1000)
+            for event in self._inotify.read(timeout=timeout):
+                folder_path = self._watch_folders.get(event.wd)
+                if folder_path is None or not event.name:
+                    continue
+                path = os.path.join(folder_path, event.name)
+                if event.mask & flags.ISDIR:
+                    if self.recursive and event.mask & (flags.CREATE | flags.MOVED_TO):
+                        self._add_new_folder(path)
+                elif self.is_music_file(event.name):
+                    self.notify(path)
+            yield from self.settled_files()
+
+    def _add_watch(self, folder_path: str):
+        flags = inotify_simple.flags
+        try:
+            watch_descriptor = self._inotify.add_watch(folder_path, self._file_mask | flags.ISDIR)
+        except OSError as ex:
+            logger.warning("Could not watch folder %s: %s", folder_path, ex)
+            return
+        self._watch_folders[watch_descriptor] = folder_path
+
+    def _add_new_folder(self, folder_path: str):
+        # Files may have landed in a new folder before its watch was added
+        for new_folder in self._iter_folders(folder_path):
+            self._add_watch(new_folder)
+            self._notify_folder_files(new_folder)
+
+    def _notify_folder_files(self, folder_path: str):
+        try:
+            with os.scandir(folder_path) as iterator:
+                for entry in iterator:
+                    if entry.is_file() and self.is_music_file(entry.name):
+                        self.notify(entry.path)
+        except OSError as ex:
+            logger.warning("Could not read folder %s: %s", folder_path, ex)
+
+    # Polling ---------
+
+    def _watch_polling(self) -> Iterator[str]:
+        while True:
+            time.sleep(self.poll_interval)
+            self.poll()
+            yield from self.settled_files()
+
+    def poll(self):
+        """Check all known folders once and mark new music files and files that changed as changed"""
+        for folder_path, (mtime_ns, files) in list(self._folders.items()):
+            current_mtime = self._folder_mtime(folder_path)
+            if current_mtime is None:
+                del self._folders[folder_path]
+                continue
+
+            # A file rewritten in place does not change the modification time of its folder
+            current_files = self._list_music_files(folder_path)
+            if current_files is None:
+                continue
+            for name, file_state in sorted(current_files.items()):
+                if files.get(name) != file_state:
+                    self.notify(os.path.join(folder_path, name))
+            self._folders[folder_path] = (current_mtime, current_files)
+
+            # New sub folders change the modification time of their parent
+            if self.recursive and current_mtime != mtime_ns:
+                self._poll_new_folders(folder_path)
+
+    def _poll_new_folders(self, folder_path: str):
+        try:
+            with os.scandir(folder_path) as iterator:
+                sub_dirs = [entry.path for entry in iterator if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+        for sub_dir in sub_dirs:
+            if sub_dir in self._folders:
+                continue
+            for new_folder in self._iter_folders(sub_dir):
+                self._notify_folder_files(new_folder)
+                self._folders[new_folder] = (self._folder_mtime(new_folder),
+                                             self._list_music_files(new_folder) or {})
+
+    @staticmethod
+    def _folder_mtime(folder_path: str) -> Optional[int]:
+        try:
+            return os.stat(folder_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _list_music_files(self, folder_path: str) -> Optional[Dict[str, Tuple[int, int]]]:
+        files = {}
+        try:
+            with os.scandir(folder_path) as iterator:
+                for entry in iterator:
+                    if not (entry.is_file() and self.is_music_file(entry.name)):
+                        continue
+                    try:
+                        stat_result = entry.stat()
+                    except OSError:
+                        # Removed while the folder was listed
+                        continue
+                    files[entry.name] = (stat_result.st_size, stat_result.st_mtime_ns)
+        except OSError:
+            return None
+        return files
@@ -1,10 +1,84 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
+import logging
 import sys
 import os
-from dataclasses import dataclass
-from logic.album_logic import list_files, get_album_from_file_path, set_music_information
+import sqlite3
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Iterable, Iterator, List, Optional, Set
+from logic.album_logic import (iter_music_files, parse_filename, get_rename_destination, load_music_information,
+                               save_music_information)
+from logic.async_pipeline import Stage, run_pipeline
+from logic.canonical_names import CanonicalNames
+from logic.catalog import QUERY_COLUMNS, Catalog
+from logic.checkpoint import Checkpoint
+from logic.chapters import Chapter, find_chapters, format_timestamp, write_chapters
+from logic.duplicates import DUPLICATES_FOLDER_NAME, DuplicateReport, find_duplicates, move_duplicates
+from logic.genre import DEFAULT_GENRE_RESOLVER, GenreResolver
+from logic.library_index import LibraryIndex, file_digest, file_identity, settings_fingerprint
+from logic.metadata_db import MetadataDatabase
+from logic.log import configure_logging, get_logger
+from logic.objects import AlbumObject
+from logic.parallel import bounded_map
+from logic.profiling import disable_profiling, enable_profiling, get_profiler, profile_iterator
+from logic.rename_planner import RenameJournal, build_rename_plan, execute_rename_plan
+from logic.sharding import ManifestWriter, MergedManifest, Shard, merge_manifests, relative_key, shard_key
+from logic.splitter import can_split, is_split_folder, split_ogg_opus
+from logic.title_normalizer import DEFAULT_NOISE_TAGS, DEFAULT_NORMALIZER, TitleNormalizer
+from logic.watcher import DEFAULT_SETTLE_SECONDS, FileWatcher
+
+logger = get_logger("main")
+
+STATUS_PROCESSED = "processed"
+STATUS_SKIPPED = "skipped"
+STATUS_ERROR = "error"
+STATUS_UNCHANGED = "unchanged"
+# Parsed, still to be renamed and tagged
+STATUS_PENDING = "pending"
+
+
+@dataclass
+class FileResult:
+    """Outcome of processing a single file"""
+    file_path: str
+    status: str
+    album_obj: Optional[AlbumObject] = None
+    messages: List[str] = field(default_factory=list)
+    # File loaded with music_tag, held between loading and saving the tags
+    music_file: Optional[object] = field(default=None, repr=False)
+    # Tracklist found while parsing, written as chapter markers with the tags
+    chapters: List[Chapter] = field(default_factory=list, repr=False)
+    # time.perf_counter() when processing of the file started
+    started: float = field(default=0.0, repr=False)
+    # Length in seconds, known once the tags were loaded
+    duration: Optional[float] = None
+    # True if the file was skipped by the index, the album object holds the fields recorded there
+    indexed: bool = False
+
+
+@dataclass
+class ProcessingOptions:
+    """Settings shared by all files of a run"""
+    dry_run: bool = False
+    verbose: bool = False
+    force_write: bool = False
+    index: Optional[LibraryIndex] = None
+    normalizer: TitleNormalizer = DEFAULT_NORMALIZER
+    genre_resolver: GenreResolver = DEFAULT_GENRE_RESOLVER
+    canonical_names: Optional[CanonicalNames] = None
+    metadata: Optional[MetadataDatabase] = None
+    metadata_genre: bool = False
+    chapters: bool = False
+    split: bool = False
+    manifest: Optional[ManifestWriter] = None
+    catalog: Optional[Catalog] = None
 
 
 @dataclass
@@ -14,6 +88,18 @@ class ProcessingSummary:
     processed_files: int = 0
     skipped_files: int = 0
     error_files: int = 0
+    unchanged_files: int = 0
+
+    def record(self, result: FileResult):
+        """Count the outcome of a single processed file"""
+        if result.status == STATUS_PROCESSED:
+            self.processed_files += 1
+        elif result.status == STATUS_SKIPPED:
+            self.skipped_files += 1
+        elif result.status == STATUS_UNCHANGED:
+            self.unchanged_files += 1
+        else:
+            self.error_files += 1
 
     def display(self):
         """Display the processing summary in a formatted way"""
@@ -22,91 +108,801 @@ class ProcessingSummary:
         print("=" * 50)
         print(f"Total files found:      {self.total_files}")
         print(f"Successfully processed: {self.processed_files}")
+        print(f"Unchanged:             {self.unchanged_files}")
         print(f"Skipped:               {self.skipped_files}")
         print(f"Errors:                {self.error_files}")
         print("=" * 50)
 
 
-def run(folder_path: str, recursive: bool = False, dry_run: bool = False, verbose: bool = False) -> None:
+def parse_file(file_path: str, options: Optional[ProcessingOptions] = None,
+               stat_result: Optional[os.stat_result] = None,
+               album_obj: Optional[AlbumObject] = None) -> FileResult:
+    """
+    Parse the name of a single music file, the first processing stage.
+
+    Output meant for the user is collected in the result instead of being printed,
+    so results coming back from worker threads can be reported in a stable order.
+
+    Args:
+        file_path: Path to the music file
+        options: Settings of the run, the defaults if not set
+        stat_result: Already known stat of the file, used for the index lookup
+        album_obj: Fields already parsed from the name of the file, used instead of parsing it again:
+            parsed to choose the shard of the file, or by an interrupted run that already renamed the file
+
+    Returns:
+        FileResult: Pending result if the file still has to be renamed and tagged
+    """
+    if options is None:
+        options = ProcessingOptions()
+    verbose = options.verbose
+    index = options.index
+
+    result = FileResult(file_path=file_path, status=STATUS_ERROR, started=time.perf_counter())
+    messages = result.messages
+
+    try:
+        indexed_album = index.lookup(file_path, stat_result) if index is not None else None
+        if indexed_album is not None:
+            if verbose:
+                messages.append("UNCHANGED: File was not modified since it was last tagged")
+            result.album_obj = indexed_album
+            result.indexed = True
+            result.status = STATUS_UNCHANGED
+            return result
+
+        # Get album information from file name
+        with get_profiler().stage("parse"):
+            if album_obj is None:
+                album_obj = parse_name(file_path, options)
+            # Enriching is idempotent, fields of an interrupted run are complete already
+            if album_obj is not None and options.metadata is not None:
+                options.metadata.enrich(album_obj, fill_genre=options.metadata_genre)
+        result.album_obj = album_obj
+
+        if album_obj is None:
+            if verbose:
+                messages.append("SKIP: Could not parse file name. Possible issues:")
+                messages.append("  - No valid separator found (-, –, or —)")
+                messages.append("  - File name does not match expected format: Artist - Title")
+                messages.append("  - Special characters could not be processed")
+                messages.append(f"Original file: {os.path.basename(file_path)}")
+            result.status = STATUS_SKIPPED
+            return result
+
+        # Sidecar files keep the original name, so the tracklist is looked up before renaming
+        if options.chapters or options.split:
+            result.chapters = find_chapters(file_path)
+
+        result.status = STATUS_PENDING
+
+    except Exception as e:
+        add_error_messages(result, e, verbose)
+
+    return result
+
+
+def rename_files(results: List[FileResult], options: Optional[ProcessingOptions] = None,
+                 existing_paths: Optional[Set[str]] = None, journal: Optional[RenameJournal] = None,
+                 checkpoint: Optional[Checkpoint] = None) -> None:
+    """
+    Rename the pending files of one folder to their clean names, the second processing stage.
+
+    All destinations are planned before the first rename, a destination that is already taken
+    gets a number suffix. In a dry run the plan is only reported.
+
+    Args:
+        results: Results of parse_file for files of the same folder
+        options: Settings of the run, the defaults if not set
+        existing_paths: Absolute paths of all music files in the folder
+        journal: Journal recording the renames, so an interrupted run can be recovered
+        checkpoint: Checkpoint the fields of the renamed files are saved to before they lose their names
+    """
+    if options is None:
+        options = ProcessingOptions()
+    verbose = options.verbose
+
+    pending = {result.album_obj: result for result in results if result.status == STATUS_PENDING}
+    if not pending:
+        return
+
+    try:
+        plan = build_rename_plan([result.album_obj for result in pending.values()], existing_paths)
+        for album_obj in plan.resolved_collisions:
+            if verbose or options.dry_run:
+                pending[album_obj].messages.append(
+                    f"NOTE: Clean file name already taken, using: {album_obj.clean_file_name}")
+
+        if options.dry_run:
+            for result in pending.values():
+                album_obj = result.album_obj
+                messages = result.messages
+                messages.append("\nWould set the following metadata:")
+                messages.append(f"  Artist: {album_obj.artist_name}")
+                messages.append(f"  Title: {album_obj.title_name}")
+                messages.append(f"  Year: {album_obj.release_year}")
+                messages.append(f"  Genre: {album_obj.genre}")
+                messages.append(f"  Clean filename: {album_obj.clean_file_name}")
+                if result.chapters:
+                    messages.append(f"  Chapters: {len(result.chapters)}")
+                    for chapter in result.chapters:
+                        messages.append(f"    {format_timestamp(chapter.start_ms)} {chapter.title}")
+                    if options.split and can_split(album_obj.complete_file_path):
+                        messages.append(f"  Would split into {len(result.chapters)} tracks")
+                if get_rename_destination(album_obj) != os.path.abspath(result.file_path):
+                    messages.append(f"  Would rename: {os.path.basename(result.file_path)}")
+                result.status = STATUS_PROCESSED
+            return
+
+        if checkpoint is not None:
+            checkpoint.add_renamed(operation.album_obj for operation in plan.operations
+                                   if operation.album_obj is not None)
+        for album_obj in execute_rename_plan(plan, journal):
+            result = pending[album_obj]
+            if verbose:
+                result.messages.append(f"SKIP: Could not rename file to {album_obj.clean_file_name}")
+            result.status = STATUS_SKIPPED
+
+    except Exception as e:
+        for result in pending.values():
+            add_error_messages(result, e, verbose)
+
+
+def write_file_tags(result: FileResult, options: Optional[ProcessingOptions] = None) -> FileResult:
+    """
+    Write the tags of a renamed file, the last processing stage.
+
+    Args:
+        result: Result of the previous stages, only pending results are written
+        options: Settings of the run, the defaults if not set
+
+    Returns:
+        FileResult: The same result with its final status
+    """
+    return split_file(save_file_tags(load_file_tags(result, options), options), options)
+
+
+def load_file_tags(result: FileResult, options: Optional[ProcessingOptions] = None) -> FileResult:
+    """
+    Load the tags of a renamed file and set the new values in memory.
+    Files whose tags already match are finished here, the others stay pending for save_file_tags.
+
+    Args:
+        result: Result of the previous stages, only pending results are loaded
+        options: Settings of the run, the defaults if not set
+
+    Returns:
+        FileResult: The same result, holding the loaded file if it has to be saved
+    """
+    if result.status != STATUS_PENDING:
+        return result
+    if options is None:
+        options = ProcessingOptions()
+    verbose = options.verbose
+    album_obj = result.album_obj
+    messages = result.messages
+
+    try:
+        loaded = load_music_information(album_obj)
+        if loaded is None:
+            add_write_error_messages(result, verbose)
+            return result
+
+        music_file, changed = loaded
+        result.duration = music_file["#length"].value
+        if options.chapters and result.chapters and write_chapters(music_file, result.chapters):
+            if verbose:
+                messages.append(f"Set {len(result.chapters)} chapters")
+            changed = True
+        if not changed and not options.force_write:
+            if verbose:
+                messages.append("UNCHANGED: Tags already up to date, file was not saved")
+                messages.append(f"  File: {album_obj.clean_file_name}")
+            result.status = STATUS_UNCHANGED
+        else:
+            result.music_file = music_file
+
+    except Exception as e:
+        add_error_messages(result, e, verbose)
+
+    return result
+
+
+def save_file_tags(result: FileResult, options: Optional[ProcessingOptions] = None) -> FileResult:
+    """
+    Save the tags loaded by load_file_tags to disk.
+
+    Args:
+        result: Result of load_file_tags, only results holding a loaded file are saved
+        options: Settings of the run, the defaults if not set
+
+    Returns:
+        FileResult: The same result with its final status
+    """
+    if result.status != STATUS_PENDING or result.music_file is None:
+        return result
+    if options is None:
+        options = ProcessingOptions()
+    verbose = options.verbose
+    album_obj = result.album_obj
+    messages = result.messages
+
+    try:
+        if save_music_information(album_obj, result.music_file) is None:
+            add_write_error_messages(result, verbose)
+        else:
+            if verbose:
+                messages.append("SUCCESS: Updated metadata and renamed file")
+                messages.append(f"  From: {os.path.basename(result.file_path)}")
+                messages.append(f"  To: {album_obj.clean_file_name}")
+            result.status = STATUS_PROCESSED
+
+    except Exception as e:
+        add_error_messages(result, e, verbose)
+    finally:
+        # The loaded tags are not needed anymore
+        result.music_file = None
+
+    return result
+
+
+def split_file(result: FileResult, options: Optional[ProcessingOptions] = None) -> FileResult:
+    """
+    Cut a tagged full album file into one file per track of its tracklist, if splitting is enabled.
+    The tracks are written to a folder named like the file, the file itself is kept.
+
+    Args:
+        result: Result of save_file_tags
+        options: Settings of the run, the defaults if not set
+
+    Returns:
+        FileResult: The same result, with a message about the written tracks
+    """
+    if options is None:
+        options = ProcessingOptions()
+    if (not options.split or options.dry_run or not result.chapters
+            or result.status not in (STATUS_PROCESSED, STATUS_UNCHANGED)):
+        return result
+    album_obj = result.album_obj
+    if not can_split(album_obj.complete_file_path):
+        if options.verbose:
+            result.messages.append("NOTE: Only Opus files can be split without re-encoding")
+        return result
+
+    try:
+        with get_profiler().stage("split"):
+            track_paths = split_ogg_opus(album_obj.complete_file_path, result.chapters, album_obj)
+        if track_paths:
+            result.messages.append(f"Split into {len(track_paths)} tracks: {os.path.dirname(track_paths[0])}")
+    except Exception as e:
+        logger.error("Failed to split %s: %s: %s", album_obj.complete_file_path, type(e).__name__, e)
+        result.messages.append(f"ERROR: Could not split file into tracks: {str(e)}")
+
+    return result
+
+
+def add_write_error_messages(result: FileResult, verbose: bool) -> None:
+    """Mark a result as failed to load or save its tags"""
+    if verbose:
+        result.messages.append(f"ERROR: Failed to set metadata for {result.file_path}")
+        result.messages.append("  - Check if file is write-protected")
+        result.messages.append("  - Verify file is a valid audio format")
+        result.messages.append("  - Ensure sufficient disk space")
+    result.status = STATUS_ERROR
+
+
+def add_error_messages(result: FileResult, error: Exception, verbose: bool) -> None:
+    """Mark a result as failed by an unexpected error"""
+    if verbose:
+        result.messages.append(f"ERROR: Unexpected error processing {result.file_path}")
+        result.messages.append(f"  Error type: {type(error).__name__}")
+        result.messages.append(f"  Error message: {str(error)}")
+        result.messages.append("  Stack trace:")
+        result.messages.append('    ' + '\n    '.join(traceback.format_exc().split('\n')))
+    result.status = STATUS_ERROR
+
+
+def process_file(file_path: str, options: Optional[ProcessingOptions] = None,
+                 stat_result: Optional[os.stat_result] = None) -> FileResult:
+    """
+    Parse, rename and tag a single music file.
+    In a dry run the file is only parsed, nothing on disk is changed.
+
+    Args:
+        file_path: Path to the music file
+        options: Settings of the run, the defaults if not set
+        stat_result: Already known stat of the file, used for the index lookup
+
+    Returns:
+        FileResult: Status of the file and the messages to report
+    """
+    result = parse_file(file_path, options, stat_result)
+    rename_files([result], options)
+    return write_file_tags(result, options)
+
+
+def report_result(result: FileResult, summary: ProcessingSummary, options: ProcessingOptions) -> None:
+    """
+    Print the messages of a processed file, count it and remember it in the index and catalog.
+
+    Args:
+        result: Result of a file that went through all processing stages
+        summary: Statistics of the run
+        options: Settings of the run
+    """
+    summary.total_files += 1
+    get_profiler().add_file()
+    if options.verbose:
+        print(f"\n{'='*50}")
+        print(f"Processing file: {result.file_path}")
+    for message in result.messages:
+        print(message)
+    summary.record(result)
+    if logger.isEnabledFor(logging.INFO):
+        album_obj = result.album_obj
+        logger.info("%s: %s", result.status, result.file_path,
+                    extra={"file": result.file_path, "status": result.status,
+                           "album": album_obj.as_dict() if album_obj is not None else None})
+    index = options.index
+    if (index is not None and not options.dry_run and result.album_obj is not None and not result.indexed
+            and result.status in (STATUS_PROCESSED, STATUS_UNCHANGED)):
+        index.record(result.album_obj)
+    if options.manifest is not None:
+        options.manifest.record(result.file_path, result.status, result.album_obj,
+                                time.perf_counter() - result.started)
+    catalog = options.catalog
+    if (catalog is not None and result.album_obj is not None
+            and result.status in (STATUS_PROCESSED, STATUS_UNCHANGED)):
+        try:
+            size = os.stat(result.album_obj.complete_file_path).st_size
+        except OSError:
+            size = None
+        catalog.record(result.album_obj, size, result.duration, previous_path=result.file_path)
+
+
+def export_canonical_names(folder_path: str, dump_path: str, recursive: bool = False) -> CanonicalNames:
+    """
+    Collect the artist and album tags of a library as canonical names, misspellings are merged
+    into the most frequent spelling.
+
+    Args:
+        folder_path: Path to the folder containing music files
+        dump_path: Path of the dump to write
+        recursive: Whether to read subfolders
+
+    Returns:
+        CanonicalNames: The collected names
+    """
+    file_paths = (entry.path for entry in iter_music_files(folder_path, recursive=recursive))
+    names = CanonicalNames.from_tags(file_paths)
+    names.export_dump(dump_path)
+    print(f"Wrote {sum(1 for _ in names.artists.iter_canonical())} artists to {dump_path}")
+    return names
+
+
+def find_duplicate_files(folder_path: str, recursive: bool = False, dedupe: bool = False,
+                         noise_tags: Iterable[str] = ()) -> DuplicateReport:
+    """
+    Report copies of the same album in a library and optionally move the identical ones away.
+
+    Args:
+        folder_path: Path to the folder containing music files
+        recursive: Whether to search subfolders
+        dedupe: If True, all identical copies but one are moved to the duplicates folder of the library
+        noise_tags: Tags removed from titles in addition to the default ones, used to compare the parsed names
+
+    Returns:
+        DuplicateReport: Groups of identical and similar files
+    """
+    normalizer = DEFAULT_NORMALIZER
+    noise_tags = tuple(noise_tags)
+    if noise_tags:
+        normalizer = TitleNormalizer(DEFAULT_NOISE_TAGS + noise_tags)
+
+    files = ((entry.path, entry.stat().st_size) for entry in iter_music_files(folder_path, recursive=recursive))
+    report = find_duplicates(files, parse=lambda path: parse_filename(path, normalizer=normalizer))
+
+    for group in report.identical:
+        print(f"\nIdentical ({group.size} bytes each):")
+        print(f"  Keep: {group.paths[0]}")
+        for path in group.duplicates:
+            print(f"  Copy: {path}")
+    for group in report.similar:
+        print("\nSame album, different content:")
+        for path in group.paths:
+            print(f"  {path}")
+
+    print(f"\n{len(report.identical)} groups of identical files, {report.wasted_bytes} bytes in copies")
+    print(f"{len(report.similar)} groups of files with the same album name")
+    print(f"Read {report.bytes_read} of {report.total_bytes} bytes")
+
+    if dedupe:
+        moved = move_duplicates(report, folder_path)
+        print(f"Moved {len(moved)} identical copies to {os.path.join(folder_path, DUPLICATES_FOLDER_NAME)}")
+    return report
+
+
+def merge_result_manifests(manifest_paths: List[str], output_path: Optional[str] = None) -> MergedManifest:
+    """
+    Combine the manifests written by the shards of a sharded run and show the summary of the whole library.
+
+    Args:
+        manifest_paths: Paths to the manifests of the shards
+        output_path: Path of a combined manifest to write, not written if not set
+
+    Returns:
+        MergedManifest: Combined counts and the shards found in the manifests
+    """
+    merged = merge_manifests(manifest_paths, output_path)
+    summary = ProcessingSummary(
+        total_files=merged.files,
+        processed_files=merged.counts[STATUS_PROCESSED],
+        skipped_files=merged.counts[STATUS_SKIPPED],
+        unchanged_files=merged.counts[STATUS_UNCHANGED],
+        error_files=merged.files - merged.counts[STATUS_PROCESSED] - merged.counts[STATUS_SKIPPED]
+        - merged.counts[STATUS_UNCHANGED],
+    )
+    summary.display()
+    print(f"Shards: {len(merged.shards)}, processing time of all files: {merged.total_seconds:.1f}s")
+
+    if merged.missing_shards:
+        logger.warning("No manifest for shards %s", ", ".join(merged.missing_shards))
+    if merged.incomplete_shards:
+        logger.warning("Shards %s did not finish", ", ".join(merged.incomplete_shards))
+    if merged.duplicate_paths:
+        logger.warning("%d files were processed by more than one shard", len(merged.duplicate_paths))
+    if output_path is not None:
+        print(f"Wrote merged manifest to {output_path}")
+    return merged
+
+
+def query_catalog(catalog_path: str, artist: Optional[str] = None, title: Optional[str] = None,
+                  genre: Optional[str] = None, decade: Optional[int] = None, year: Optional[int] = None,
+                  count_by: Optional[List[str]] = None) -> int:
+    """
+    Print the albums of a catalog written with --catalog, or their number per genre, decade or other column.
+
+    Args:
+        catalog_path: Path to the catalog
+        artist: Only albums of this artist
+        title: Only albums with this title
+        genre: Only albums of this genre
+        decade: Only albums released in this decade, e.g. 1990
+        year: Only albums released in this year
+        count_by: Columns to count the albums by instead of listing them, e.g. ["genre", "decade"]
+
+    Returns:
+        int: Number of listed albums or groups
+    """
+    if not os.path.isfile(catalog_path):
+        raise FileNotFoundError(f"Catalog {catalog_path} not found")
+    with Catalog(catalog_path) as catalog:
+        if count_by:
+            rows = catalog.count_by(count_by)
+            for row in rows:
+                *values, count, duration = row
+                values = " | ".join("-" if value in (None, "") else str(value) for value in values)
+                print(f"{values}: {count} albums, {duration / 3600:.1f} hours")
+            return len(rows)
+
+        entries = catalog.query(artist=artist, title=title, genre=genre, decade=decade, year=year)
+        for entry in entries:
+            length = ""
+            if entry.duration is not None:
+                minutes, seconds = divmod(int(entry.duration), 60)
+                length = f" ({minutes}:{seconds:02d})"
+            print(f"{entry.year or '----'}  {entry.artist} - {entry.title}  [{entry.genre}]{length}")
+            print(f"      {entry.path}")
+        print(f"\n{len(entries)} albums")
+        return len(entries)
+
+
+def recover_renames(folder_path: str, rollback: bool = False, shard_name: Optional[str] = None) -> None:
+    """
+    Finish or undo the renames of an interrupted run, if there are any.
+
+    Args:
+        folder_path: Path to the folder containing music files
+        rollback: If True, undo the renames instead of finishing them
+        shard_name: Name of the shard of a sharded run, only its own renames are recovered
+    """
+    journal = RenameJournal.for_folder(folder_path, shard_name)
+    if not journal.exists():
+        if rollback:
+            logger.warning("No interrupted renames found in %s", folder_path)
+        return
+    count = journal.recover(rollback=rollback)
+    action = "Rolled back" if rollback else "Finished"
+    logger.warning("%s %d renames of an interrupted run", action, count)
+
+
+def parse_name(file_path: str, options: ProcessingOptions) -> Optional[AlbumObject]:
+    """
+    Parse the fields of a file from its name only, without looking them up in the metadata database.
+
+    Args:
+        file_path: Path to the music file
+        options: Settings of the run
+
+    Returns:
+        AlbumObject: Parsed fields, None if the name could not be parsed
+    """
+    return parse_filename(file_path, normalizer=options.normalizer, genre_resolver=options.genre_resolver,
+                          canonical_names=options.canonical_names)
+
+
+def open_processing_options(stack: ExitStack, folder_path: str, dry_run: bool = False, verbose: bool = False,
+                            force_write: bool = False, use_index: bool = False, shard: Optional[Shard] = None,
+                            noise_tags: Iterable[str] = (), genre_map: Optional[str] = None,
+                            canonical_names: Optional[str] = None, metadata_db: Optional[str] = None,
+                            metadata_genre: bool = False, chapters: bool = False, split: bool = False,
+                            manifest: Optional[str] = None,
+                            catalog: Optional[str] = None) -> Optional[ProcessingOptions]:
+    """
+    Load the settings and open the databases and files shared by all files of a run.
+
+    Every opened resource is registered in the stack, so all of them are closed when the stack
+    is closed, also when a later one fails to open.
+
+    Args:
+        stack: Stack the opened resources are closed with
+        folder_path: Path to the folder containing music files
+        shard: Shard of a sharded run, its index and manifest are kept apart from the other shards
+        See run for the other arguments
+
+    Returns:
+        ProcessingOptions: Settings of the run, None if a setting could not be loaded
+    """
+    genre_resolver = DEFAULT_GENRE_RESOLVER
+    if genre_map is not None:
+        try:
+            genre_resolver = GenreResolver.from_file(genre_map, root_path=folder_path)
+        except (OSError, ValueError) as e:
+            logger.error("Failed to load genre mapping %s: %s", genre_map, e)
+            return None
+
+    names = None
+    if canonical_names is not None:
+        try:
+            names = CanonicalNames.from_dump(canonical_names)
+        except (OSError, ValueError) as e:
+            logger.error("Failed to load canonical names %s: %s", canonical_names, e)
+            return None
+
+    metadata = None
+    if metadata_db is not None:
+        if not os.path.isfile(metadata_db):
+            logger.error("Failed to open metadata database %s: file not found", metadata_db)
+            return None
+        try:
+            metadata = stack.enter_context(MetadataDatabase(metadata_db))
+        except sqlite3.Error as e:
+            logger.error("Failed to open metadata database %s: %s", metadata_db, e)
+            return None
+
+    normalizer = DEFAULT_NORMALIZER
+    noise_tags = tuple(noise_tags)
+    if noise_tags:
+        normalizer = TitleNormalizer(DEFAULT_NOISE_TAGS + noise_tags)
+
+    index = None
+    if use_index:
+        try:
+            # Entries written with other parse or output settings are dropped, the files are processed again
+            settings = settings_fingerprint({
+                "noise_tags": list(normalizer.noise_tags),
+                "genre_map": file_digest(genre_map) if genre_map is not None else None,
+                "canonical_names": file_identity(canonical_names) if canonical_names is not None else None,
+                "metadata_db": file_identity(metadata_db) if metadata_db is not None else None,
+                "metadata_genre": metadata_genre,
+                "chapters": chapters,
+                "split": split,
+            })
+            index = stack.enter_context(LibraryIndex.for_folder(folder_path, shard.name if shard else None,
+                                                                settings))
+        except Exception as e:
+            logger.error("Failed to open index in %s: %s", folder_path, e)
+            return None
+
+    manifest_writer = None
+    if manifest is not None:
+        try:
+            manifest_writer = ManifestWriter(manifest, folder_path, shard)
+        except OSError as e:
+            logger.error("Failed to create manifest %s: %s", manifest, e)
+            return None
+        # Left without summary line unless the run gets to close it as completed
+        stack.callback(manifest_writer.close, completed=False)
+
+    album_catalog = None
+    if catalog is not None:
+        try:
+            album_catalog = stack.enter_context(Catalog(catalog))
+        except sqlite3.Error as e:
+            logger.error("Failed to open catalog %s: %s", catalog, e)
+            return None
+
+    options = ProcessingOptions(dry_run=dry_run, verbose=verbose, force_write=force_write, index=index,
+                                genre_resolver=genre_resolver, canonical_names=names,
+                                metadata=metadata, metadata_genre=metadata_genre, chapters=chapters,
+                                split=split, manifest=manifest_writer, catalog=album_catalog,
+                                normalizer=normalizer)
+    return options
+
+
+def run(folder_path: str, recursive: bool = False, dry_run: bool = False, verbose: bool = False,
+        jobs: int = 1, use_index: bool = False, force_write: bool = False,
+        noise_tags: Iterable[str] = (), use_async: bool = False,
+        genre_map: Optional[str] = None, canonical_names: Optional[str] = None,
+        metadata_db: Optional[str] = None, metadata_genre: bool = False,
+        chapters: bool = False, split: bool = False, shard: Optional[str] = None,
+        manifest: Optional[str] = None, catalog: Optional[str] = None,
+        resume: bool = False) -> Optional[ProcessingSummary]:
     """
     Process music files in the specified folder.
+
+    Files are handled folder by folder: all names of a folder are parsed and their renames
+    are planned and executed together, then the tags are written on the worker pool.
     
     Args:
         folder_path: Path to the folder containing music files
         recursive: Whether to process subfolders
         dry_run: If True, only show what would be done without making changes
         verbose: If True, show detailed processing information
+        jobs: Number of files processed in parallel
+        use_index: If True, skip files that are unchanged since they were last tagged,
+            using the index stored in the library folder
+        force_write: If True, save the tags even when a file already holds the same values
+        noise_tags: Tags removed from titles in addition to the default ones, e.g. Official Audio
+        use_async: If True, discovery, tag loading and saving run as separate asyncio stages,
+            so waiting for slow storage in one stage overlaps with the others
+        genre_map: Path to a JSON file mapping folder names or paths to genres
+        canonical_names: Path to a dump of canonical artist and album names, parsed names are snapped to them
+        metadata_db: Path to a release database, missing release years are looked up in it
+        metadata_genre: If True, the genre of a release found in the metadata database replaces the folder genre
+        chapters: If True, tracklists found in the file name or its .info.json and .description files
+            are written as chapter markers
+        split: If True, Opus files with a tracklist are also cut into one file per track, without re-encoding
+        shard: Shard spec like "3/16", only the files whose folder and clean file name hash into this shard
+            are processed
+        manifest: Path of a JSON lines manifest recording the result of every file, see merge_manifests
+        catalog: Path of a SQLite catalog the parsed fields, size and length of every file are written to
+        resume: If True, continue after the last finished file of an interrupted run instead of starting over
+
+    Returns:
+        ProcessingSummary: Statistics of the run, None if the folder could not be listed
     """
     summary = ProcessingSummary()
     
-    # Get list of files to process
-    try:
-        files = list_files(folder_path) if recursive else [
-            os.path.join(folder_path, f) for f in os.listdir(folder_path)
-            if os.path.isfile(os.path.join(folder_path, f))
-        ]
-        summary.total_files = len(files)
-        if verbose:
-            print(f"\nFound {len(files)} files to process in {folder_path}")
-            if recursive:
-                print("Processing recursively through subfolders")
-    except Exception as e:
-        print(f"ERROR: Failed to list files in {folder_path}: {str(e)}")
-        return
+    # Files are discovered lazily while the first ones are already being processed
+    if not os.path.isdir(folder_path):
+        logger.error("Failed to list files in %s: not a directory", folder_path)
+        return None
+    files = profile_iterator(iter_music_files(folder_path, recursive=recursive), "discovery")
+    if verbose:
+        print(f"\nProcessing music files in {folder_path}")
+        if recursive:
+            print("Processing recursively through subfolders")
+        if jobs > 1:
+            print(f"Using {jobs} parallel jobs")
 
-    for file_path in files:
+    shard_spec = shard
+    shard = None
+    if shard_spec is not None:
+        try:
+            shard = Shard.parse(shard_spec)
+        except ValueError as e:
+            logger.error("%s", e)
+            return None
         if verbose:
-            print(f"\n{'='*50}")
-            print(f"Processing file: {file_path}")
+            print(f"Processing shard {shard}")
+    # Every shard keeps its own journal and index, so hosts never write to the same file
+    shard_name = shard.name if shard is not None else None
+
+    with ExitStack() as stack:
+        journal = None
+        if not dry_run:
+            try:
+                recover_renames(folder_path, shard_name=shard_name)
+            except Exception as e:
+                logger.error("Failed to recover interrupted renames in %s: %s", folder_path, e)
+                return None
+            journal = RenameJournal.for_folder(folder_path, shard_name)
+            stack.callback(journal.close)
+
+        # Progress is saved while the run goes on, so it can be resumed after an interruption
+        checkpoint = None
+        if not dry_run:
+            checkpoint = Checkpoint.for_folder(folder_path, shard_name)
+            if resume:
+                try:
+                    resumed = checkpoint.load()
+                except (OSError, ValueError) as e:
+                    logger.error("Failed to read checkpoint %s: %s", checkpoint.checkpoint_path, e)
+                    return None
+                if not resumed:
+                    logger.warning("No interrupted run to resume in %s, processing all files", folder_path)
+                elif verbose and checkpoint.cursor is not None:
+                    print(f"Resuming in {os.path.join(folder_path, *checkpoint.cursor)}")
+            elif checkpoint.exists():
+                logger.warning("Starting over, use --resume to continue the interrupted run in %s", folder_path)
+
+        options = open_processing_options(stack, folder_path, dry_run=dry_run, verbose=verbose,
+                                          force_write=force_write, use_index=use_index, shard=shard,
+                                          noise_tags=noise_tags, genre_map=genre_map, canonical_names=canonical_names,
+                                          metadata_db=metadata_db, metadata_genre=metadata_genre, chapters=chapters,
+                                          split=split, manifest=manifest, catalog=catalog)
+        if options is None:
+            return None
+        index = options.index
+        if checkpoint is not None:
+            # Kept for --resume unless the run gets to close it as completed
+            stack.callback(checkpoint.close, completed=False)
+
+        def renamed_results() -> Iterator[FileResult]:
+            # The walker yields all files of a folder one after another
+            for folder, folder_entries in groupby(files, key=lambda entry: os.path.dirname(entry.path)):
+                if checkpoint is not None and checkpoint.is_finished_folder(folder):
+                    continue
+                folder_entries = list(folder_entries)
+                # Files of other shards still occupy their names
+                existing_paths = {entry.path for entry in folder_entries}
+                if checkpoint is not None:
+                    folder_entries = [entry for entry in folder_entries
+                                      if not checkpoint.is_finished_file(entry.path)]
+                # Entries with the fields known for them, parsed again by parse_file if not known yet
+                parsed_entries = [(entry, checkpoint.renamed_album(entry.path) if checkpoint is not None else None)
+                                  for entry in folder_entries]
+                if shard is not None:
+                    # The clean file name decides the shard of a file, the parsed fields are kept for parse_file
+                    relative_folder = relative_key(folder, folder_path)
+                    owned_entries = []
+                    for entry, album_obj in parsed_entries:
+                        if album_obj is None:
+                            with get_profiler().stage("shard"):
+                                album_obj = parse_name(entry.path, options)
+                        clean_file_name = (album_obj.clean_file_name if album_obj is not None
+                                           else os.path.basename(entry.path))
+                        if shard.contains(shard_key(relative_folder, clean_file_name)):
+                            owned_entries.append((entry, album_obj))
+                    parsed_entries = owned_entries
+                results = [
+                    parse_file(entry.path, options, stat_result=entry.stat() if index is not None else None,
+                               album_obj=album_obj)
+                    for entry, album_obj in parsed_entries
+                ]
+                rename_files(results, options, existing_paths=existing_paths, journal=journal, checkpoint=checkpoint)
+                yield from results
+
+        def report(result: FileResult) -> None:
+            report_result(result, summary, options)
+            if checkpoint is not None:
+                checkpoint.file_done(result.album_obj.complete_file_path if result.album_obj is not None
+                                     else result.file_path)
 
         try:
-            # Get album information from file name
-            album_obj = get_album_from_file_path(file_path)
-            
-            if album_obj is None:
-                if verbose:
-                    print(f"SKIP: Could not parse file name. Possible issues:")
-                    print(f"  - No valid separator found (-, –, or —)")
-                    print(f"  - File name does not match expected format: Artist - Title")
-                    print(f"  - Special characters could not be processed")
-                    print(f"Original file: {os.path.basename(file_path)}")
-                summary.skipped_files += 1
-                continue
-
-            if dry_run:
-                print("\nWould set the following metadata:")
-                print(f"  Artist: {album_obj.artist_name}")
-                print(f"  Title: {album_obj.title_name}")
-                print(f"  Year: {album_obj.release_year}")
-                print(f"  Genre: {album_obj.genre}")
-                print(f"  Clean filename: {album_obj.clean_file_name}")
-                summary.processed_files += 1
+            # Results come back in input order, so the report is the same for any number of jobs
+            if use_async:
+                stages = [
+                    Stage("load", lambda result: load_file_tags(result, options), workers=jobs),
+                    Stage("save", lambda result: save_file_tags(result, options), workers=jobs),
+                ]
+                if split:
+                    stages.append(Stage("split", lambda result: split_file(result, options), workers=jobs))
+                # One thread per stage worker plus one for discovery and parsing
+                with ThreadPoolExecutor(max_workers=len(stages) * jobs + 1) as executor:
+                    asyncio.run(run_pipeline(renamed_results(), stages, report, executor,
+                                             queue_size=max(16, 4 * jobs)))
             else:
-                # Set music information in the file
-                result = set_music_information(album_obj)
-                if result is None:
-                    if verbose:
-                        print(f"ERROR: Failed to set metadata for {file_path}")
-                        print("  - Check if file is write-protected")
-                        print("  - Verify file is a valid audio format")
-                        print("  - Ensure sufficient disk space")
-                    summary.error_files += 1
-                else:
-                    if verbose:
-                        print(f"SUCCESS: Updated metadata and renamed file")
-                        print(f"  From: {os.path.basename(file_path)}")
-                        print(f"  To: {album_obj.clean_file_name}")
-                    summary.processed_files += 1
-
-        except Exception as e:
-            if verbose:
-                print(f"ERROR: Unexpected error processing {file_path}")
-                print(f"  Error type: {type(e).__name__}")
-                print(f"  Error message: {str(e)}")
-                print("  Stack trace:")
-                import traceback
-                print('    ' + '\n    '.join(traceback.format_exc().split('\n')))
-            summary.error_files += 1
+                for result in bounded_map(lambda result: write_file_tags(result, options), renamed_results(), jobs):
+                    report(result)
+            if options.manifest is not None:
+                options.manifest.close(completed=True)
+            if checkpoint is not None:
+                checkpoint.close(completed=True)
+        except OSError as e:
+            logger.error("Failed to list files in %s: %s", folder_path, e)
+            return None
 
     if verbose:
         print(f"\n{'='*50}")
@@ -114,6 +910,104 @@ def run(folder_path: str, recursive: bool = False, dry_run: bool = False, verbos
     
     # Display the summary
     summary.display()
+    return summary
+
+
+def watch(folder_path: str, recursive: bool = False, dry_run: bool = False, verbose: bool = False,
+          use_index: bool = False, force_write: bool = False, noise_tags: Iterable[str] = (),
+          settle_seconds: float = DEFAULT_SETTLE_SECONDS, genre_map: Optional[str] = None,
+          canonical_names: Optional[str] = None, metadata_db: Optional[str] = None,
+          metadata_genre: bool = False, chapters: bool = False, split: bool = False,
+          catalog: Optional[str] = None, watcher: Optional[FileWatcher] = None,
+          max_files: Optional[int] = None) -> Optional[ProcessingSummary]:
+    """
+    Keep running and process music files as they land in the folder.
+
+    Only files that are created or changed after the start are processed, each one after it
+    stopped growing for settle_seconds. The renames and tag writes of the indexer itself
+    are recognized and not processed a second time. Stops on Ctrl+C.
+
+    Args:
+        folder_path: Path to the folder containing music files
+        recursive: Whether to watch subfolders
+        dry_run: If True, only show what would be done without making changes
+        verbose: If True, show detailed processing information
+        use_index: If True, record processed files in the index stored in the library folder
+        force_write: If True, save the tags even when a file already holds the same values
+        noise_tags: Tags removed from titles in addition to the default ones, e.g. Official Audio
+        settle_seconds: Seconds a file has to stay unchanged before it is processed
+        genre_map: Path to a JSON file mapping folder names or paths to genres
+        canonical_names: Path to a dump of canonical artist and album names, parsed names are snapped to them
+        metadata_db: Path to a release database, missing release years are looked up in it
+        metadata_genre: If True, the genre of a release found in the metadata database replaces the folder genre
+        chapters: If True, tracklists found in the file name or its .info.json and .description files
+            are written as chapter markers
+        split: If True, Opus files with a tracklist are also cut into one file per track, without re-encoding
+        catalog: Path of a SQLite catalog the parsed fields, size and length of every file are written to
+        watcher: Watcher reporting the changed files, created for the folder if not set
+        max_files: Stop after this many files, used by tests
+
+    Returns:
+        ProcessingSummary: Statistics of the processed files, None if the folder could not be watched
+    """
+    summary = ProcessingSummary()
+    if not os.path.isdir(folder_path):
+        logger.error("Failed to watch %s: not a directory", folder_path)
+        return None
+    if not dry_run:
+        try:
+            recover_renames(folder_path)
+        except Exception as e:
+            logger.error("Failed to recover interrupted renames in %s: %s", folder_path, e)
+            return None
+
+    with ExitStack() as stack:
+        options = open_processing_options(stack, folder_path, dry_run=dry_run, verbose=verbose,
+                                          force_write=force_write, use_index=use_index, noise_tags=noise_tags,
+                                          genre_map=genre_map, canonical_names=canonical_names,
+                                          metadata_db=metadata_db, metadata_genre=metadata_genre,
+                                          chapters=chapters, split=split, catalog=catalog)
+        if options is None:
+            return None
+
+        if watcher is None:
+            watcher = FileWatcher(folder_path, recursive=recursive, settle_seconds=settle_seconds)
+        # Size and modification time of the files the indexer wrote itself
+        own_changes = {}
+        print(f"Watching {folder_path} for new music files, press Ctrl+C to stop")
+
+        try:
+            for file_path in watcher.watch():
+                try:
+                    stat_result = os.stat(file_path)
+                except OSError:
+                    continue
+                if own_changes.pop(file_path, None) == (stat_result.st_size, stat_result.st_mtime_ns):
+                    continue
+                if is_split_folder(os.path.dirname(file_path)):
+                    continue
+
+                result = process_file(file_path, options, stat_result)
+                report_result(result, summary, options)
+                if result.album_obj is not None and not dry_run:
+                    try:
+                        stat_result = os.stat(result.album_obj.complete_file_path)
+                        own_changes[result.album_obj.complete_file_path] = (stat_result.st_size,
+                                                                            stat_result.st_mtime_ns)
+                    except OSError:
+                        pass
+                if max_files is not None and summary.total_files >= max_files:
+                    break
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            logger.error("Failed to watch %s: %s", folder_path, e)
+            return None
+        finally:
+            watcher.close()
+
+    summary.display()
+    return summary
 
 
 def main():
@@ -144,22 +1038,279 @@ def main():
     )
     parser.add_argument(
         '--verbose', '-v',
+        action='count',
+        default=0,
+        help='Show detailed processing information, repeat for debug output of every parsing step'
+    )
+    parser.add_argument(
+        '--log-json',
+        metavar='FILE',
+        help='Append machine-readable log records to FILE, one JSON object per line'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Number of files to process in parallel (default: 1)'
+    )
+
+    parser.add_argument(
+        '--index',
         action='store_true',
-        help='Show detailed processing information'
+        help='Keep an index of tagged files in the library folder and skip files unchanged since the last run'
     )
 
+    parser.add_argument(
+        '--force-write',
+        action='store_true',
+        help='Save tags even when the file already holds the same values'
+    )
+
+    parser.add_argument(
+        '--noise-tag',
+        action='append',
+        default=[],
+        metavar='TEXT',
+        help='Additional tag to remove from titles, e.g. "Official Audio" (can be repeated)'
+    )
+
+    parser.add_argument(
+        '--rollback-renames',
+        action='store_true',
+        help='Undo the renames of an interrupted run and exit'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted run after its last finished file instead of starting over'
+    )
+
+    parser.add_argument(
+        '--async-io',
+        action='store_true',
+        help='Overlap reading and writing of tags in an asyncio pipeline, useful on network storage'
+    )
+
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Measure the latency of every processing stage and print a breakdown'
+    )
+    parser.add_argument(
+        '--profile-json',
+        metavar='FILE',
+        help='Write the profile as JSON to FILE, implies --profile'
+    )
+
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and process new music files as they are downloaded into the folder'
+    )
+    parser.add_argument(
+        '--settle-seconds',
+        type=float,
+        default=DEFAULT_SETTLE_SECONDS,
+        metavar='SECONDS',
+        help=f'In watch mode, wait until a file did not change for SECONDS (default: {DEFAULT_SETTLE_SECONDS:g})'
+    )
+
+    parser.add_argument(
+        '--genre-map',
+        metavar='FILE',
+        help='JSON file mapping folder names or paths like "Rock/Prog" to genres'
+    )
+
+    parser.add_argument(
+        '--canonical-names',
+        metavar='FILE',
+        help='Snap parsed artist and album names to the canonical spellings in FILE, '
+             'a dump written by --export-canonical-names'
+    )
+    parser.add_argument(
+        '--export-canonical-names',
+        metavar='FILE',
+        help='Collect the artist and album tags of the library into FILE and exit'
+    )
+
+    parser.add_argument(
+        '--metadata-db',
+        metavar='FILE',
+        help='Look up missing release years in a local release database created with --import-metadata'
+    )
+    parser.add_argument(
+        '--metadata-genre',
+        action='store_true',
+        help='Use the genre of a release found in --metadata-db instead of the folder name'
+    )
+    parser.add_argument(
+        '--import-metadata',
+        metavar='DUMP',
+        help='Import a tab separated dump of "artist, album, year, genre" lines into --metadata-db and exit'
+    )
+
+    parser.add_argument(
+        '--chapters',
+        action='store_true',
+        help='Write tracklists with timestamps from the file name, .info.json or .description files as chapters'
+    )
+    parser.add_argument(
+        '--split',
+        action='store_true',
+        help='Also cut Opus files with a tracklist into one file per track, without re-encoding'
+    )
+
+    parser.add_argument(
+        '--find-duplicates',
+        action='store_true',
+        help='Report files with identical content or the same album name and exit'
+    )
+    parser.add_argument(
+        '--dedupe',
+        action='store_true',
+        help='Like --find-duplicates, and move all identical copies but one into a duplicates folder'
+    )
+
+    parser.add_argument(
+        '--catalog',
+        metavar='FILE',
+        help='Write artist, title, year, genre, path, size and length of every file to a SQLite catalog, '
+             'query it with "main.py catalog FILE"'
+    )
+
+    parser.add_argument(
+        '--shard',
+        metavar='K/N',
+        help='Only process the files of shard K of N, e.g. 3/16, to split a library between several hosts'
+    )
+    parser.add_argument(
+        '--manifest',
+        metavar='FILE',
+        help='Write the result of every file to a JSON lines manifest, combine them with "main.py merge"'
+    )
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        merge_parser = argparse.ArgumentParser(
+            prog=f'{parser.prog} merge',
+            description='Combine the result manifests of the shards of a sharded run.'
+        )
+        merge_parser.add_argument('manifests', nargs='+', help='Manifests written with --manifest')
+        merge_parser.add_argument('--output', '-o', metavar='FILE', help='Write the combined manifest to FILE')
+        merge_args = merge_parser.parse_args(sys.argv[2:])
+        configure_logging(0)
+        try:
+            merge_result_manifests(merge_args.manifests, merge_args.output)
+        except (OSError, ValueError) as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'catalog':
+        catalog_parser = argparse.ArgumentParser(
+            prog=f'{parser.prog} catalog',
+            description='List the albums of a catalog written with --catalog.'
+        )
+        catalog_parser.add_argument('catalog', help='Catalog written with --catalog')
+        catalog_parser.add_argument('--artist', help='Only albums of this artist')
+        catalog_parser.add_argument('--title', help='Only albums with this title')
+        catalog_parser.add_argument('--genre', help='Only albums of this genre')
+        catalog_parser.add_argument('--decade', type=int, help='Only albums of this decade, e.g. 1990')
+        catalog_parser.add_argument('--year', type=int, help='Only albums released in this year')
+        catalog_parser.add_argument('--count-by', nargs='+', choices=QUERY_COLUMNS, metavar='COLUMN',
+                                    help=f'Count the albums per value instead of listing them, '
+                                         f'any of: {", ".join(QUERY_COLUMNS)}')
+        catalog_args = catalog_parser.parse_args(sys.argv[2:])
+        configure_logging(0)
+        try:
+            query_catalog(catalog_args.catalog, artist=catalog_args.artist, title=catalog_args.title,
+                          genre=catalog_args.genre, decade=catalog_args.decade, year=catalog_args.year,
+                          count_by=catalog_args.count_by)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            sys.exit(1)
+        return
+
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+
+    configure_logging(args.verbose, args.log_json)
+
+    profiler = enable_profiling() if args.profile or args.profile_json else None
 
     try:
+        if args.rollback_renames:
+            recover_renames(args.folder_path, rollback=True,
+                            shard_name=Shard.parse(args.shard).name if args.shard else None)
+            return
+        if args.import_metadata:
+            if not args.metadata_db:
+                parser.error('--import-metadata requires --metadata-db')
+            with MetadataDatabase(args.metadata_db) as metadata:
+                count = metadata.import_dump(args.import_metadata)
+            print(f"Imported {count} releases into {args.metadata_db}")
+            return
+        if args.find_duplicates or args.dedupe:
+            find_duplicate_files(args.folder_path, args.recursive, dedupe=args.dedupe, noise_tags=args.noise_tag)
+            return
+        if args.export_canonical_names:
+            export_canonical_names(args.folder_path, args.export_canonical_names, args.recursive)
+            return
+        if args.watch:
+            watch(
+                folder_path=args.folder_path,
+                recursive=args.recursive,
+                dry_run=args.dry_run,
+                verbose=args.verbose > 0,
+                use_index=args.index,
+                force_write=args.force_write,
+                noise_tags=args.noise_tag,
+                settle_seconds=args.settle_seconds,
+                genre_map=args.genre_map,
+                canonical_names=args.canonical_names,
+                metadata_db=args.metadata_db,
+                metadata_genre=args.metadata_genre,
+                chapters=args.chapters,
+                split=args.split,
+                catalog=args.catalog
+            )
+            return
         run(
             folder_path=args.folder_path,
             recursive=args.recursive,
             dry_run=args.dry_run,
-            verbose=args.verbose
+            verbose=args.verbose > 0,
+            jobs=args.jobs,
+            use_index=args.index,
+            force_write=args.force_write,
+            noise_tags=args.noise_tag,
+            use_async=args.async_io,
+            genre_map=args.genre_map,
+            canonical_names=args.canonical_names,
+            metadata_db=args.metadata_db,
+            metadata_genre=args.metadata_genre,
+            chapters=args.chapters,
+            split=args.split,
+            shard=args.shard,
+            manifest=args.manifest,
+            catalog=args.catalog,
+            resume=args.resume
         )
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        # Every mode is profiled, also the ones that return early
+        if profiler is not None:
+            profiler.finish()
+            profiler.display()
+            if args.profile_json:
+                try:
+                    profiler.export_json(args.profile_json)
+                except OSError as e:
+                    logger.error("Failed to write profile %s: %s", args.profile_json, e)
+        disable_profiling()
 
 
 if __name__ == '__main__':
@@ -7,4 +7,8 @@ setup(
     install_requires=[
         'music-tag',
     ],
+    extras_require={
+        'watch': ['inotify_simple'],
+        'chapters': ['ijson'],
+    },
 ) 
\ No newline at end of file